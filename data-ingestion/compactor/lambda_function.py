@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone, timedelta
+from time import monotonic
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from active_users import list_active_user_ids
+from compaction import (
+    CONTENT_TYPE,
+    GRANULARITY_MONTHLY,
+    GRANULARITY_WEEKLY,
+    CompactedObject,
+    DayBodies,
+    build_container,
+    period_bounds,
+    period_label,
+    read_index,
+    split_range
+)
+from deadlines import submit_until_deadline
+from manifest import PartitionEntry, PartitionManifest, apply_manifest_update, load_manifest
+from rollups import GlucoseRollup
+from storage import CONTENT_HASH_METADATA_KEY, compacted_key, content_hash, deserialize_series, rollup_key
+
+S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
+USERS_TABLE = os.environ['USERS_TABLE']
+ACTIVE_USER_SHARDS = int(os.environ.get('ACTIVE_USER_SHARDS', '16'))
+COMPACTION_CONCURRENCY = int(os.environ.get('COMPACTION_CONCURRENCY', '8'))
+COMPACTION_FETCH_CONCURRENCY = int(os.environ.get('COMPACTION_FETCH_CONCURRENCY', '16'))
+COMPACTION_GRACE_DAYS = int(os.environ.get('COMPACTION_GRACE_DAYS', '2'))  # Late readings can still land this long after a day ends
+TIME_RESERVE_SECONDS = 30
+DELETE_BATCH_SIZE = 1000  # S3 DeleteObjects limit
+
+logger = logging.getLogger()
+logger.setLevel(os.environ['LOG_LEVEL'])
+
+dynamodb_client = boto3.client('dynamodb', region_name=os.environ['AWS_REGION'])
+s3 = boto3.client('s3', config=Config(max_pool_connections=COMPACTION_CONCURRENCY + COMPACTION_FETCH_CONCURRENCY))
+
+# Reused across warm invocations; users and their partition GETs get separate pools so users never wait on each other's slots
+user_executor = ThreadPoolExecutor(max_workers=COMPACTION_CONCURRENCY)
+fetch_executor = ThreadPoolExecutor(max_workers=COMPACTION_FETCH_CONCURRENCY)
+
+
+def closed_periods(manifest: PartitionManifest, granularity: str, closed_before: date) -> dict[tuple[date, date], dict[str, str]]:
+    """
+    Content hashes of the stored days, grouped by week or month, for periods that ended before `closed_before`.
+
+    Months include the days already sealed in their container. Weeks only include days
+    still stored as daily partitions: a sealed day's copy lives in its monthly container alone.
+    """
+    hashes = manifest.content_hashes() if granularity == GRANULARITY_MONTHLY else {d: e.content_hash for d, e in manifest.partitions.items()}
+
+    periods = defaultdict(dict)
+    for readings_date, series_hash in hashes.items():
+        bounds = period_bounds(granularity, date.fromisoformat(readings_date))
+        if bounds[1] < closed_before:
+            periods[bounds][readings_date] = series_hash
+    return periods
+
+def is_current(compacted: CompactedObject | None, hashes: dict[str, str]) -> bool:
+    """Whether a container already holds exactly these days' current content."""
+    if compacted is None:
+        return False
+    return {d: day.content_hash for d, day in compacted.days.items()} == hashes
+
+def fetch_day(entry: PartitionEntry) -> tuple[str, tuple[DayBodies, str]]:
+    """
+    A day's stored readings body, its rollup and the hash of its readings.
+
+    The rollup is rebuilt from the readings rather than fetched, so it always agrees with
+    them and each day costs a single GET.
+    """
+    response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=entry.key)
+    body = response['Body'].read()
+    content_type = response.get('ContentType')
+
+    series = deserialize_series(body, content_type)
+    rollup = json.dumps(GlucoseRollup.from_series(series).to_dict(), separators=(',', ':')).encode('utf-8')
+    return entry.readings_date, (DayBodies(body, content_type, rollup), content_hash(series))
+
+def fetch_sealed_days(s3_key: str, hashes: dict[str, str]) -> dict[str, tuple[DayBodies, str]]:
+    """
+    Days whose only copy is in a sealed container, read back to be carried into its rebuild.
+
+    The container is read whole and located by its own index rather than the manifest's,
+    so a rebuild interrupted before the manifest was updated can still be redone.
+    """
+    body = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)['Body'].read()
+    stored = read_index(body)
+
+    changed = [d for d, series_hash in hashes.items() if d not in stored.days or stored.days[d].content_hash != series_hash]
+    if changed:
+        raise RuntimeError(f'Sealed container {s3_key} no longer holds {len(changed)} of its day(s), e.g. {changed[0]}.')
+
+    bodies = split_range(stored, sorted(hashes), body, 0)
+    return {d: (day_bodies, hashes[d]) for d, day_bodies in bodies.items()}
+
+def compact_period(
+    user_id: str,
+    manifest: PartitionManifest,
+    granularity: str,
+    bounds: tuple[date, date],
+    hashes: dict[str, str]
+) -> CompactedObject:
+    s3_key = compacted_key(user_id, granularity, period_label(granularity, bounds[0]))
+
+    days = dict(fetch_executor.map(fetch_day, [manifest.partitions[d] for d in hashes if d in manifest.partitions]))
+    sealed = {d: series_hash for d, series_hash in hashes.items() if d not in manifest.partitions}
+    if sealed:
+        days.update(fetch_sealed_days(s3_key, sealed))
+
+    body, compacted = build_container(s3_key, granularity, bounds[0], bounds[1], days)
+    response = s3.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=body, ContentType=CONTENT_TYPE)
+    compacted.etag = response['ETag']
+
+    logger.info(f'Compacted {len(days)} day(s) into S3://{S3_BUCKET_NAME}/{s3_key} ({len(body)} bytes) for user: {user_id}.')
+    return compacted
+
+def is_stored(compacted: CompactedObject) -> bool:
+    """Whether the container in S3 is the one described, so its days can be dropped everywhere else."""
+    try:
+        response = s3.get_object(
+            Bucket=S3_BUCKET_NAME,
+            Key=compacted.key,
+            Range=f'bytes=0-{compacted.payload_offset - 1}',
+            IfMatch=compacted.etag
+        )
+    except s3.exceptions.NoSuchKey:
+        return False
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'PreconditionFailed':
+            raise
+        return False
+    return read_index(response['Body'].read()).days == compacted.days
+
+def delete_daily_partitions(user_id: str, entries: list[PartitionEntry]) -> None:
+    """
+    Delete the readings and rollup objects of partitions now held by a sealed container.
+
+    A partition rewritten since it was sealed (late readings landing meanwhile) is kept;
+    its new manifest entry supersedes the container's copy.
+    """
+    s3_keys = []
+    for entry in entries:
+        try:
+            response = s3.head_object(Bucket=S3_BUCKET_NAME, Key=entry.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+            continue
+        if response.get('Metadata', {}).get(CONTENT_HASH_METADATA_KEY, entry.content_hash) != entry.content_hash:
+            logger.info(f'Partition {entry.key} was rewritten after sealing; keeping it.')
+            continue
+        s3_keys += [entry.key, rollup_key(user_id, entry.readings_date)]
+
+    delete_objects(s3_keys)
+
+def delete_objects(s3_keys: list[str]) -> None:
+    for i in range(0, len(s3_keys), DELETE_BATCH_SIZE):
+        response = s3.delete_objects(
+            Bucket=S3_BUCKET_NAME,
+            Delete={'Objects': [{'Key': s3_key} for s3_key in s3_keys[i:i + DELETE_BATCH_SIZE]], 'Quiet': True}
+        )
+        for error in response.get('Errors', []):
+            logger.warning(f"Could not delete S3://{S3_BUCKET_NAME}/{error['Key']}: {error.get('Message')}")
+    if s3_keys:
+        logger.info(f'Deleted {len(s3_keys)} superseded object(s).')
+
+def compact_months(user_id: str, closed_before: date, deadline: float) -> int:
+    """
+    Write a container for every closed month whose days changed since it was last compacted, and seal it.
+
+    Sealing is recorded in the manifest before the month's daily partitions are deleted,
+    and only once every day of the month is indexed, the container is verified in S3 and
+    the manifest still shows the content it holds. Returns the number of containers written.
+    """
+    manifest, _ = load_manifest(s3, S3_BUCKET_NAME, user_id)
+    if manifest is None:
+        return 0
+
+    written = []
+    to_seal = []
+    for bounds, hashes in sorted(closed_periods(manifest, GRANULARITY_MONTHLY, closed_before).items()):
+        s3_key = compacted_key(user_id, GRANULARITY_MONTHLY, period_label(GRANULARITY_MONTHLY, bounds[0]))
+        compacted = manifest.compacted.get(s3_key)
+        if not is_current(compacted, hashes):
+            if monotonic() >= deadline:
+                logger.info(f'Out of time compacting user: {user_id}; the rest is left for the next run.')
+                break
+            compacted = compact_period(user_id, manifest, GRANULARITY_MONTHLY, bounds, hashes)
+            written.append(compacted)
+        elif compacted.sealed and not any(d in manifest.partitions for d in hashes):
+            continue
+
+        month_days = ((bounds[0] + timedelta(days=offset)).isoformat() for offset in range((bounds[1] - bounds[0]).days + 1))
+        if all(manifest.is_complete_for(d) for d in month_days) and is_stored(compacted):
+            to_seal.append(compacted)
+
+    dropped = []
+
+    def seal(m: PartitionManifest) -> bool:
+        dropped.clear()
+        changed = m.upsert_compacted(written)
+        for compacted in to_seal:
+            dropped.extend(m.seal(compacted))
+        return changed or bool(to_seal)
+
+    if written or to_seal:
+        apply_manifest_update(s3, S3_BUCKET_NAME, user_id, seal)
+        delete_daily_partitions(user_id, dropped)
+        logger.info(f'Sealed {len(to_seal)} month(s) for user: {user_id}, dropping {len(dropped)} daily partition(s).')
+    return len(written)
+
+def compact_weeks(user_id: str, closed_before: date, deadline: float) -> int:
+    """
+    Write a container for every closed week whose daily partitions changed since it was last compacted.
+
+    Weeks only hold days not yet sealed into their month, so a week's container shrinks as
+    its months are sealed and is deleted once it holds none. Returns the number of
+    containers written.
+    """
+    manifest, _ = load_manifest(s3, S3_BUCKET_NAME, user_id)
+    if manifest is None:
+        return 0
+
+    periods = closed_periods(manifest, GRANULARITY_WEEKLY, closed_before)
+
+    written = []
+    for bounds, hashes in sorted(periods.items()):
+        s3_key = compacted_key(user_id, GRANULARITY_WEEKLY, period_label(GRANULARITY_WEEKLY, bounds[0]))
+        if is_current(manifest.compacted.get(s3_key), hashes):
+            continue
+        if monotonic() >= deadline:
+            logger.info(f'Out of time compacting user: {user_id}; the rest is left for the next run.')
+            break
+        written.append(compact_period(user_id, manifest, GRANULARITY_WEEKLY, bounds, hashes))
+
+    superseded = [
+        c.key for c in manifest.compacted.values()
+        if c.granularity == GRANULARITY_WEEKLY and not any(d in manifest.partitions for d in c.days)
+    ]
+
+    def update(m: PartitionManifest) -> bool:
+        changed = m.upsert_compacted(written)
+        return m.remove_compacted(superseded) or changed
+
+    if written or superseded:
+        apply_manifest_update(s3, S3_BUCKET_NAME, user_id, update)
+        delete_objects(superseded)
+    return len(written)
+
+def compact_user(user_id: str, closed_before: date, deadline: float) -> int:
+    """
+    Bring the user's monthly, then weekly, containers up to date with their closed days.
+
+    Months go first: sealing one takes its days out of the weekly containers. Containers
+    are recorded in the manifest after they are written. Returns the number of containers
+    written.
+    """
+    return compact_months(user_id, closed_before, deadline) + compact_weeks(user_id, closed_before, deadline)
+
+def lambda_handler(event, context):
+    """
+    Partition compactor: merge closed daily partitions into weekly and monthly containers.
+
+    A period is closed once it ended more than the grace period ago. Closed months are
+    sealed, replacing their daily partitions and weekly copies. Readers keep using the
+    daily partitions for any day whose content changed after its container was written, and
+    that container is rebuilt on the next run. Users not reached before the invocation is
+    about to time out are picked up by the next run.
+    """
+    deadline = monotonic() + context.get_remaining_time_in_millis() / 1000 - TIME_RESERVE_SECONDS
+    closed_before = datetime.now(timezone.utc).date() - timedelta(days=COMPACTION_GRACE_DAYS)
+
+    active_user_ids = list_active_user_ids(dynamodb_client, USERS_TABLE, ACTIVE_USER_SHARDS, user_executor)
+    logger.info(f'Compacting partitions closed before {closed_before} for {len(active_user_ids)} active users.')
+
+    futures, deferred = submit_until_deadline(
+        user_executor,
+        lambda user_id: compact_user(user_id, closed_before, deadline),
+        active_user_ids,
+        COMPACTION_CONCURRENCY,
+        deadline
+    )
+
+    compacted_count = 0
+    failed_count = 0
+    for user_id, future in futures:
+        try:
+            compacted_count += future.result()
+        except Exception as e:
+            logger.error(f'Failed to compact partitions for user: {user_id}. Error: {str(e)}')
+            failed_count += 1
+
+    result = {
+        'total_active_users': len(active_user_ids),
+        'containers_written': compacted_count,
+        'failed': failed_count,
+        'deferred': len(deferred)
+    }
+
+    logger.info(f'Partition compactor completed: {result}')
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
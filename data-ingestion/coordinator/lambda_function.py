@@ -1,85 +1,55 @@
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from active_users import list_active_user_ids
+from sqs_batch import BatchEnqueuer
 
-DEXCOM_CREDENTIALS_TABLE = os.environ['DEXCOM_CREDENTIALS_TABLE']
 USERS_TABLE = os.environ['USERS_TABLE']
 SQS_QUEUE_URL = os.environ['SQS_QUEUE_URL']
+ACTIVE_USER_SHARDS = int(os.environ.get('ACTIVE_USER_SHARDS', '16'))
+LOOKUP_CONCURRENCY = int(os.environ.get('LOOKUP_CONCURRENCY', '8'))
+ENQUEUE_CONCURRENCY = int(os.environ.get('ENQUEUE_CONCURRENCY', '8'))
+ENQUEUE_MAX_JITTER_SECONDS = int(os.environ.get('ENQUEUE_MAX_JITTER_SECONDS', '0'))
 
 logger = logging.getLogger()
 logger.setLevel(os.environ['LOG_LEVEL'])
 
-dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION'])
+dynamodb_client = boto3.client('dynamodb', region_name=os.environ['AWS_REGION'])
 sqs = boto3.client('sqs', region_name=os.environ['AWS_REGION'])
+enqueuer = BatchEnqueuer(sqs, SQS_QUEUE_URL, concurrency=ENQUEUE_CONCURRENCY, max_jitter_seconds=ENQUEUE_MAX_JITTER_SECONDS)
+
+# Reused across warm invocations
+lookup_executor = ThreadPoolExecutor(max_workers=LOOKUP_CONCURRENCY)
 
 
 def lambda_handler(event, context):
-    """Data ingestion coordinator: get all active users with Dexcom credentials and enqueue them."""
-    logger.info('Starting data ingestion coordinator: Scanning for active users.')
-
-    users_table = dynamodb.Table(USERS_TABLE)
-    dexcom_table = dynamodb.Table(DEXCOM_CREDENTIALS_TABLE)
-
-    # Scan users table for active users
-    response = users_table.scan(
-        FilterExpression='is_active = :active',
-        ExpressionAttributeValues={':active': True}
-    )
-    active_users = response.get('Items', [])
-
-    # Handle pagination
-    while 'LastEvaluatedKey' in response:
-        response = users_table.scan(
-            ExclusiveStartKey=response['LastEvaluatedKey'],
-            FilterExpression='is_active = :active',
-            ExpressionAttributeValues={':active': True}
-        )
-        active_users.extend(response.get('Items', []))
-
-    logger.info(f'Found {len(active_users)} active users.')
-
-    enqueued_count = 0
-    failed_count = 0
-    skipped_count = 0
-
-    for user in active_users:
-        user_id = user['user_id']
-
-        try:
-            dexcom_response = dexcom_table.get_item(Key={'user_id': user_id})
-            if 'Item' not in dexcom_response:
-                logger.debug(f'User {user_id} has no Dexcom credentials, skipping.')
-                skipped_count += 1
-                continue
-
-            dexcom_creds = dexcom_response['Item']
-        except Exception as e:
-            logger.error(f'Failed to get Dexcom credentials for user {user_id}: {str(e)}')
-            failed_count += 1
-            continue
-
-        try:
-            sqs.send_message(
-                QueueUrl=SQS_QUEUE_URL,
-                MessageBody=json.dumps({
-                    'user_id': user_id,
-                    'access_token': dexcom_creds['access_token'],
-                    'refresh_token': dexcom_creds['refresh_token'],
-                    'expires_at': dexcom_creds['expires_at']
-                })
-            )
-            enqueued_count += 1
-        except Exception as e:
-            logger.error(f'Failed to enqueue user {user_id}: {str(e)}')
-            failed_count += 1
+    """
+    Data ingestion coordinator: enqueue every active user with a connected Dexcom account.
+
+    Messages carry only the user ID; the worker reads current credentials itself, so a
+    token refreshed after enqueueing is never shadowed by a stale copy in the queue.
+
+    Invoked manually with {"mode": "renormalize", "start_date": ..., "end_date": ...}
+    (and optionally "source" and "user_ids"), it instead enqueues jobs that rebuild the
+    users' partitions in that range from the raw archives.
+    """
+    if event.get('mode') == 'renormalize':
+        return enqueue_renormalization(event)
+
+    logger.info('Starting data ingestion coordinator: Querying active users.')
+
+    active_user_ids = list_active_user_ids(dynamodb_client, USERS_TABLE, ACTIVE_USER_SHARDS, lookup_executor)
+    logger.info(f'Found {len(active_user_ids)} active users.')
+
+    enqueue_result = enqueuer.enqueue({'user_id': user_id} for user_id in active_user_ids)
 
     result = {
-        'total_active_users': len(active_users),
-        'enqueued': enqueued_count,
-        'skipped': skipped_count,
-        'failed': failed_count
+        'total_active_users': len(active_user_ids),
+        'enqueued': enqueue_result.enqueued,
+        'failed': enqueue_result.failed
     }
 
     logger.info(f'Data ingestion coordinator completed: {result}')
@@ -87,4 +57,31 @@ def lambda_handler(event, context):
     return {
         'statusCode': 200,
         'body': json.dumps(result)
-    }
\ No newline at end of file
+    }
+
+
+def enqueue_renormalization(event: dict) -> dict:
+    """Enqueue one re-normalization job per user; the workers replay their archives in parallel."""
+    user_ids = event.get('user_ids') or list_active_user_ids(dynamodb_client, USERS_TABLE, ACTIVE_USER_SHARDS, lookup_executor)
+    job = {
+        'mode': 'renormalize',
+        'source': event.get('source', 'dexcom'),
+        'start_date': event['start_date'],
+        'end_date': event['end_date']
+    }
+    logger.info(f'Enqueueing re-normalization of {len(user_ids)} users: {job}')
+
+    enqueue_result = enqueuer.enqueue({**job, 'user_id': user_id} for user_id in user_ids)
+
+    result = {
+        'total_users': len(user_ids),
+        'enqueued': enqueue_result.enqueued,
+        'failed': enqueue_result.failed
+    }
+
+    logger.info(f'Re-normalization enqueue completed: {result}')
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
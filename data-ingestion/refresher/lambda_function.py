@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from time import monotonic
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+from deadlines import submit_until_deadline
+from dexcom_client import DexcomClient
+from dexcom_credentials import EXPIRES_AT_INDEX, refresh_credentials
+from rate_limiter import BucketConfig, DynamoDBBucketStore, InMemoryBucketStore, RateLimiter
+
+DEXCOM_API_BASE_URL = os.environ['DEXCOM_API_BASE_URL']
+DEXCOM_CLIENT_ID = os.environ['DEXCOM_CLIENT_ID']
+DEXCOM_CLIENT_SECRET = os.environ['DEXCOM_CLIENT_SECRET']
+DEXCOM_CREDENTIALS_TABLE = os.environ['DEXCOM_CREDENTIALS_TABLE']
+CREDENTIAL_REFRESH_SHARDS = int(os.environ.get('CREDENTIAL_REFRESH_SHARDS', '8'))
+REFRESH_LOOKAHEAD_MINUTES = int(os.environ.get('REFRESH_LOOKAHEAD_MINUTES', '90'))
+REFRESH_CONCURRENCY = int(os.environ.get('REFRESH_CONCURRENCY', '10'))
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE')
+DEXCOM_GLOBAL_RATE = float(os.environ.get('DEXCOM_GLOBAL_RATE', '10'))
+DEXCOM_GLOBAL_BURST = float(os.environ.get('DEXCOM_GLOBAL_BURST', '20'))
+DEXCOM_TOKEN_RATE = float(os.environ.get('DEXCOM_TOKEN_RATE', '2'))
+TIME_RESERVE_SECONDS = 30
+
+logger = logging.getLogger()
+logger.setLevel(os.environ['LOG_LEVEL'])
+
+# Draws from the same buckets as the ingestion worker, so both stay within Dexcom's quota together
+if RATE_LIMIT_TABLE:
+    rate_limit_store = DynamoDBBucketStore(boto3.client('dynamodb', region_name=os.environ['AWS_REGION']), RATE_LIMIT_TABLE)
+else:
+    rate_limit_store = InMemoryBucketStore()
+dexcom_rate_limiter = RateLimiter(
+    rate_limit_store,
+    name='dexcom',
+    global_config=BucketConfig.per_second(DEXCOM_GLOBAL_RATE, burst=DEXCOM_GLOBAL_BURST),
+    endpoint_configs={'token': BucketConfig.per_second(DEXCOM_TOKEN_RATE)}
+)
+
+# Reused across warm invocations
+refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_CONCURRENCY)
+dexcom_client = DexcomClient(
+    base_url=DEXCOM_API_BASE_URL,
+    client_id=DEXCOM_CLIENT_ID,
+    client_secret=DEXCOM_CLIENT_SECRET,
+    pool_size=REFRESH_CONCURRENCY,
+    rate_limiter=dexcom_rate_limiter
+)
+
+_thread_local = threading.local()
+
+
+def get_credentials_table():
+    """DynamoDB resources are not thread-safe, so each worker thread gets its own."""
+    if not hasattr(_thread_local, 'credentials_table'):
+        session = boto3.session.Session()
+        dynamodb = session.resource('dynamodb', region_name=os.environ['AWS_REGION'])
+        _thread_local.credentials_table = dynamodb.Table(DEXCOM_CREDENTIALS_TABLE)
+    return _thread_local.credentials_table
+
+
+def query_expiring_shard(shard: int, cutoff: str) -> list[dict]:
+    """Credentials in one shard of the expires-at index that expire before the cutoff."""
+    table = get_credentials_table()
+    query_kwargs = {
+        'IndexName': EXPIRES_AT_INDEX,
+        'KeyConditionExpression': Key('refresh_shard').eq(shard) & Key('expires_at').lt(cutoff)
+    }
+
+    credentials = []
+    while True:
+        response = table.query(**query_kwargs)
+        credentials.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return credentials
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def find_expiring_credentials(cutoff: str) -> list[dict]:
+    expiring = []
+    for shard_credentials in refresh_executor.map(
+        lambda shard: query_expiring_shard(shard, cutoff), range(CREDENTIAL_REFRESH_SHARDS)
+    ):
+        expiring.extend(shard_credentials)
+    return expiring
+
+
+def refresh_user(credentials: dict) -> None:
+    refresh_credentials(dexcom_client, get_credentials_table(), credentials, CREDENTIAL_REFRESH_SHARDS)
+
+
+def lambda_handler(event, context):
+    """
+    Token refresher: refresh Dexcom credentials that expire within the lookahead window.
+
+    Runs ahead of the daily ingestion so the worker almost never refreshes on its hot path.
+    Runs at most REFRESH_CONCURRENCY refreshes at a time and starts none once the invocation
+    is about to time out; the remaining credentials are picked up by the worker's inline refresh.
+    """
+    deadline = monotonic() + context.get_remaining_time_in_millis() / 1000 - TIME_RESERVE_SECONDS
+    cutoff = (datetime.now(timezone.utc) + timedelta(minutes=REFRESH_LOOKAHEAD_MINUTES)).isoformat()
+
+    expiring = find_expiring_credentials(cutoff)
+    logger.info(f'Found {len(expiring)} credentials expiring before {cutoff}.')
+
+    submitted, deferred = submit_until_deadline(refresh_executor, refresh_user, expiring, REFRESH_CONCURRENCY, deadline)
+
+    refreshed_count = 0
+    failed_count = 0
+    for credentials, future in submitted:
+        try:
+            future.result()
+            refreshed_count += 1
+        except Exception as e:
+            logger.error(f'Failed to refresh token for user: {credentials["user_id"]}. Error: {str(e)}')
+            failed_count += 1
+
+    result = {
+        'expiring': len(expiring),
+        'refreshed': refreshed_count,
+        'failed': failed_count,
+        'deferred': len(deferred)
+    }
+
+    logger.info(f'Token refresher completed: {result}')
+    logger.info(f'Dexcom client metrics: {json.dumps(dexcom_client.metrics.snapshot())}')
+    logger.info(f'Dexcom rate limiter metrics: {json.dumps(dexcom_rate_limiter.metrics.snapshot())}')
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
@@ -1,25 +1,167 @@
 import json
 import logging
 import os
-from datetime import datetime, timezone, timedelta
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timezone, timedelta
+from typing import Iterable, Iterator, NamedTuple
+from time import monotonic, sleep
 
 import boto3
-import requests
-
-from adapters import DexcomAdapter
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from adapters import DexcomAdapter, NoValidReadingsError, get_adapter
+from dexcom_client import DEXCOM_DATETIME_FORMAT, DexcomClient
+from deadlines import submit_until_deadline
+from dexcom_credentials import refresh_credentials
+from models import GlucoseDataset, GlucoseSeries
+from compaction import split_range
+from manifest import PartitionEntry, apply_manifest_update, load_manifest
+from rate_limiter import BucketConfig, DynamoDBBucketStore, InMemoryBucketStore, RateLimiter
+from rollups import GlucoseRollup
+from storage import (
+    CONDITIONAL_WRITE_CONFLICTS,
+    CONTENT_HASH_METADATA_KEY,
+    FORMAT_VERSIONS,
+    JSON_CONTENT_TYPE,
+    content_hash,
+    deserialize_raw_archive,
+    deserialize_series,
+    key_format,
+    raw_archive_date,
+    raw_archive_key,
+    raw_user_prefix,
+    readings_key,
+    readings_keys,
+    rollup_key,
+    serialize_dataset,
+    serialize_raw_archive
+)
 
 logger = logging.getLogger()
 logger.setLevel(os.environ['LOG_LEVEL'])
 
-dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION'])
-s3 = boto3.client('s3', region_name=os.environ['AWS_REGION'])
-
 DEXCOM_API_BASE_URL = os.environ['DEXCOM_API_BASE_URL']
 DEXCOM_CLIENT_ID = os.environ['DEXCOM_CLIENT_ID']
 DEXCOM_CLIENT_SECRET = os.environ['DEXCOM_CLIENT_SECRET']
 DEXCOM_CREDENTIALS_TABLE = os.environ['DEXCOM_CREDENTIALS_TABLE']
 S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
-DEXCOM_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+NORMALIZED_FORMAT = os.environ.get('NORMALIZED_FORMAT', 'binary')  # 'binary' or 'json'
+INGESTION_CONCURRENCY = int(os.environ.get('INGESTION_CONCURRENCY', '10'))
+DEXCOM_CONNECT_TIMEOUT = float(os.environ.get('DEXCOM_CONNECT_TIMEOUT', '3.05'))
+DEXCOM_READ_TIMEOUT = float(os.environ.get('DEXCOM_READ_TIMEOUT', '30'))
+DEXCOM_MAX_RETRIES = int(os.environ.get('DEXCOM_MAX_RETRIES', '3'))
+CREDENTIAL_REFRESH_SHARDS = int(os.environ.get('CREDENTIAL_REFRESH_SHARDS', '8'))
+CREDENTIAL_CACHE_TTL_SECONDS = int(os.environ.get('CREDENTIAL_CACHE_TTL_SECONDS', '300'))
+DEXCOM_MAX_RANGE_DAYS = 30  # Maximum EGV query window allowed by the Dexcom API
+PARTITION_WRITE_ATTEMPTS = 3
+RAW_SOURCE = 'dexcom'  # Source name of the raw archives this worker writes
+BATCH_GET_SIZE = 100  # DynamoDB BatchGetItem limit
+BATCH_GET_MAX_ATTEMPTS = 5
+CREDENTIAL_ATTRIBUTES = (
+    'user_id', 'access_token', 'refresh_token', 'expires_at', 'last_ingested_system_time', 'backfill_completed_windows'
+)
+SQS_QUEUE_URL = os.environ['SQS_QUEUE_URL']
+BACKFILL_WINDOW_DAYS = int(os.environ.get('BACKFILL_WINDOW_DAYS', str(DEXCOM_MAX_RANGE_DAYS)))
+BACKFILL_CONCURRENCY = int(os.environ.get('BACKFILL_CONCURRENCY', '3'))
+BACKFILL_TIME_RESERVE_SECONDS = 60
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE')
+DEXCOM_GLOBAL_RATE = float(os.environ.get('DEXCOM_GLOBAL_RATE', '10'))
+DEXCOM_GLOBAL_BURST = float(os.environ.get('DEXCOM_GLOBAL_BURST', '20'))
+DEXCOM_EGVS_RATE = float(os.environ.get('DEXCOM_EGVS_RATE', '8'))
+DEXCOM_TOKEN_RATE = float(os.environ.get('DEXCOM_TOKEN_RATE', '2'))
+
+# Clients are thread-safe; the connection pool covers every concurrent user plus rollup writes
+s3 = boto3.client('s3', region_name=os.environ['AWS_REGION'], config=Config(max_pool_connections=INGESTION_CONCURRENCY * 2))
+sqs = boto3.client('sqs', region_name=os.environ['AWS_REGION'])
+
+# One limiter for every worker execution; falls back to a per-process bucket when no table is configured
+if RATE_LIMIT_TABLE:
+    rate_limit_store = DynamoDBBucketStore(boto3.client('dynamodb', region_name=os.environ['AWS_REGION']), RATE_LIMIT_TABLE)
+else:
+    rate_limit_store = InMemoryBucketStore()
+dexcom_rate_limiter = RateLimiter(
+    rate_limit_store,
+    name='dexcom',
+    global_config=BucketConfig.per_second(DEXCOM_GLOBAL_RATE, burst=DEXCOM_GLOBAL_BURST),
+    endpoint_configs={
+        'egvs': BucketConfig.per_second(DEXCOM_EGVS_RATE),
+        'token': BucketConfig.per_second(DEXCOM_TOKEN_RATE)
+    }
+)
+
+# Reused across warm invocations; backfill windows get their own pool so they never wait on user slots
+ingestion_executor = ThreadPoolExecutor(max_workers=INGESTION_CONCURRENCY)
+backfill_executor = ThreadPoolExecutor(max_workers=BACKFILL_CONCURRENCY)
+dexcom_client = DexcomClient(
+    base_url=DEXCOM_API_BASE_URL,
+    client_id=DEXCOM_CLIENT_ID,
+    client_secret=DEXCOM_CLIENT_SECRET,
+    connect_timeout=DEXCOM_CONNECT_TIMEOUT,
+    read_timeout=DEXCOM_READ_TIMEOUT,
+    max_retries=DEXCOM_MAX_RETRIES,
+    pool_size=INGESTION_CONCURRENCY,
+    rate_limiter=dexcom_rate_limiter
+)
+
+_thread_local = threading.local()
+
+
+class CredentialCache:
+    """
+    Dexcom credentials kept in the warm container for a short TTL.
+
+    Saves a DynamoDB read per message for users seen in recent invocations. Entries
+    also carry the ingestion watermark and backfill checkpoint, and are kept in step
+    with this worker's own writes to them.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[user_id]
+                return None
+            return entry[1]
+
+    def put(self, credentials: dict) -> None:
+        with self._lock:
+            self._entries[credentials['user_id']] = (monotonic(), credentials)
+
+    def update(self, user_id: str, attributes: dict) -> None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0], {**entry[1], **attributes})
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+credential_cache = CredentialCache(CREDENTIAL_CACHE_TTL_SECONDS)
+
+
+def get_dynamodb():
+    """DynamoDB resources are not thread-safe, so each worker thread gets its own."""
+    if not hasattr(_thread_local, 'dynamodb'):
+        session = boto3.session.Session()
+        _thread_local.dynamodb = session.resource('dynamodb', region_name=os.environ['AWS_REGION'])
+    return _thread_local.dynamodb
+
+
+def get_credentials_table():
+    return get_dynamodb().Table(DEXCOM_CREDENTIALS_TABLE)
 
 
 def is_token_expired(credentials: dict) -> bool:
@@ -30,122 +172,631 @@ def is_token_expired(credentials: dict) -> bool:
     return current_time >= (expires_at - 300) # 5 minute buffer
 
 def refresh_access_token(credentials: dict) -> str:
-    url = f'{DEXCOM_API_BASE_URL}/v2/oauth2/token'
-    data = {
-        'client_id': DEXCOM_CLIENT_ID,
-        'client_secret': DEXCOM_CLIENT_SECRET,
-        'refresh_token': credentials['refresh_token'],
-        'grant_type': 'refresh_token'
-    }
+    refreshed = refresh_credentials(dexcom_client, get_credentials_table(), credentials, CREDENTIAL_REFRESH_SHARDS)
+    credential_cache.put(refreshed)
+    return refreshed['access_token']
+
+def load_credentials(user_id: str) -> dict:
+    response = get_credentials_table().get_item(
+        Key={'user_id': user_id},
+        ProjectionExpression=', '.join(CREDENTIAL_ATTRIBUTES),
+        ConsistentRead=True
+    )
+    if 'Item' not in response:
+        raise ValueError(f'No Dexcom credentials for user: {user_id}.')
+    credential_cache.put(response['Item'])
+    return response['Item']
+
+def prefetch_credentials(user_ids: list[str]) -> None:
+    """Warm the cache for a batch of users with BatchGetItem, retrying unprocessed keys."""
+    missing = sorted({user_id for user_id in user_ids if credential_cache.get(user_id) is None})
+    dynamodb = get_dynamodb()
+
+    for i in range(0, len(missing), BATCH_GET_SIZE):
+        request = {
+            DEXCOM_CREDENTIALS_TABLE: {
+                'Keys': [{'user_id': user_id} for user_id in missing[i:i + BATCH_GET_SIZE]],
+                'ProjectionExpression': ', '.join(CREDENTIAL_ATTRIBUTES)
+            }
+        }
 
-    response = requests.post(
-        url,
-        data=data,
-        headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+            if attempt > 0:
+                sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(DEXCOM_CREDENTIALS_TABLE, []):
+                credential_cache.put(item)
+
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+        # Users still missing fall back to a single read in get_access_token
+
+def get_cached_credentials(user_id: str) -> dict:
+    return credential_cache.get(user_id) or load_credentials(user_id)
+
+def get_watermark(user_id: str) -> str | None:
+    """
+    Return the systemTime of the last ingested reading, or None if never ingested.
+
+    Read from the cached credentials item. If another container advanced it since, the
+    readings past the stale value are fetched again and merge as no-ops.
+    """
+    return get_cached_credentials(user_id).get('last_ingested_system_time')
+
+def advance_watermark(user_id: str, system_time: str) -> None:
+    """Move the watermark forward; never moves it backwards if a concurrent run got further."""
+    try:
+        get_credentials_table().update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='SET last_ingested_system_time = :wm',
+            ConditionExpression='attribute_not_exists(last_ingested_system_time) OR last_ingested_system_time < :wm',
+            ExpressionAttributeValues={':wm': system_time}
+        )
+        credential_cache.update(user_id, {'last_ingested_system_time': system_time})
+        logger.info(f'Advanced watermark for user: {user_id} to {system_time}.')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        credential_cache.invalidate(user_id)
+        logger.info(f'Watermark for user: {user_id} is already past {system_time}.')
+
+def ingestion_window(watermark: str | None) -> tuple[datetime, datetime]:
+    """
+    The range to fetch past the watermark.
+
+    Without a watermark, starts at the beginning of the previous UTC day. The window never
+    exceeds the API's maximum range, so a long-idle user catches up over several runs.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    if watermark:
+        start_date = datetime.strptime(watermark, DEXCOM_DATETIME_FORMAT).replace(tzinfo=timezone.utc)
+    else:
+        start_date = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0)
+
+    return start_date, min(now, start_date + timedelta(days=DEXCOM_MAX_RANGE_DAYS))
+
+def fetch_glucose_readings(access_token: str, watermark: str | None, window: tuple[datetime, datetime]) -> Iterator[dict]:
+    """Stream glucose readings from Dexcom API recorded in the window after the watermark."""
+    records = dexcom_client.iter_egvs(access_token, window[0], window[1])
+
+    # startDate is inclusive; drop the reading the watermark already covers
+    if watermark:
+        records = (r for r in records if r.get('systemTime', '') > watermark)
+    return records
+
+def iter_readings_days(raw_readings: Iterable[dict]) -> Iterator[tuple[str, list[dict]]]:
+    """
+    Group a stream of raw readings into runs sharing the UTC date of their systemTime.
+
+    Dexcom returns readings in time order, so each day arrives as one run and only one
+    day is held at a time. A day split across runs is yielded once per run; writing the
+    runs one after another merges them into the same partition.
+    """
+    readings_date, day_readings = None, []
+    for raw_reading in raw_readings:
+        system_time = raw_reading.get('systemTime')
+        if not system_time:
+            logger.warning('Skipping reading without systemTime.')
+            continue
+        if system_time[:10] != readings_date:
+            if day_readings:
+                yield readings_date, day_readings
+            readings_date, day_readings = system_time[:10], []
+        day_readings.append(raw_reading)
+    if day_readings:
+        yield readings_date, day_readings
+
+def save_days(user_id: str, raw_readings: Iterable[dict]) -> tuple[list[PartitionEntry], str | None]:
+    """
+    Write each day of a reading stream as it completes.
+
+    Returns the entries of the partitions written and the latest systemTime consumed,
+    including that of days with no valid reading, so the watermark moves past them.
+    """
+    entries = []
+    latest = None
+    for readings_date, day_readings in iter_readings_days(raw_readings):
+        entry = save_to_s3(user_id, readings_date, day_readings)
+        if entry is not None:
+            entries.append(entry)
+        latest = max(latest or '', max(r['systemTime'] for r in day_readings))
+    return entries, latest
+
+class StoredPartition(NamedTuple):
+    series: GlucoseSeries
+    s3_key: str
+    etag: str
+    size: int
+    sealed: bool = False  # Read from the sealed monthly container holding the day, not a daily partition
+
+def load_partition(user_id: str, readings_date: str) -> StoredPartition | None:
+    """
+    Load an existing normalized partition in whichever format it was written.
+
+    A day of a sealed month has no daily partition; its copy in the month's container is
+    loaded instead, so new readings are merged into it rather than replacing it.
+    """
+    for s3_key in readings_keys(user_id, readings_date):
+        try:
+            response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+        except s3.exceptions.NoSuchKey:
+            continue
+        body = response['Body'].read()
+        series = deserialize_series(body, response.get('ContentType'))
+        return StoredPartition(series, s3_key, response['ETag'], len(body))
+    return load_sealed_partition(user_id, readings_date)
+
+def load_sealed_partition(user_id: str, readings_date: str) -> StoredPartition | None:
+    """A day's copy in its sealed monthly container, if it has one."""
+    # Only closed months are sealed, so the current month's days never need the manifest read
+    if readings_date >= datetime.now(timezone.utc).date().replace(day=1).isoformat():
+        return None
+
+    manifest, _ = load_manifest(s3, S3_BUCKET_NAME, user_id)
+    compacted = manifest.sealed_container(readings_date) if manifest is not None else None
+    if compacted is None:
+        return None
+
+    start, end = compacted.byte_range([readings_date])
+    response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=compacted.key, Range=f'bytes={start}-{end}', IfMatch=compacted.etag)
+    bodies = split_range(compacted, [readings_date], response['Body'].read(), start)[readings_date]
+    series = deserialize_series(bodies.readings, bodies.readings_content_type)
+    return StoredPartition(series, compacted.key, response['ETag'], len(bodies.readings), sealed=True)
+
+def partition_entry(readings_date: str, s3_key: str, series: GlucoseSeries, series_hash: str, size: int) -> PartitionEntry:
+    fmt = key_format(s3_key)
+    return PartitionEntry(
+        readings_date=readings_date,
+        key=s3_key,
+        format=fmt,
+        format_version=FORMAT_VERSIONS[fmt],
+        bytes=size,
+        count=len(series),
+        content_hash=series_hash,
+        first_timestamp=min(series.timestamps) if series else None,
+        last_timestamp=max(series.timestamps) if series else None
     )
 
-    response.raise_for_status()
-    token_data = response.json()
+def write_partition(dataset: GlucoseDataset, series_hash: str, condition: dict) -> PartitionEntry:
+    """
+    Write the day's rollup, then its readings with a conditional put.
 
-    expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data['expires_in'])
+    The rollup goes first: if the readings write then fails, the processor sees a rollup
+    whose count disagrees with the readings and falls back to the raw readings.
+    """
+    user_id, readings_date = dataset.user_id, dataset.readings_date_utc
+    series = dataset.to_series()
 
-    table = dynamodb.Table(DEXCOM_CREDENTIALS_TABLE)
-    table.update_item(
-        Key={'user_id': credentials['user_id']},
-        UpdateExpression='SET access_token = :token, expires_at = :expires',
-        ExpressionAttributeValues={
-            ':token': token_data['access_token'],
-            ':expires': expires_at.isoformat()
-        }
+    # Daily rollup lets processing aggregate any window without rereading readings
+    s3_rollup_key = rollup_key(user_id, readings_date)
+    s3.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_rollup_key,
+        Body=json.dumps(GlucoseRollup.from_series(series).to_dict()),
+        ContentType=JSON_CONTENT_TYPE,
+        Metadata={CONTENT_HASH_METADATA_KEY: series_hash}
     )
 
-    logger.info(f'Token refreshed for user: {credentials["user_id"]}.')
-    return token_data['access_token']
+    s3_key = readings_key(user_id, readings_date, NORMALIZED_FORMAT)
+    body, content_type = serialize_dataset(dataset, NORMALIZED_FORMAT)
+    s3.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_key,
+        Body=body,
+        ContentType=content_type,
+        Metadata={CONTENT_HASH_METADATA_KEY: series_hash},
+        **condition
+    )
 
-def fetch_glucose_readings(access_token: str) -> list[dict]:
-    """Fetch glucose readings from Dexcom API for previous day (UTC)."""
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1))
-    start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = start_date + timedelta(days=1)
+    logger.info(f'Saved {len(series)} normalized readings and rollup to S3://{S3_BUCKET_NAME}/{s3_key} for user: {user_id}.')
+    return partition_entry(readings_date, s3_key, series, series_hash, len(body))
 
-    url = f'{DEXCOM_API_BASE_URL}/v3/users/self/egvs'
-    params = {
-        'startDate': start_date.strftime(DEXCOM_DATETIME_FORMAT),
-        'endDate': end_date.strftime(DEXCOM_DATETIME_FORMAT)
-    }
+def archive_raw_readings(user_id: str, readings_date: str, raw_readings: list[dict], fetched_at: str) -> None:
+    """
+    Keep the day's records exactly as Dexcom returned them, so they can be re-normalized without re-fetching.
 
-    response = requests.get(
-        url,
-        params=params,
-        headers={'Authorization': f'Bearer {access_token}'}
+    The key follows the records, not the fetch time, so a retried run overwrites its
+    earlier archive rather than adding another.
+    """
+    s3_key = raw_archive_key(RAW_SOURCE, user_id, readings_date, max(r['systemTime'] for r in raw_readings))
+    s3.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_key,
+        Body=serialize_raw_archive(RAW_SOURCE, DexcomAdapter.API_VERSION, user_id, readings_date, fetched_at, raw_readings),
+        ContentType=JSON_CONTENT_TYPE,
+        ContentEncoding='gzip'
     )
+    logger.debug(f'Archived {len(raw_readings)} raw readings to S3://{S3_BUCKET_NAME}/{s3_key}.')
 
-    if response.status_code != 200:
-        logger.error(f'Dexcom API error: {response.status_code} - {response.text}')
-
-    response.raise_for_status()
+def save_to_s3(user_id: str, readings_date: str, raw_readings: list[dict]) -> PartitionEntry | None:
+    """
+    Archive the raw readings, normalize them and merge them into the day's partition in S3.
 
-    data = response.json()
-    return data.get('records', data.get('egvs', []))
-
-def save_to_s3(user_id: str, raw_readings: list[dict]) -> None:
-    """Save glucose readings to S3 in normalized format."""
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1))
-    readings_date = yesterday.strftime('%Y-%m-%d')
+    Returns the manifest entry describing the stored partition, or None when none of the
+    readings is valid (e.g. a lone null EGV). Such a day is archived but not written, so
+    a fixed adapter can still recover it by re-normalization. None is also returned when
+    the readings are already in the day's sealed container.
+    """
     ingested_at = datetime.now(timezone.utc).isoformat()
+    archive_raw_readings(user_id, readings_date, raw_readings, ingested_at)
 
     adapter = DexcomAdapter()
-    normalized_dataset = adapter.normalize_dataset(
-        user_id=user_id,
-        readings_date_utc=readings_date,
-        ingested_at_utc=ingested_at,
-        raw_readings=raw_readings
+    try:
+        normalized_dataset = adapter.normalize_dataset(
+            user_id=user_id,
+            readings_date_utc=readings_date,
+            ingested_at_utc=ingested_at,
+            raw_readings=raw_readings
+        )
+    except NoValidReadingsError as e:
+        logger.warning(f'Skipping {len(raw_readings)} reading(s) for user: {user_id}, date: {readings_date}. {e}')
+        return None
+    return merge_partition(normalized_dataset)
+
+def merge_partition(normalized_dataset: GlucoseDataset) -> PartitionEntry | None:
+    """
+    Merge a normalized dataset into the day's partition in S3, together with its rollup.
+
+    Where the stored partition already holds a reading for the same timestamp, the
+    incoming value wins. Nothing is written when the merge leaves the stored readings
+    unchanged, so retries and reruns don't pile up object versions; None is returned if
+    the day's copy is in a sealed container, which stays its only copy. Writes are
+    conditional on the version that was merged into; if a concurrent run wrote first, the
+    merge is redone against its result.
+    """
+    user_id, readings_date = normalized_dataset.user_id, normalized_dataset.readings_date_utc
+    incoming = normalized_dataset.to_series()
+    target_key = readings_key(user_id, readings_date, NORMALIZED_FORMAT)
+
+    for attempt in range(PARTITION_WRITE_ATTEMPTS):
+        series = incoming
+        condition = {'IfNoneMatch': '*'}
+
+        # Sorted merge with the readings already stored for the day; redelivered readings collapse
+        stored = load_partition(user_id, readings_date)
+        if stored is not None:
+            series = stored.series.merge(incoming)
+            if stored.sealed and content_hash(series) == content_hash(stored.series):
+                logger.info(f'No new readings for user: {user_id}, date: {readings_date}; its sealed copy is current.')
+                return None
+            if stored.s3_key == target_key:
+                series_hash = content_hash(series)
+                if series_hash == content_hash(stored.series):
+                    logger.info(f'No new readings for user: {user_id}, date: {readings_date}; skipping upload.')
+                    return partition_entry(readings_date, stored.s3_key, stored.series, series_hash, stored.size)
+                condition = {'IfMatch': stored.etag}
+            logger.info(f'Merged {len(incoming)} new readings into {len(stored.series)} existing for user: {user_id}, date: {readings_date}.')
+
+        normalized_dataset.readings = series
+        try:
+            return write_partition(normalized_dataset, content_hash(series), condition)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in CONDITIONAL_WRITE_CONFLICTS:
+                raise
+            logger.info(f'Partition for user: {user_id}, date: {readings_date} changed concurrently; re-merging (attempt {attempt + 1}).')
+
+    raise RuntimeError(f'Could not write partition for user: {user_id}, date: {readings_date} after {PARTITION_WRITE_ATTEMPTS} attempts.')
+
+def update_manifest(user_id: str, entries: list[PartitionEntry]) -> None:
+    """Record written partitions in the user's manifest, re-applying the update if another run wrote first."""
+    apply_manifest_update(s3, S3_BUCKET_NAME, user_id, lambda manifest: manifest.upsert(entries))
+
+def get_access_token(user_id: str) -> str:
+    """Return a valid access token, refreshing it first if it is about to expire."""
+    credentials = get_cached_credentials(user_id)
+
+    if is_token_expired(credentials):
+        # The refresher may have rotated the tokens since they were cached; a stale refresh token would be rejected
+        credential_cache.invalidate(user_id)
+        credentials = load_credentials(user_id)
+
+    if is_token_expired(credentials):
+        logger.info(f'Token expired for user: {user_id}, refreshing...')
+        return refresh_access_token(credentials)
+    return credentials['access_token']
+
+def ingest_user(message_body: dict) -> None:
+    """Refresh the user's token if needed, fetch readings past their watermark and merge them into S3."""
+    user_id = message_body['user_id']
+
+    logger.info(f'Processing data ingestion request for user: {user_id}.')
+
+    access_token = get_access_token(user_id)
+
+    watermark = get_watermark(user_id)
+    window = ingestion_window(watermark)
+    entries, latest = save_days(user_id, fetch_glucose_readings(access_token, watermark, window))
+
+    if latest is None:
+        logger.info(f'No new readings since {watermark} for user: {user_id}.')
+        if watermark and window[1] - window[0] >= timedelta(days=DEXCOM_MAX_RANGE_DAYS):
+            # A full window with no readings is a sensor gap; step over it or the next run fetches it again
+            advance_watermark(user_id, window[1].strftime(DEXCOM_DATETIME_FORMAT))
+        return
+
+    if entries:
+        update_manifest(user_id, entries)
+
+    # Only advance once every partition is written, so a failed run is retried in full
+    advance_watermark(user_id, latest)
+    logger.info(f'Successfully processed data for user: {user_id}.')
+
+def backfill_windows(start_date: date, end_date: date) -> list[tuple[datetime, datetime]]:
+    """Split an inclusive date range into day-aligned windows within the API's maximum range."""
+    window = timedelta(days=min(BACKFILL_WINDOW_DAYS, DEXCOM_MAX_RANGE_DAYS))
+    cursor = datetime.combine(start_date, time.min, tzinfo=timezone.utc)
+    range_end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+    windows = []
+    while cursor < range_end:
+        window_end = min(cursor + window, range_end)
+        windows.append((cursor, window_end))
+        cursor = window_end
+    return windows
+
+def window_checkpoint_id(window: tuple[datetime, datetime]) -> str:
+    return f'{window[0]:%Y-%m-%d}/{window[1]:%Y-%m-%d}'
+
+def get_backfill_checkpoint(user_id: str) -> set[str]:
+    """Windows of earlier (possibly timed-out) backfill runs that completed."""
+    return set(get_cached_credentials(user_id).get('backfill_completed_windows', set()))
+
+def checkpoint_backfill_window(user_id: str, window_id: str) -> None:
+    get_credentials_table().update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='ADD backfill_completed_windows :w',
+        ExpressionAttributeValues={':w': {window_id}}
     )
+    credential_cache.invalidate(user_id)
 
-    s3_key = f'normalized/user_id={user_id}/readings_date={readings_date}/readings.json'
-
-    s3.put_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=s3_key,
-        Body=json.dumps(normalized_dataset.to_dict(), indent=2),
-        ContentType='application/json'
+def clear_backfill_checkpoint(user_id: str, window_ids: set[str]) -> None:
+    get_credentials_table().update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='DELETE backfill_completed_windows :w',
+        ExpressionAttributeValues={':w': window_ids}
     )
+    credential_cache.invalidate(user_id)
+
+def backfill_window(user_id: str, access_token: str, window: tuple[datetime, datetime]) -> str | None:
+    """Fetch one window and write a partition per day. Returns the latest systemTime written."""
+    records = dexcom_client.iter_egvs(access_token, window[0], window[1])
+
+    # endDate is inclusive; readings on the boundary belong to the next window's first day
+    window_end = window[1].strftime(DEXCOM_DATETIME_FORMAT)
+    entries, latest = save_days(user_id, (r for r in records if r.get('systemTime', '') < window_end))
+    if entries:
+        update_manifest(user_id, entries)
+
+    checkpoint_backfill_window(user_id, window_checkpoint_id(window))
+    logger.info(f'Backfilled {len(entries)} day(s) of readings for user: {user_id}, window: {window_checkpoint_id(window)}.')
+    return latest
+
+def backfill_user(message_body: dict, deadline: float) -> None:
+    """
+    Backfill a date range of readings for a user, resuming from the last checkpoint.
+
+    Windows are fetched concurrently under the shared Dexcom rate limit, at most
+    BACKFILL_CONCURRENCY at a time. If the invocation runs low on time, no new windows are
+    started and the message is re-enqueued; the checkpoint skips the windows that finished.
+    """
+    user_id = message_body['user_id']
+    start_date = date.fromisoformat(message_body['start_date'])
+    end_date = date.fromisoformat(message_body['end_date'])
+
+    windows = backfill_windows(start_date, end_date)
+    completed = get_backfill_checkpoint(user_id)
+    pending = [w for w in windows if window_checkpoint_id(w) not in completed]
+
+    logger.info(f'Backfilling user: {user_id} from {start_date} to {end_date}: {len(pending)} of {len(windows)} window(s) pending.')
+
+    if pending:
+        access_token = get_access_token(user_id)
+
+        submitted, unsubmitted = submit_until_deadline(
+            backfill_executor,
+            lambda window: backfill_window(user_id, access_token, window),
+            pending,
+            BACKFILL_CONCURRENCY,
+            deadline
+        )
+
+        latest_system_times = [future.result() for _, future in submitted]
+        latest = max((t for t in latest_system_times if t), default=None)
+        if latest:
+            advance_watermark(user_id, latest)
+
+        if unsubmitted:
+            logger.info(f'Backfill for user: {user_id} ran out of time, re-enqueueing {len(unsubmitted)} window(s).')
+            sqs.send_message(QueueUrl=SQS_QUEUE_URL, MessageBody=json.dumps(message_body))
+            return
+
+    # Every day of the range is now listed, so the manifest can vouch for the ones it doesn't list
+    apply_manifest_update(s3, S3_BUCKET_NAME, user_id, lambda manifest: manifest.extend_coverage(start_date, end_date))
+
+    clear_backfill_checkpoint(user_id, {window_checkpoint_id(w) for w in windows})
+    logger.info(f'Backfill complete for user: {user_id}.')
+
+def list_raw_archives(source: str, user_id: str, start_date: date, end_date: date) -> dict[str, list[str]]:
+    """Raw archive keys per readings date in the inclusive range, oldest fetch first."""
+    prefix = f'{raw_user_prefix(source, user_id)}/'
+    list_kwargs = {
+        'Bucket': S3_BUCKET_NAME,
+        'Prefix': prefix,
+        'StartAfter': f'{prefix}readings_date={start_date.isoformat()}'  # Keys sort by date; skips earlier days
+    }
 
-    logger.info(f'Saved {len(normalized_dataset.readings)} normalized readings to S3://{S3_BUCKET_NAME}/{s3_key} for user: {user_id}.')
-
-def lambda_handler(event, context):
-    """Data ingestion worker: process a single user's data ingestion request from SQS."""
-    for record in event['Records']:
-        message_body = json.loads(record['body'])
-        user_id = message_body['user_id']
+    archives = defaultdict(list)
+    while True:
+        response = s3.list_objects_v2(**list_kwargs)
+        for obj in response.get('Contents', []):
+            readings_date = raw_archive_date(obj['Key'])
+            if readings_date > end_date.isoformat():
+                return dict(archives)
+            archives[readings_date].append(obj['Key'])
+        if not response.get('IsTruncated'):
+            return dict(archives)
+        list_kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+def load_archived_records(archive_keys: list[str]) -> list[dict]:
+    """A day's archived records, with later fetches of the same reading replacing earlier ones."""
+    records = {}
+    for s3_key in archive_keys:
+        archive = deserialize_raw_archive(s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)['Body'].read())
+        for record in archive['records']:
+            records[(record.get('systemTime'), record.get('displayTime'))] = record
+    return list(records.values())
+
+def renormalize_date(source: str, user_id: str, readings_date: str, archive_keys: list[str]) -> PartitionEntry | None:
+    """
+    Replay a day's raw archives through the source's adapter and write the result over its partition.
+
+    The partition is replaced, not merged into, so readings an earlier adapter normalized
+    wrongly are removed or re-timed. The write is conditional on the partition it replaces;
+    if an ingestion merged new readings meanwhile, their archives are listed again and the
+    day is replayed. Returns None, leaving the partition alone, if no archived reading is
+    valid or the result matches the day's sealed container copy.
+    """
+    day = date.fromisoformat(readings_date)
+    target_key = readings_key(user_id, readings_date, NORMALIZED_FORMAT)
+
+    for attempt in range(PARTITION_WRITE_ATTEMPTS):
+        if attempt > 0:
+            archive_keys = list_raw_archives(source, user_id, day, day).get(readings_date, archive_keys)
 
-        logger.info(f'Processing data ingestion request for user: {user_id}.')
+        try:
+            normalized_dataset = get_adapter(source).normalize_dataset(
+                user_id=user_id,
+                readings_date_utc=readings_date,
+                ingested_at_utc=datetime.now(timezone.utc).isoformat(),
+                raw_readings=load_archived_records(archive_keys)
+            )
+        except NoValidReadingsError as e:
+            logger.warning(f'Keeping partition for user: {user_id}, date: {readings_date}; archives hold no valid reading. {e}')
+            return None
+
+        # Sorted with duplicate timestamps collapsed, as merged partitions are
+        normalized = normalized_dataset.to_series()
+        series = GlucoseSeries(unit=normalized.unit).merge(normalized)
+        normalized_dataset.readings = series
+        series_hash = content_hash(series)
+
+        condition = {'IfNoneMatch': '*'}
+        stored = load_partition(user_id, readings_date)
+        if stored is not None and stored.sealed and content_hash(stored.series) == series_hash:
+            logger.info(f'Re-normalized partition for user: {user_id}, date: {readings_date} matches its sealed copy; skipping upload.')
+            return None
+        if stored is not None and stored.s3_key == target_key:
+            if content_hash(stored.series) == series_hash:
+                logger.info(f'Re-normalized partition for user: {user_id}, date: {readings_date} is unchanged; skipping upload.')
+                return partition_entry(readings_date, stored.s3_key, stored.series, series_hash, stored.size)
+            condition = {'IfMatch': stored.etag}
 
         try:
-            credentials = {
-                'user_id': user_id,
-                'access_token': message_body['access_token'],
-                'refresh_token': message_body['refresh_token'],
-                'expires_at': message_body['expires_at']
-            }
+            return write_partition(normalized_dataset, series_hash, condition)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in CONDITIONAL_WRITE_CONFLICTS:
+                raise
+            logger.info(f'Partition for user: {user_id}, date: {readings_date} changed during re-normalization; replaying (attempt {attempt + 1}).')
+
+    raise RuntimeError(f'Could not rewrite partition for user: {user_id}, date: {readings_date} after {PARTITION_WRITE_ATTEMPTS} attempts.')
+
+def renormalize_user(message_body: dict, deadline: float) -> None:
+    """
+    Rebuild a user's partitions in a date range from the raw archives, without calling Dexcom.
+
+    Each day with archives is rewritten from them alone, so only days archived in full
+    should be replayed: readings ingested before archiving began are not kept. Days are
+    replayed concurrently, at most BACKFILL_CONCURRENCY at a time. Every rewritten day is
+    recorded in the manifest even if others fail; the failures then fail the message. If
+    the invocation runs low on time, the days not started are re-enqueued.
+    """
+    user_id = message_body['user_id']
+    source = message_body.get('source', RAW_SOURCE)
+    start_date = date.fromisoformat(message_body['start_date'])
+    end_date = date.fromisoformat(message_body['end_date'])
+
+    archives = sorted(list_raw_archives(source, user_id, start_date, end_date).items())
+    logger.info(f'Re-normalizing {len(archives)} day(s) of {source} archives for user: {user_id} from {start_date} to {end_date}.')
+
+    submitted, unsubmitted = submit_until_deadline(
+        backfill_executor,
+        lambda day: renormalize_date(source, user_id, *day),
+        archives,
+        BACKFILL_CONCURRENCY,
+        deadline
+    )
 
-            access_token = credentials['access_token']
-            if is_token_expired(credentials):
-                logger.info(f'Token expired for user: {user_id}, refreshing...')
-                access_token = refresh_access_token(credentials)
+    entries = []
+    failed_dates = []
+    for (readings_date, _), future in submitted:
+        try:
+            entry = future.result()
+        except Exception as e:
+            logger.error(f'Failed to re-normalize user: {user_id}, date: {readings_date}. Error: {str(e)}')
+            failed_dates.append(readings_date)
+            continue
+        if entry is not None:
+            entries.append(entry)
+
+    if entries:
+        update_manifest(user_id, entries)
+
+    if failed_dates:
+        raise RuntimeError(f'Re-normalization failed for {len(failed_dates)} day(s) for user: {user_id}: {", ".join(failed_dates)}.')
+
+    if unsubmitted:
+        resume_date = unsubmitted[0][0]
+        logger.info(f'Re-normalization for user: {user_id} ran out of time, re-enqueueing from {resume_date}.')
+        sqs.send_message(QueueUrl=SQS_QUEUE_URL, MessageBody=json.dumps({**message_body, 'start_date': resume_date}))
+        return
+
+    logger.info(f'Re-normalization complete for user: {user_id}.')
+
+def process_record(record: dict, deadline: float) -> None:
+    message_body = json.loads(record['body'])
+
+    try:
+        if message_body.get('mode') == 'backfill':
+            backfill_user(message_body, deadline)
+        elif message_body.get('mode') == 'renormalize':
+            renormalize_user(message_body, deadline)
+        else:
+            ingest_user(message_body)
+    except Exception as e:
+        logger.error(f'Error processing data for user: {message_body.get("user_id")}. Error: {str(e)}')
+        raise
 
-            readings = fetch_glucose_readings(access_token)
+def lambda_handler(event, context):
+    """
+    Data ingestion worker: ingest a batch of users from SQS concurrently.
+
+    Messages with mode 'backfill' fetch a historical date range instead of new readings;
+    mode 'renormalize' rebuilds a date range from the raw archives.
+    Returns per-record failures so only the failed users are retried.
+    """
+    # Stop starting new backfill windows while there is still time to finish the running ones
+    deadline = monotonic() + context.get_remaining_time_in_millis() / 1000 - BACKFILL_TIME_RESERVE_SECONDS
+
+    records = event['Records']
+    try:
+        prefetch_credentials([json.loads(record['body'])['user_id'] for record in records])
+    except Exception as e:
+        logger.warning(f'Failed to prefetch credentials, falling back to per-user reads. Error: {str(e)}')
+
+    futures = [(record, ingestion_executor.submit(process_record, record, deadline)) for record in records]
+
+    batch_item_failures = []
+    for record, future in futures:
+        try:
+            future.result()
+        except Exception:
+            batch_item_failures.append({'itemIdentifier': record['messageId']})
 
-            if readings:
-                save_to_s3(user_id, readings)
-                logger.info(f'Successfully processed data for user: {user_id}.')
-            else:
-                logger.warning(f'No readings found for user: {user_id}.')
-        except Exception as e:
-            logger.error(f'Error processing data for user: {user_id}. Error: {str(e)}')
-            raise
+    logger.info(f'Ingestion batch complete. Records: {len(records)}, failed: {len(batch_item_failures)}.')
+    logger.info(f'Dexcom client metrics: {json.dumps(dexcom_client.metrics.snapshot())}')
+    logger.info(f'Dexcom rate limiter metrics: {json.dumps(dexcom_rate_limiter.metrics.snapshot())}')
 
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'message': 'Batch processed successfully'})
-    }
\ No newline at end of file
+    return {'batchItemFailures': batch_item_failures}
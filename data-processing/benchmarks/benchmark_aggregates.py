@@ -0,0 +1,81 @@
+"""
+Benchmark calculate_aggregates against the original per-reading implementation.
+
+Run from the repository root:
+    python data-processing/benchmarks/benchmark_aggregates.py
+"""
+import os
+import random
+import sys
+import timeit
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'shared'))
+sys.path.insert(0, os.path.join(ROOT, 'data-processing', 'processor'))
+
+from models import GlucoseSeries  # noqa: E402
+from glucose_ranges import GlucoseCategory, READINGS_PER_DAY, categorize_glucose_value  # noqa: E402
+from glucose_utils import calculate_aggregates  # noqa: E402
+
+WINDOWS_DAYS = (7, 30, 90)
+REPEATS = 20
+
+
+def legacy_calculate_aggregates(readings, num_days):
+    """Original implementation: categorize each reading in a Python loop."""
+    glucose_values = [reading.value for reading in readings]
+    avg_glucose = sum(glucose_values) / len(glucose_values)
+
+    category_counts = defaultdict(int)
+    for value in glucose_values:
+        category_counts[categorize_glucose_value(value)] += 1
+
+    total = len(glucose_values)
+    pcts = {category: (category_counts[category] / total) * 100 for category in GlucoseCategory}
+    expected_readings = num_days * READINGS_PER_DAY
+    cgm_active_pct = min((total / expected_readings) * 100, 100)
+
+    return {
+        'avg_glucose': Decimal(str(round(avg_glucose, 1))),
+        'time_in_range_pct': Decimal(str(round(pcts[GlucoseCategory.TARGET], 1))),
+        'cgm_active_pct': Decimal(str(round(cgm_active_pct, 1))),
+        'very_high_pct': Decimal(str(round(pcts[GlucoseCategory.VERY_HIGH], 1))),
+        'high_pct': Decimal(str(round(pcts[GlucoseCategory.HIGH], 1))),
+        'target_pct': Decimal(str(round(pcts[GlucoseCategory.TARGET], 1))),
+        'low_pct': Decimal(str(round(pcts[GlucoseCategory.LOW], 1))),
+        'very_low_pct': Decimal(str(round(pcts[GlucoseCategory.VERY_LOW], 1))),
+        'total_readings': total
+    }
+
+
+def synthetic_series(days: int) -> GlucoseSeries:
+    rng = random.Random(days)
+    series = GlucoseSeries()
+    start = datetime(2025, 1, 1)
+    for i in range(days * READINGS_PER_DAY):
+        series.append(start + timedelta(minutes=5 * i), float(rng.randint(40, 400)))
+    return series
+
+
+def main():
+    print(f"{'window':>8} {'readings':>9} {'legacy ms':>10} {'kernel ms':>10} {'speedup':>8}")
+    for days in WINDOWS_DAYS:
+        series = synthetic_series(days)
+        readings = series.to_readings()
+
+        expected = legacy_calculate_aggregates(readings, days)
+        actual = calculate_aggregates(series, days)
+        mismatched = [key for key, value in expected.items() if actual[key] != value]
+        if mismatched:
+            raise AssertionError(f"{days}-day window: results differ for {mismatched}")
+
+        legacy = min(timeit.repeat(lambda: legacy_calculate_aggregates(readings, days), number=1, repeat=REPEATS))
+        kernel = min(timeit.repeat(lambda: calculate_aggregates(series, days), number=1, repeat=REPEATS))
+        print(f"{days:>6}d {len(series):>9} {legacy * 1000:>10.2f} {kernel * 1000:>10.2f} {legacy / kernel:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
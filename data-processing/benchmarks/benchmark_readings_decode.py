@@ -0,0 +1,66 @@
+"""
+Benchmark decoding readings.json partitions and building graph timestamps against
+the original per-reading implementation.
+
+Run from the repository root:
+    python data-processing/benchmarks/benchmark_readings_decode.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'shared'))
+
+from glucose_ranges import READINGS_PER_DAY  # noqa: E402
+from models import GlucoseSeries, epoch_seconds_to_iso  # noqa: E402
+from storage import FORMAT_JSON, decode_readings_json, serialize_dataset  # noqa: E402
+
+WINDOWS_DAYS = (1, 7, 30)
+REPEATS = 20
+
+
+def legacy_decode(body: bytes) -> GlucoseSeries:
+    """Original implementation: a dict and a generic datetime parse per reading."""
+    series = GlucoseSeries()
+    for reading in json.loads(body.decode('utf-8')).get('readings', []):
+        series.append(datetime.fromisoformat(reading['timestamp']), float(reading['value']))
+    return series
+
+
+def legacy_graph_timestamps(series: GlucoseSeries) -> list:
+    return [ts.isoformat() for ts in series.datetimes()]
+
+
+def synthetic_body(days: int) -> bytes:
+    rng = random.Random(days)
+    series = GlucoseSeries()
+    start = datetime(2025, 1, 1)
+    for i in range(days * READINGS_PER_DAY):
+        series.append(start + timedelta(minutes=5 * i, seconds=rng.randint(0, 59)), float(rng.randint(40, 400)))
+    body, _ = serialize_dataset(series.to_dataset('user', '2025-01-01', '2025-01-02T00:00:00', 'dexcom', 'v3'), FORMAT_JSON)
+    return body
+
+
+def main():
+    print(f"{'window':>8} {'readings':>9} {'legacy ms':>10} {'decoder ms':>11} {'speedup':>8}")
+    for days in WINDOWS_DAYS:
+        body = synthetic_body(days)
+
+        expected = legacy_decode(body)
+        actual = decode_readings_json(body)
+        if actual != expected:
+            raise AssertionError(f"{days}-day window: decoded series differ")
+        if epoch_seconds_to_iso(actual.timestamps) != legacy_graph_timestamps(expected):
+            raise AssertionError(f"{days}-day window: graph timestamps differ")
+
+        legacy = min(timeit.repeat(lambda: legacy_graph_timestamps(legacy_decode(body)), number=1, repeat=REPEATS))
+        decoder = min(timeit.repeat(lambda: epoch_seconds_to_iso(decode_readings_json(body).timestamps), number=1, repeat=REPEATS))
+        print(f"{days:>6}d {len(actual):>9} {legacy * 1000:>10.2f} {decoder * 1000:>11.2f} {legacy / decoder:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
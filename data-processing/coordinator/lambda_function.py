@@ -1,59 +1,38 @@
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import boto3
+from active_users import list_active_user_ids
+from sqs_batch import BatchEnqueuer
 
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb_client = boto3.client('dynamodb')
 sqs = boto3.client('sqs')
 
 USERS_TABLE = os.environ['USERS_TABLE']
 SQS_QUEUE_URL = os.environ['SQS_QUEUE_URL']
+ACTIVE_USER_SHARDS = int(os.environ.get('ACTIVE_USER_SHARDS', '16'))
+ENQUEUE_CONCURRENCY = int(os.environ.get('ENQUEUE_CONCURRENCY', '8'))
+ENQUEUE_MAX_JITTER_SECONDS = int(os.environ.get('ENQUEUE_MAX_JITTER_SECONDS', '0'))
 
+query_executor = ThreadPoolExecutor(max_workers=ACTIVE_USER_SHARDS)
+enqueuer = BatchEnqueuer(sqs, SQS_QUEUE_URL, concurrency=ENQUEUE_CONCURRENCY, max_jitter_seconds=ENQUEUE_MAX_JITTER_SECONDS)
 
-def get_active_users() -> List[str]:
-    table = dynamodb.Table(USERS_TABLE)
-    users = []
 
+def get_active_users() -> List[str]:
     try:
-        response = table.scan(
-            FilterExpression='is_active = :active',
-            ExpressionAttributeValues={':active': True}
-        )
-        users.extend([item['user_id'] for item in response.get('Items', [])])
-
-        # Handle pagination
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                FilterExpression='is_active = :active',
-                ExpressionAttributeValues={':active': True},
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            users.extend([item['user_id'] for item in response.get('Items', [])])
-
+        users = list_active_user_ids(dynamodb_client, USERS_TABLE, ACTIVE_USER_SHARDS, query_executor)
         logger.info(f'Found {len(users)} active users.')
 
         return users
 
     except Exception as e:
-        logger.error(f'Error scanning users table: {str(e)}')
-        raise
-
-def enqueue_user(user_id: str) -> None:
-    message_body = json.dumps({'user_id': user_id})
-
-    try:
-        sqs.send_message(
-            QueueUrl=SQS_QUEUE_URL,
-            MessageBody=message_body
-        )
-        logger.debug(f'Enqueued user: {user_id}.')
-    except Exception as e:
-        logger.error(f'Error enqueuing user {user_id}: {str(e)}')
+        logger.error(f'Error querying active users index: {str(e)}')
         raise
 
 
@@ -72,24 +51,15 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': 'No active users to process.'})
         }
 
-    enqueued_count = 0
-    error_count = 0
-
-    for user_id in users:
-        try:
-            enqueue_user(user_id)
-            enqueued_count += 1
-        except Exception as e:
-            logger.error(f'Failed to enqueue user {user_id}: {str(e)}')
-            error_count += 1
+    result = enqueuer.enqueue({'user_id': user_id} for user_id in users)
 
-    logger.info(f'Coordination complete. Enqueued: {enqueued_count}, errors: {error_count}.')
+    logger.info(f'Coordination complete. Enqueued: {result.enqueued}, errors: {result.failed}.')
 
     return {
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Coordination complete.',
-            'users_enqueued': enqueued_count,
-            'errors': error_count
+            'users_enqueued': result.enqueued,
+            'errors': result.failed
         })
     }
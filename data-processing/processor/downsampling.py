@@ -0,0 +1,45 @@
+"""Shape-preserving downsampling of glucose series for report graphs."""
+from typing import List, Sequence
+
+
+def lttb_indices(timestamps: Sequence[int], values: Sequence[float], budget: int) -> List[int]:
+    """
+    Indices of at most `budget` points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split into
+    equal buckets, and each bucket keeps the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. Peaks and troughs (highs
+    and lows) therefore survive, unlike with plain averaging or striding.
+    """
+    if budget < 3:
+        raise ValueError(f'Point budget must be at least 3, got {budget}')
+
+    count = len(values)
+    if count <= budget:
+        return list(range(count))
+
+    bucket_size = (count - 2) / (budget - 2)
+    selected = [0]
+    previous = 0
+
+    for bucket in range(budget - 2):
+        # Average of the next bucket, the triangle's third vertex
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_len = next_end - next_start
+        avg_x = sum(timestamps[next_start:next_end]) / next_len
+        avg_y = sum(values[next_start:next_end]) / next_len
+
+        prev_x, prev_y = timestamps[previous], values[previous]
+        best, best_area = -1, -1.0
+        for i in range(int(bucket * bucket_size) + 1, next_start):
+            # Twice the triangle's area; the factor doesn't change which point wins
+            area = abs((prev_x - avg_x) * (values[i] - prev_y) - (prev_x - timestamps[i]) * (avg_y - prev_y))
+            if area > best_area:
+                best, best_area = i, area
+
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
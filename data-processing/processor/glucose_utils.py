@@ -1,56 +1,85 @@
 """Utility functions for glucose data processing and analysis."""
-from collections import defaultdict
+import math
+import operator
 from decimal import Decimal
-from enum import Enum
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 
-from models import GlucoseReading
+from glucose_ranges import READINGS_PER_DAY, GlucoseCategory, count_categories, percentile
+from models import GlucoseReading, GlucoseSeries
+from rollups import GlucoseRollup
 
 
-# Glucose range thresholds (mg/dL)
-VERY_LOW_THRESHOLD = 54
-LOW_THRESHOLD = 70
-HIGH_THRESHOLD = 180
-VERY_HIGH_THRESHOLD = 250
+# Percentiles reported alongside the range breakdown (AGP convention)
+PERCENTILES = (5, 25, 50, 75, 95)
 
 
-class GlucoseCategory(str, Enum):
-    """Glucose range categories."""
-    VERY_LOW = 'very_low'
-    LOW = 'low'
-    TARGET = 'target'
-    HIGH = 'high'
-    VERY_HIGH = 'very_high'
+def calculate_cgm_active_pct(total: int, num_days: int) -> float:
+    """Percentage of expected readings present (CGM reads every 5 min = 288 readings/day)."""
+    expected_readings = num_days * READINGS_PER_DAY
+    return min((total / expected_readings) * 100, 100) if expected_readings > 0 else 0
 
 
-def categorize_glucose_value(value: float) -> GlucoseCategory:
+def build_aggregates(
+    total: int,
+    value_sum: float,
+    value_sum_sq: float,
+    category_counts: Dict[GlucoseCategory, int],
+    percentiles: Dict[int, float],
+    num_days: int
+) -> Dict[str, Any]:
     """
-    Categorize a glucose value into range buckets.
+    Build the aggregates dictionary from sufficient statistics.
 
-    Args:
-        value: Glucose value in mg/dL
-
-    Returns:
-        GlucoseCategory enum value
+    Any source that can provide the reading count, sum, sum of squares, per-category
+    counts and percentiles produces identical output.
     """
-    if value < VERY_LOW_THRESHOLD:
-        return GlucoseCategory.VERY_LOW
-    elif value < LOW_THRESHOLD:
-        return GlucoseCategory.LOW
-    elif value <= HIGH_THRESHOLD:
-        return GlucoseCategory.TARGET
-    elif value <= VERY_HIGH_THRESHOLD:
-        return GlucoseCategory.HIGH
-    else:
-        return GlucoseCategory.VERY_HIGH
+    avg_glucose = value_sum / total
+
+    # Sample standard deviation, from the sum of squares so partial sums can be combined
+    variance = (value_sum_sq - value_sum * value_sum / total) / (total - 1) if total > 1 else 0.0
+    sd_glucose = math.sqrt(max(variance, 0.0))
+    cv_pct = (sd_glucose / avg_glucose) * 100 if avg_glucose else 0.0
+
+    very_low_pct = (category_counts[GlucoseCategory.VERY_LOW] / total) * 100
+    low_pct = (category_counts[GlucoseCategory.LOW] / total) * 100
+    target_pct = (category_counts[GlucoseCategory.TARGET] / total) * 100
+    high_pct = (category_counts[GlucoseCategory.HIGH] / total) * 100
+    very_high_pct = (category_counts[GlucoseCategory.VERY_HIGH] / total) * 100
+
+    time_in_range_pct = target_pct
+
+    cgm_active_pct = calculate_cgm_active_pct(total, num_days)
+
+    aggregates = {
+        'avg_glucose': Decimal(str(round(avg_glucose, 1))),
+        'time_in_range_pct': Decimal(str(round(time_in_range_pct, 1))),
+        'cgm_active_pct': Decimal(str(round(cgm_active_pct, 1))),
+        'very_high_pct': Decimal(str(round(very_high_pct, 1))),
+        'high_pct': Decimal(str(round(high_pct, 1))),
+        'target_pct': Decimal(str(round(target_pct, 1))),
+        'low_pct': Decimal(str(round(low_pct, 1))),
+        'very_low_pct': Decimal(str(round(very_low_pct, 1))),
+        'sd_glucose': Decimal(str(round(sd_glucose, 1))),
+        'cv_pct': Decimal(str(round(cv_pct, 1))),
+        'total_readings': total
+    }
+
+    for pct in PERCENTILES:
+        aggregates[f'p{pct}_glucose'] = Decimal(str(round(percentiles[pct], 1)))
 
+    return aggregates
 
-def calculate_aggregates(readings: List[GlucoseReading], num_days: int) -> Dict[str, Any] | None:
+
+def calculate_aggregates(readings: Union[GlucoseSeries, List[GlucoseReading]], num_days: int) -> Dict[str, Any] | None:
     """
     Calculate aggregate statistics from glucose readings.
 
+    Works on whole columns at once: sums run over the value array, and a single sort
+    lets range counts and percentiles come from binary searches and index lookups
+    instead of categorizing each reading.
+
     Args:
-        readings: List of GlucoseReading objects
+        readings: GlucoseSeries or list of GlucoseReading objects
         num_days: Number of days with readings (for calculating expected readings)
 
     Returns:
@@ -59,45 +88,55 @@ def calculate_aggregates(readings: List[GlucoseReading], num_days: int) -> Dict[
         - time_in_range_pct: Percentage in target range (70-180)
         - cgm_active_pct: Percentage of expected readings present
         - very_high_pct, high_pct, target_pct, low_pct, very_low_pct
+        - sd_glucose: Standard deviation of glucose values
+        - cv_pct: Coefficient of variation (SD / mean)
+        - p5_glucose, p25_glucose, p50_glucose, p75_glucose, p95_glucose: Percentiles
         - total_readings: Count of readings
     """
     if not readings:
         return None
 
-    glucose_values = [reading.value for reading in readings]
+    if isinstance(readings, GlucoseSeries):
+        glucose_values = readings.values
+    else:
+        glucose_values = [reading.value for reading in readings]
 
     if not glucose_values:
         return None
 
-    avg_glucose = sum(glucose_values) / len(glucose_values)
+    sorted_values = sorted(glucose_values)
 
-    category_counts = defaultdict(int)
-    for value in glucose_values:
-        category = categorize_glucose_value(value)
-        category_counts[category] += 1
+    return build_aggregates(
+        total=len(glucose_values),
+        value_sum=sum(glucose_values),
+        value_sum_sq=sum(map(operator.mul, glucose_values, glucose_values)),
+        category_counts=count_categories(sorted_values),
+        percentiles={pct: percentile(sorted_values, pct) for pct in PERCENTILES},
+        num_days=num_days
+    )
 
-    total = len(glucose_values)
 
-    very_low_pct = (category_counts[GlucoseCategory.VERY_LOW] / total) * 100
-    low_pct = (category_counts[GlucoseCategory.LOW] / total) * 100
-    target_pct = (category_counts[GlucoseCategory.TARGET] / total) * 100
-    high_pct = (category_counts[GlucoseCategory.HIGH] / total) * 100
-    very_high_pct = (category_counts[GlucoseCategory.VERY_HIGH] / total) * 100
+def calculate_aggregates_from_rollup(rollup: GlucoseRollup, num_days: int) -> Dict[str, Any] | None:
+    """
+    Calculate aggregate statistics from a (merged) rollup without touching readings.
 
-    time_in_range_pct = target_pct
+    Produces the same result as calculate_aggregates() on the underlying readings.
 
-    # CGM active percentage (CGM reads every 5 min = 288 readings/day)
-    expected_readings = num_days * 288
-    cgm_active_pct = min((total / expected_readings) * 100, 100) if expected_readings > 0 else 0
+    Args:
+        rollup: GlucoseRollup covering the reporting period
+        num_days: Number of days with readings (for calculating expected readings)
 
-    return {
-        'avg_glucose': Decimal(str(round(avg_glucose, 1))),
-        'time_in_range_pct': Decimal(str(round(time_in_range_pct, 1))),
-        'cgm_active_pct': Decimal(str(round(cgm_active_pct, 1))),
-        'very_high_pct': Decimal(str(round(very_high_pct, 1))),
-        'high_pct': Decimal(str(round(high_pct, 1))),
-        'target_pct': Decimal(str(round(target_pct, 1))),
-        'low_pct': Decimal(str(round(low_pct, 1))),
-        'very_low_pct': Decimal(str(round(very_low_pct, 1))),
-        'total_readings': total
-    }
+    Returns:
+        Dictionary with aggregate statistics or None if the rollup is empty
+    """
+    if not rollup.count:
+        return None
+
+    return build_aggregates(
+        total=rollup.count,
+        value_sum=rollup.value_sum,
+        value_sum_sq=rollup.value_sum_sq,
+        category_counts=rollup.category_counts,
+        percentiles={pct: rollup.percentile(pct) for pct in PERCENTILES},
+        num_days=num_days
+    )
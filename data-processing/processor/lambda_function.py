@@ -1,197 +1,736 @@
 import json
 import logging
 import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone, timedelta, date
 from decimal import Decimal
-from typing import List, Dict, Any
+from time import sleep
+from typing import List, Dict, Any, Callable, Collection, NamedTuple, Set, Tuple, TypeVar
 
 import boto3
-
-from models import GlucoseReading
-from glucose_utils import calculate_aggregates
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from compaction import DayBodies, split_range
+from manifest import PartitionManifest
+from models import GlucoseSeries, epoch_seconds_to_iso, from_epoch_seconds
+from rollups import GlucoseRollup
+from storage import (
+    FORMAT_BINARY,
+    JSON_CONTENT_TYPE,
+    decode_readings_json,
+    deserialize_series,
+    graph_series_key,
+    is_binary,
+    manifest_key,
+    readings_keys,
+    rolling_window_key,
+    rollup_key,
+    serialize_dataset
+)
+from downsampling import lttb_indices
+from glucose_utils import calculate_aggregates_from_rollup
 from insights_generator import generate_insights
+from rolling_windows import RollingWindowState, report_type, window_dates
+from sqs_batch import BatchEnqueuer
 
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-s3 = boto3.client('s3')
-sqs = boto3.client('sqs')
-dynamodb = boto3.resource('dynamodb')
-
 S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 GLUCOSE_INSIGHTS_TABLE = os.environ['GLUCOSE_INSIGHTS_TABLE']
 EMAIL_QUEUE_URL = os.environ.get('EMAIL_QUEUE_URL')
+S3_FETCH_CONCURRENCY = int(os.environ.get('S3_FETCH_CONCURRENCY', '16'))
+GRAPH_POINT_BUDGET = int(os.environ.get('GRAPH_POINT_BUDGET', '300'))
+USER_CONCURRENCY = int(os.environ.get('USER_CONCURRENCY', '10'))
+# Rolling report windows in days, e.g. "14,30,90"; each is compared against the next longer one
+REPORT_WINDOWS = sorted({int(days) for days in os.environ.get('REPORT_WINDOWS', '14,30,90').split(',') if days.strip()})
+REPORT_HISTORY_WEEKS = int(os.environ.get('REPORT_HISTORY_WEEKS', '8'))
+TREND_METRICS = ('avg_glucose', 'time_in_range_pct', 'cgm_active_pct')
+BATCH_WRITE_SIZE = 25  # DynamoDB BatchWriteItem limit
+BATCH_WRITE_MAX_ATTEMPTS = 5
+# BatchWriteItem errors worth retrying; any other error is down to an item and retrying can't help
+RETRYABLE_WRITE_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded', 'InternalServerError')
+
+# Connection pool sized to both thread pools so concurrent requests never queue for a connection
+s3 = boto3.client('s3', config=Config(max_pool_connections=S3_FETCH_CONCURRENCY + USER_CONCURRENCY))
+sqs = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+email_enqueuer = BatchEnqueuer(sqs, EMAIL_QUEUE_URL)
 
+T = TypeVar('T')
+
+
+def _create_compute_pool() -> ProcessPoolExecutor | None:
+    """
+    A process pool for aggregation sized to the available vCPUs, or None to run it inline.
+
+    Lambda has no /dev/shm, which multiprocessing needs for its queues and locks, so the
+    pool cannot be created there; the same code then runs inline on the user threads.
+    On a single vCPU a pool would only add pickling overhead.
+    """
+    workers = os.cpu_count() or 1
+    if workers < 2:
+        return None
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pool.submit(int).result()  # Fork the workers now, before any thread is started
+        return pool
+    except (OSError, NotImplementedError, ImportError) as e:
+        logger.info(f'Process pool unavailable ({e}), aggregating inline.')
+        return None
 
-def fetch_data_from_s3(user_id: str, days: int = 7) -> List[GlucoseReading]:
-    all_readings = []
 
+# Reused across warm invocations
+compute_pool = _create_compute_pool()
+user_executor = ThreadPoolExecutor(max_workers=USER_CONCURRENCY)
+fetch_executor = ThreadPoolExecutor(max_workers=S3_FETCH_CONCURRENCY)
+
+_thread_local = threading.local()
+
+
+def get_insights_table():
+    """DynamoDB resources are not thread-safe, so each user thread gets its own."""
+    if not hasattr(_thread_local, 'insights_table'):
+        session = boto3.session.Session()
+        _thread_local.insights_table = session.resource('dynamodb').Table(GLUCOSE_INSIGHTS_TABLE)
+    return _thread_local.insights_table
+
+
+def _partition_dates(days: int) -> List[str]:
+    """One readings date per day, oldest first, ending today."""
     end_date = datetime.now(timezone.utc).date()
     start_date = end_date - timedelta(days=days)
 
-    logger.info(f'Fetching data for user {user_id} from {start_date} to {end_date}...')
+    return [(start_date + timedelta(days=offset)).isoformat() for offset in range(days + 1)]
+
+def _window_dates(days: int, manifest: PartitionManifest | None, skip_dates: Collection[str] = ()) -> List[str]:
+    """
+    Days of the window that may have a partition.
+
+    Days the manifest rules out, or already read elsewhere, are dropped; days before the
+    manifest existed (or all days, without a manifest) are probed.
+    """
+    return [
+        readings_date for readings_date in _partition_dates(days)
+        if readings_date not in skip_dates
+        and (manifest is None or not manifest.is_complete_for(readings_date) or readings_date in manifest.partitions)
+    ]
+
+def _fetch_partitions(candidate_keys: List[Tuple[str, ...]], parse: Callable[[str, bytes, str | None], T]) -> List[T | None]:
+    """
+    Fetch partition objects concurrently and parse each body as soon as it arrives.
+
+    Each entry lists candidate keys for one partition in order of preference; the first
+    one that exists is parsed. Results keep the order of candidate_keys, and partitions
+    with no existing key yield None.
+    """
+    def fetch(s3_keys: Tuple[str, ...]) -> T | None:
+        for s3_key in s3_keys:
+            try:
+                response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+                return parse(s3_key, response['Body'].read(), response.get('ContentType'))
+            except s3.exceptions.NoSuchKey:
+                logger.debug(f'No object found for key: {s3_key}.')
+            except Exception as e:
+                logger.error(f'Error fetching {s3_key}: {str(e)}')
+                raise
+        return None
 
-    current_date = start_date
-    files_found = 0
+    return list(fetch_executor.map(fetch, candidate_keys))
 
-    while current_date <= end_date:
-        s3_key = f'normalized/user_id={user_id}/readings_date={current_date.isoformat()}/readings.json'
+def _parse_readings(s3_key: str, body: bytes, content_type: str | None) -> GlucoseSeries:
+    if is_binary(body, content_type):
+        return deserialize_series(body, content_type)
 
-        try:
-            response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-            data = json.loads(response['Body'].read().decode('utf-8'))
-
-            readings = data.get('readings', [])
-
-            for reading in readings:
-                try:
-                    glucose_reading = GlucoseReading(
-                        timestamp_local=datetime.fromisoformat(reading['timestamp']),
-                        value=float(reading['value']),
-                        unit=reading['unit']
-                    )
-                    all_readings.append(glucose_reading)
-                except (ValueError, AttributeError, KeyError) as e:
-                    logger.warning(f"Failed to parse reading in {s3_key}: {e}")
-                    continue
+    try:
+        series = decode_readings_json(body)
+        if series.unit == GlucoseSeries().unit:
+            return series
+    except ValueError:
+        pass
 
-            files_found += 1
-        except s3.exceptions.NoSuchKey:
-            logger.debug(f'No data found for {current_date} (key: {s3_key}).')
-        except Exception as e:
-            logger.error(f'Error fetching {s3_key}: {str(e)}')
-            raise
+    # Not in the canonical layout: parse reading by reading, skipping the bad ones
+    series = GlucoseSeries()
+    data = json.loads(body.decode('utf-8'))
 
-        current_date += timedelta(days=1)
+    for reading in data.get('readings', []):
+        try:
+            if reading['unit'] != series.unit:
+                raise ValueError(f"unexpected unit {reading['unit']}")
+            series.append(
+                datetime.fromisoformat(reading['timestamp']),
+                float(reading['value'])
+            )
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to parse reading in {s3_key}: {e}")
+            continue
+
+    return series
+
+def _parse_rollup(s3_key: str, body: bytes, content_type: str | None) -> GlucoseRollup | None:
+    try:
+        return GlucoseRollup.from_dict(json.loads(body.decode('utf-8')))
+    except ValueError as e:
+        logger.warning(f'Ignoring unreadable rollup {s3_key}: {e}')
+        return None
 
-    logger.info(f'Fetched total of {len(all_readings)} readings from {files_found} file(s) for user {user_id}.')
-    return all_readings
+def fetch_manifest(user_id: str) -> PartitionManifest | None:
+    """Fetch the user's partition manifest; None for users ingested before manifests existed."""
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=manifest_key(user_id))
+        return PartitionManifest.from_dict(json.loads(response['Body'].read().decode('utf-8')))
+    except s3.exceptions.NoSuchKey:
+        return None
+    except ValueError as e:
+        logger.warning(f'Ignoring unreadable manifest for user {user_id}: {e}')
+        return None
 
-def store_insights(
+def fetch_compacted(user_id: str, readings_dates: List[str], manifest: PartitionManifest) -> Dict[str, DayBodies]:
+    """
+    Bodies of the given days that have a current copy in a compacted container.
+
+    Each container is read with a single ranged GET covering its days in the window, so a
+    long window costs a handful of requests. The read is conditioned on the ETag recorded
+    in the manifest; if the container was rewritten since, its days are left to the daily
+    partitions (a sealed month has none, so its days are missed until the next run).
+    """
+    def fetch(planned: Tuple[str, List[str]]) -> Dict[str, DayBodies]:
+        s3_key, readings_dates = planned
+        compacted = manifest.compacted[s3_key]
+        start, end = compacted.byte_range(readings_dates)
+        try:
+            response = s3.get_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=s3_key,
+                Range=f'bytes={start}-{end}',
+                **({'IfMatch': compacted.etag} if compacted.etag else {})
+            )
+        except s3.exceptions.NoSuchKey:
+            logger.warning(f'Compacted object {s3_key} is missing, reading daily partitions.')
+            return {}
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'PreconditionFailed':
+                raise
+            logger.info(f'Compacted object {s3_key} changed since the manifest was read, reading daily partitions.')
+            return {}
+        return split_range(compacted, readings_dates, response['Body'].read(), start)
+
+    plan = manifest.compacted_dates(readings_dates)
+    bodies = {}
+    for day_bodies in fetch_executor.map(fetch, plan.items()):
+        bodies.update(day_bodies)
+
+    logger.info(f'Fetched {len(bodies)} day(s) from {len(plan)} compacted object(s) for user {user_id}.')
+    return bodies
+
+def fetch_window(user_id: str, days: int = 7, manifest: PartitionManifest | None = None) -> Tuple[GlucoseSeries, List[GlucoseRollup]]:
+    """
+    Readings and one rollup per day with readings in the window.
+
+    Days held in compacted containers are read from there; the rest come from their
+    daily partitions. The rollups are what the report is computed from; the readings only
+    feed the graph. A day whose rollup is missing (written before rollups existed) or
+    disagrees with its readings (the readings write failed after the rollup's) is
+    summarized from the readings instead.
+    """
+    compacted = fetch_compacted(user_id, _partition_dates(days), manifest) if manifest is not None and manifest.compacted else {}
+
+    day_readings = fetch_data_from_s3(user_id, days, manifest, skip_dates=compacted.keys())
+    day_rollups = fetch_rollups_from_s3(user_id, days, manifest, skip_dates=compacted.keys())
+
+    for readings_date, bodies in compacted.items():
+        source = f'{user_id}/{readings_date} (compacted)'
+        day_readings[readings_date] = _parse_readings(source, bodies.readings, bodies.readings_content_type)
+        rollup = _parse_rollup(source, bodies.rollup, None)
+        if rollup is not None:
+            day_rollups[readings_date] = rollup
+
+    readings = GlucoseSeries()
+    rollups = []
+    for readings_date, series in sorted(day_readings.items()):
+        rollup = day_rollups.get(readings_date)
+        if rollup is None or rollup.count != len(series):
+            logger.info(f'Summarizing {user_id}/{readings_date} from its readings; its rollup is missing or stale.')
+            rollup = GlucoseRollup.from_series(series)
+        readings.extend(series)
+        rollups.append(rollup)
+
+    return readings, rollups
+
+def fetch_data_from_s3(
     user_id: str,
-    period_start_date: date,
-    period_end_date: date,
-    days_included: int,
-    aggregates: Dict[str, Any],
-    graph_data: List[Dict[str, Any]],
-    insights: List[str]
-) -> str:
-    table = dynamodb.Table(GLUCOSE_INSIGHTS_TABLE)
+    days: int = 7,
+    manifest: PartitionManifest | None = None,
+    skip_dates: Collection[str] = ()
+) -> Dict[str, GlucoseSeries]:
+    """Fetch the readings partitions of the window, keyed by readings date."""
+    def keys_for_date(readings_date: str) -> Tuple[str, ...]:
+        if manifest is not None and readings_date in manifest.partitions:
+            return (manifest.partitions[readings_date].key,)
+        return readings_keys(user_id, readings_date)
+
+    readings_dates = _window_dates(days, manifest, skip_dates)
+
+    logger.info(f'Fetching {len(readings_dates)} day(s) of data for user {user_id}...')
+
+    day_readings = {
+        readings_date: series
+        for readings_date, series in zip(readings_dates, _fetch_partitions([keys_for_date(d) for d in readings_dates], _parse_readings))
+        if series is not None
+    }
 
-    period_end_str = period_end_date.isoformat()
-    report_key = f'{period_end_str}#weekly'
+    logger.info(f'Fetched total of {sum(map(len, day_readings.values()))} readings from {len(day_readings)} file(s) for user {user_id}.')
+    return day_readings
 
-    item = {
-        'user_id': user_id,
-        'report_key': report_key,
-        'period_start': period_start_date.isoformat(),
-        'period_end': period_end_date.isoformat(),
-        'days_included': days_included,
-        'aggregates': aggregates,
-        'graph_data': graph_data,
-        'insights': insights,
-        'insights_version': 'template-v1',
-        'created_at': datetime.now(timezone.utc).isoformat(),
-        'report_type': 'weekly'
+def fetch_rollups_from_s3(
+    user_id: str,
+    days: int = 7,
+    manifest: PartitionManifest | None = None,
+    skip_dates: Collection[str] = ()
+) -> Dict[str, GlucoseRollup]:
+    """Fetch the per-day rollups written next to each readings partition, keyed by readings date."""
+    readings_dates = _window_dates(days, manifest, skip_dates)
+    rollups = {
+        readings_date: rollup
+        for readings_date, rollup in zip(readings_dates, _fetch_partitions([(rollup_key(user_id, d),) for d in readings_dates], _parse_rollup))
+        if rollup is not None
     }
 
-    table.put_item(Item=item)
-    logger.info(f'Stored insights for user {user_id}, report_key: {report_key} ({days_included} days).')
+    logger.info(f'Fetched {len(rollups)} rollup(s) for user {user_id}.')
+    return rollups
+
+def fetch_day_rollups(user_id: str, readings_dates: List[str], manifest: PartitionManifest) -> Dict[str, GlucoseRollup]:
+    """
+    Rollups of the given days, all of which the manifest lists.
+
+    Days are read from compacted containers where possible, then from their daily
+    rollups. Partitions written before rollups existed are summarized from their readings.
+    A sealed day whose container can't be read is left out.
+    """
+    rollups = {}
+    if manifest.compacted:
+        for readings_date, bodies in fetch_compacted(user_id, readings_dates, manifest).items():
+            source = f'{user_id}/{readings_date} (compacted)'
+            rollup = _parse_rollup(source, bodies.rollup, None)
+            if rollup is None:
+                rollup = GlucoseRollup.from_series(_parse_readings(source, bodies.readings, bodies.readings_content_type))
+            rollups[readings_date] = rollup
+
+    remaining = [d for d in readings_dates if d not in rollups]
+    fetched = _fetch_partitions([(rollup_key(user_id, d),) for d in remaining], _parse_rollup)
+    rollups.update((d, rollup) for d, rollup in zip(remaining, fetched) if rollup is not None)
+
+    # Days of sealed months have no daily partition to fall back to
+    missing = [d for d in readings_dates if d not in rollups and d in manifest.partitions]
+    if missing:
+        logger.info(f'Summarizing {len(missing)} day(s) without rollups from their readings for user {user_id}.')
+        series = _fetch_partitions([(manifest.partitions[d].key,) for d in missing], _parse_readings)
+        rollups.update((d, GlucoseRollup.from_series(s)) for d, s in zip(missing, series) if s is not None)
+
+    return rollups
+
+def build_graph_data(readings: GlucoseSeries) -> List[Dict[str, Any]]:
+    """The readings downsampled to the graph point budget, keeping highs and lows."""
+    indices = lttb_indices(readings.timestamps, readings.values, GRAPH_POINT_BUDGET)
+    timestamps = epoch_seconds_to_iso(readings.timestamps[i] for i in indices)
+
+    return [
+        {'timestamp': ts, 'value': Decimal.from_float(readings.values[i])}
+        for ts, i in zip(timestamps, indices)
+    ]
+
+def store_graph_series(user_id: str, period_end: str, report_type: str, readings: GlucoseSeries) -> str:
+    """Store the report's full-resolution series in S3, in the compact binary format. Returns its key."""
+    s3_key = graph_series_key(user_id, period_end, report_type)
+    dataset = readings.to_dataset(
+        user_id=user_id,
+        readings_date_utc=period_end,
+        ingested_at_utc=datetime.now(timezone.utc).isoformat(),
+        source='normalized',
+        source_version='v1'
+    )
+    body, content_type = serialize_dataset(dataset, FORMAT_BINARY)
+    s3.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=body, ContentType=content_type)
+    return s3_key
+
+class WindowPeriod(NamedTuple):
+    period_start_date: date
+    period_end_date: date
+    total: int
+
+def manifest_period(manifest: PartitionManifest, readings_dates: List[str]) -> WindowPeriod | None:
+    """
+    A window's period and reading count, read off the manifest without opening any partition.
+
+    None when the manifest doesn't cover every day of the window, or covers some only
+    through a sealed container, whose day index has no counts.
+    """
+    if not all(manifest.is_complete_for(d) for d in readings_dates):
+        return None
+    if any(d not in manifest.partitions for d in manifest.content_hashes(readings_dates)):
+        return None
 
-    return report_key
+    entries = [e for e in manifest.entries_for(readings_dates) if e.count]
+    if not entries:
+        return WindowPeriod(date.min, date.min, 0)
 
-def fetch_previous_week_aggregates(user_id: str, current_period_end: date) -> Dict[str, Any] | None:
-    """Fetch previous week's aggregates from DynamoDB for trend comparison."""
-    table = dynamodb.Table(GLUCOSE_INSIGHTS_TABLE)
+    return WindowPeriod(
+        period_start_date=from_epoch_seconds(min(e.first_timestamp for e in entries)).date(),
+        period_end_date=from_epoch_seconds(max(e.last_timestamp for e in entries)).date(),
+        total=sum(e.count for e in entries)
+    )
 
-    # Calculate previous week's end date (7 days before current week's end)
-    previous_period_end = current_period_end - timedelta(days=7)
-    previous_report_key = f'{previous_period_end.isoformat()}#weekly'
+class WindowAnalysis(NamedTuple):
+    period_start_date: date
+    period_end_date: date
+    num_days: int
+    aggregates: Dict[str, Any]
+    graph_data: List[Dict[str, Any]]
+
+def analyze_window(
+    user_id: str,
+    readings: GlucoseSeries,
+    rollups: List[GlucoseRollup],
+    period: WindowPeriod | None = None
+) -> WindowAnalysis:
+    """
+    The CPU-bound part of a report: period, aggregates and graph.
+
+    The period, and with it the CGM active percentage, is taken from the manifest when it
+    describes the same readings that were fetched, and from the merged rollup otherwise.
+    The aggregates come from the daily rollups alone, in O(days); the readings are only
+    downsampled for the graph. A pure function of its arguments, so it can run in the
+    compute pool.
+    """
+    rollup = GlucoseRollup.merge_all(rollups)
+    if period is not None and period.total == rollup.count:
+        period_start_date, period_end_date = period.period_start_date, period.period_end_date
+    else:
+        period_start_date = from_epoch_seconds(rollup.first_timestamp).date()
+        period_end_date = from_epoch_seconds(rollup.last_timestamp).date()
+    num_days = (period_end_date - period_start_date).days + 1
+
+    aggregates = calculate_aggregates_from_rollup(rollup, num_days)
+
+    return WindowAnalysis(period_start_date, period_end_date, num_days, aggregates, build_graph_data(readings))
+
+def run_compute(fn: Callable[..., T], *args) -> T:
+    """Run a CPU-bound function in the compute pool, or inline when there is none."""
+    global compute_pool
+    if compute_pool is not None:
+        try:
+            return compute_pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            logger.warning('Compute pool broke, running aggregation inline from now on.')
+            compute_pool = None
+    return fn(*args)
+
+def fetch_report_history(user_id: str, current_period_end: date, weeks: int = REPORT_HISTORY_WEEKS) -> List[Dict[str, Any]]:
+    """
+    The user's weekly reports ending in the `weeks` weeks before `current_period_end`, newest first.
+
+    A single Query over the report_key range, projected down to period_end and aggregates.
+    Period ends follow the latest reading, so they drift from week to week; a range finds
+    the reports wherever they landed, where a computed key would miss them.
+    """
+    table = get_insights_table()
+    earliest = current_period_end - timedelta(weeks=weeks)
+
+    query = {
+        'KeyConditionExpression': Key('user_id').eq(user_id) & Key('report_key').between(
+            earliest.isoformat(), f'{current_period_end.isoformat()}#'
+        ),
+        'FilterExpression': Attr('report_type').eq('weekly'),
+        'ProjectionExpression': 'period_end, aggregates',
+        'ScanIndexForward': False
+    }
 
     try:
-        response = table.get_item(
-            Key={
-                'user_id': user_id,
-                'report_key': previous_report_key
-            }
-        )
-        if 'Item' in response:
-            return response['Item'].get('aggregates')
-        return None
+        reports = []
+        while True:
+            response = table.query(**query)
+            reports.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return reports
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
     except Exception as e:
-        logger.warning(f'Could not fetch previous week aggregates for user {user_id}: {e}')
+        logger.warning(f'Could not fetch report history for user {user_id}: {e}')
+        return []
+
+def build_trend(history: List[Dict[str, Any]], period_end: str, aggregates: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Weekly trend points, oldest first, ending with the current report."""
+    reports = [r for r in reversed(history) if r.get('aggregates')] + [{'period_end': period_end, 'aggregates': aggregates}]
+    return [
+        {'period_end': report['period_end'], **{metric: report['aggregates'].get(metric) for metric in TREND_METRICS}}
+        for report in reports
+    ]
+
+def fetch_window_state(user_id: str, days: int) -> RollingWindowState | None:
+    """Stored state of a rolling window; None if there is none yet or it can't be read."""
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=rolling_window_key(user_id, days))
+        return RollingWindowState.from_dict(json.loads(response['Body'].read().decode('utf-8')))
+    except s3.exceptions.NoSuchKey:
         return None
+    except (ValueError, KeyError) as e:
+        logger.warning(f'Rebuilding unreadable {days}-day window state for user {user_id}: {e}')
+        return None
+
+def advance_rolling_window(user_id: str, days: int, period_end: date, manifest: PartitionManifest) -> RollingWindowState:
+    """
+    The user's rolling window ending on `period_end`, advanced from its stored state.
 
+    Only the rollups of the days entering and leaving the window are read, so moving a
+    window forward costs the same whatever its length. The window is rebuilt from every
+    day's rollup when it has no usable state.
+    """
+    partition_hashes = manifest.content_hashes()
+    state = fetch_window_state(user_id, days)
+    plan = state.plan_advance(period_end, partition_hashes) if state is not None else None
 
-def process_user_data(user_id: str) -> str:
-    readings = fetch_data_from_s3(user_id, days=7)
+    if plan is not None:
+        rollups = fetch_day_rollups(user_id, plan.entering + plan.leaving, manifest)
+        try:
+            if len(rollups) == len(plan.entering) + len(plan.leaving):
+                state = state.advance(
+                    period_end,
+                    {d: rollups[d] for d in plan.entering},
+                    {d: rollups[d] for d in plan.leaving},
+                    partition_hashes
+                )
+                logger.info(f'Advanced {days}-day window for user {user_id}: {len(plan.entering)} day(s) in, {len(plan.leaving)} out.')
+            else:
+                plan = None
+        except ValueError as e:
+            logger.warning(f'Could not advance {days}-day window for user {user_id}: {e}')
+            plan = None
+
+    if plan is None:
+        readings_dates = [d for d in window_dates(period_end, days) if d in partition_hashes]
+        state = RollingWindowState.build(days, period_end, fetch_day_rollups(user_id, readings_dates, manifest), partition_hashes)
+        logger.info(f'Rebuilt {days}-day window for user {user_id} from {len(state.day_hashes)} day(s).')
+
+    s3.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=rolling_window_key(user_id, days),
+        Body=json.dumps(state.to_dict()).encode('utf-8'),
+        ContentType=JSON_CONTENT_TYPE
+    )
+    return state
+
+def build_rolling_reports(user_id: str, manifest: PartitionManifest | None) -> List[Dict[str, Any]]:
+    """
+    Items for the user's rolling window reports, each compared against the next longer window.
+
+    Windows end on the last closed day. They need the manifest to know which days changed,
+    so windows reaching days it is not authoritative for (unlisted days from before it was
+    created, until a backfill has covered them) are skipped.
+    """
+    period_end = datetime.now(timezone.utc).date() - timedelta(days=1)
+    if manifest is None:
+        logger.info(f'No manifest for user {user_id}, skipping rolling reports.')
+        return []
+
+    windows = {}
+    for days in REPORT_WINDOWS:
+        if not all(manifest.is_complete_for(d) for d in window_dates(period_end, days)):
+            logger.info(f'{days}-day window for user {user_id} reaches days its manifest does not cover, skipping.')
+            continue
+        state = advance_rolling_window(user_id, days, period_end, manifest)
+        if state.rollup.count:
+            num_days = (period_end - date.fromisoformat(state.first_data_date)).days + 1
+            windows[days] = (state, calculate_aggregates_from_rollup(state.rollup, num_days))
+
+    items = []
+    created_at = datetime.now(timezone.utc).isoformat()
+    for days, (state, aggregates) in windows.items():
+        period_start = period_end - timedelta(days=days - 1)
+        baseline = next((d for d in windows if d > days), None)
+        insights = generate_insights(
+            aggregates,
+            period_start,
+            period_end,
+            windows[baseline][1] if baseline else None,
+            comparison_label=f'{baseline}-day average'
+        )
+        items.append({
+            'user_id': user_id,
+            'report_key': f'{state.period_end}#{report_type(days)}',
+            'period_start': period_start.isoformat(),
+            'period_end': state.period_end,
+            'days_included': days,
+            'aggregates': aggregates,
+            'insights': insights,
+            'insights_version': 'template-v1',
+            'created_at': created_at,
+            'report_type': report_type(days)
+        })
+    return items
+
+
+def process_user_data(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Build a user's weekly and rolling window insights items, ready to be written.
+
+    The full-resolution series is stored in S3 here, before the item referencing it is
+    written, so the reference never dangles.
+    """
+    manifest = fetch_manifest(user_id)
+
+    period = manifest_period(manifest, _partition_dates(7)) if manifest is not None else None
+    if period is not None and not period.total:
+        # The manifest rules out every partition of the window, so none is read
+        raise ValueError(f'No readings found for user {user_id}. Cannot generate insights.')
+
+    readings, rollups = fetch_window(user_id, days=7, manifest=manifest)
 
     if not readings:
         raise ValueError(f'No readings found for user {user_id}. Cannot generate insights.')
 
     logger.info(f'Processing {len(readings)} readings for user {user_id}...')
 
-    # Get date range from readings
-    timestamps = [r.timestamp_local for r in readings if isinstance(r.timestamp_local, datetime)]
-    period_start_date = min(timestamps).date()
-    period_end_date = max(timestamps).date()
-    num_days = (period_end_date - period_start_date).days + 1
+    analysis = run_compute(analyze_window, user_id, readings, rollups, period)
+    period_end_str = analysis.period_end_date.isoformat()
+
+    # Earlier weekly reports, newest first, for the comparison and the trend
+    history = fetch_report_history(user_id, analysis.period_end_date)
+    previous_aggregates = history[0].get('aggregates') if history else None
 
-    aggregates = calculate_aggregates(readings, num_days)
+    insights = generate_insights(analysis.aggregates, analysis.period_start_date, analysis.period_end_date, previous_aggregates)
 
-    graph_data = [{'timestamp': r.timestamp_local.isoformat(), 'value': Decimal.from_float(r.value)} for r in readings]
+    weekly = {
+        'user_id': user_id,
+        'report_key': f'{period_end_str}#weekly',
+        'period_start': analysis.period_start_date.isoformat(),
+        'period_end': period_end_str,
+        'days_included': analysis.num_days,
+        'aggregates': analysis.aggregates,
+        'graph_data': analysis.graph_data,
+        'graph_series_key': store_graph_series(user_id, period_end_str, 'weekly', readings),
+        'graph_series_count': len(readings),
+        'trend': build_trend(history, period_end_str, analysis.aggregates),
+        'insights': insights,
+        'insights_version': 'template-v1',
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'report_type': 'weekly'
+    }
 
-    # Fetch previous week's data for trend comparison
-    previous_aggregates = fetch_previous_week_aggregates(user_id, period_end_date)
+    # Rolling reports are extras: a failure there shouldn't hold back the weekly report
+    try:
+        rolling = build_rolling_reports(user_id, manifest)
+    except Exception as e:
+        logger.error(f'Error building rolling reports for user {user_id}: {e}')
+        rolling = []
+
+    return [weekly] + rolling
+
+def store_insights(items: List[Dict[str, Any]]) -> Set[Tuple[str, str]]:
+    """
+    Write insights items with BatchWriteItem, retrying unprocessed items with jittered backoff.
+
+    Only throttling and unprocessed items are retried. A chunk rejected outright (e.g. a
+    ValidationException caused by one of its items) is written item by item instead, so
+    only the offending items fail.
+
+    Returns the (user_id, report_key) of items still unwritten after the last attempt.
+    """
+    unwritten = set()
+    for i in range(0, len(items), BATCH_WRITE_SIZE):
+        request = {
+            GLUCOSE_INSIGHTS_TABLE: [{'PutRequest': {'Item': item}} for item in items[i:i + BATCH_WRITE_SIZE]]
+        }
+
+        for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+            if attempt > 0:
+                sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+            try:
+                response = dynamodb.batch_write_item(RequestItems=request)
+            except ClientError as e:
+                if e.response['Error']['Code'] in RETRYABLE_WRITE_ERRORS:
+                    logger.warning(f'BatchWriteItem attempt {attempt + 1} throttled: {e}')
+                    continue
+                logger.warning(f'BatchWriteItem rejected, writing its items one by one: {e}')
+                request = put_items_individually([put['PutRequest']['Item'] for put in request[GLUCOSE_INSIGHTS_TABLE]])
+                break
+            request = response.get('UnprocessedItems')
+            if not request:
+                break
 
-    insights = generate_insights(aggregates, period_start_date, period_end_date, previous_aggregates)
+        for put in (request or {}).get(GLUCOSE_INSIGHTS_TABLE, []):
+            unwritten.add((put['PutRequest']['Item']['user_id'], put['PutRequest']['Item']['report_key']))
 
-    report_key = store_insights(
-        user_id=user_id,
-        period_start_date=period_start_date,
-        period_end_date=period_end_date,
-        days_included=num_days,
-        aggregates=aggregates,
-        graph_data=graph_data,
-        insights=insights
-    )
+    logger.info(f'Stored {len(items) - len(unwritten)} of {len(items)} insights item(s).')
+    return unwritten
 
-    return report_key
+def put_items_individually(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Write items with one PutItem each. Returns the failed ones as a BatchWriteItem request."""
+    table = dynamodb.Table(GLUCOSE_INSIGHTS_TABLE)
+    failed = []
+    for item in items:
+        try:
+            table.put_item(Item=item)
+        except ClientError as e:
+            logger.error(f"Failed to store insights item {item['user_id']}/{item['report_key']}: {e}")
+            failed.append({'PutRequest': {'Item': item}})
+    return {GLUCOSE_INSIGHTS_TABLE: failed} if failed else {}
 
-def queue_for_email(user_id: str, report_key: str) -> None:
-    message_body = {
-        'user_id': user_id,
-        'report_key': report_key
-    }
-    sqs.send_message(
-        QueueUrl=EMAIL_QUEUE_URL,
-        MessageBody=json.dumps(message_body)
-    )
-    logger.info(f'Queued email job for user {user_id}, report_key: {report_key}.')
 
 def lambda_handler(event, context):
-    """Data processing worker: processes a single user's data from S3 and saves insights to DynamoDB."""
-    logger.info('Starting glucose data processing.')
-
-    for record in event['Records']:
-        message_body = json.loads(record['body'])
-        user_id = message_body['user_id']
+    """
+    Data processing worker: build weekly and rolling window insights for a batch of users.
+
+    Users are processed concurrently, with aggregation in the compute pool. Their items
+    are then written together with BatchWriteItem and their emails queued with
+    SendMessageBatch; only weekly reports are emailed. Returns per-record failures so only
+    the failed users are retried.
+    """
+    records = event['Records']
+    logger.info(f'Starting glucose data processing for {len(records)} record(s).')
+
+    failed = set()
+    user_ids = {}
+    for record in records:
+        try:
+            user_ids[record['messageId']] = json.loads(record['body'])['user_id']
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"Malformed message {record['messageId']}: {e}")
+            failed.add(record['messageId'])
 
-        logger.info(f'Processing data for user: {user_id}...')
+    futures = {message_id: user_executor.submit(process_user_data, user_id) for message_id, user_id in user_ids.items()}
 
+    item_keys = {}
+    items = {}
+    for message_id, future in futures.items():
         try:
-            report_key = process_user_data(user_id)
-            logger.info(f'Successfully processed data for user: {user_id}.')
+            user_items = future.result()
+            # Duplicate messages for a user share their items; BatchWriteItem rejects duplicate keys
+            item_keys[message_id] = [(item['user_id'], item['report_key']) for item in user_items]
+            items.update(zip(item_keys[message_id], user_items))
+            logger.info(f'Successfully processed data for user: {user_ids[message_id]}.')
         except Exception as e:
-            logger.error(f'Error processing user {user_id}: {str(e)}')
-            raise  # Let SQS handle retry
+            logger.error(f'Error processing user {user_ids[message_id]}: {str(e)}')
+            failed.add(message_id)
 
-        try:
-            queue_for_email(user_id, report_key)
-        except Exception as e:
-            logger.error(f'Failed to queue email for user {user_id}: {e}')
+    unwritten = store_insights(list(items.values()))
+    for message_id, keys in item_keys.items():
+        if any(key in unwritten for key in keys):
+            logger.error(f'Failed to store insights for user {user_ids[message_id]}.')
+            failed.add(message_id)
+
+    written = [key for key, item in items.items() if key not in unwritten and item['report_type'] == 'weekly']
+
+    # Reports are stored either way, so an email failure doesn't fail the record
+    try:
+        email_result = email_enqueuer.enqueue({'user_id': user_id, 'report_key': report_key} for user_id, report_key in written)
+        logger.info(f'Queued {email_result.enqueued} email job(s), {email_result.failed} failed.')
+    except Exception as e:
+        logger.error(f'Failed to queue email jobs: {e}')
 
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'message': 'Processing completed successfully.'})
-    }
\ No newline at end of file
+    logger.info(f'Processing batch complete. Records: {len(records)}, failed: {len(failed)}.')
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
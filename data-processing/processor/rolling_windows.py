@@ -0,0 +1,116 @@
+"""Rolling report windows kept current by adding and subtracting daily rollups."""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+
+from rollups import GlucoseRollup
+
+WINDOW_STATE_VERSION = 1
+
+
+def report_type(days: int) -> str:
+    """Report type, and report_key suffix, of a rolling window."""
+    return f'rolling-{days}d'
+
+
+def window_dates(period_end: date, days: int) -> List[str]:
+    """The window's readings dates, oldest first."""
+    return [(period_end - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+
+@dataclass
+class WindowAdvance:
+    """Days whose rollups move a window from its stored state to a new end date."""
+    entering: List[str]
+    leaving: List[str]
+
+
+@dataclass
+class RollingWindowState:
+    """
+    The merged rollup of a window's days, stored between runs.
+
+    `day_hashes` records the content hash of each partition merged in, so a partition
+    rewritten since (late or re-normalized readings) is detected rather than left
+    counted with its old content.
+    """
+    days: int
+    period_end: str                                        # YYYY-MM-DD (UTC), last day of the window
+    rollup: GlucoseRollup = field(default_factory=GlucoseRollup)
+    day_hashes: Dict[str, str] = field(default_factory=dict)  # Readings date -> partition content hash
+
+    @property
+    def first_data_date(self) -> Optional[str]:
+        """Earliest day in the window with readings."""
+        return min(self.day_hashes) if self.day_hashes else None
+
+    def plan_advance(self, period_end: date, partition_hashes: Dict[str, str]) -> Optional[WindowAdvance]:
+        """
+        Days to merge in and subtract out to move this window to end on `period_end`.
+
+        Returns None when the window has to be rebuilt instead: a day merged in earlier
+        has changed since, or the windows barely overlap and rebuilding is cheaper.
+        """
+        if any(partition_hashes.get(d) != series_hash for d, series_hash in self.day_hashes.items()):
+            return None
+
+        wanted = [d for d in window_dates(period_end, self.days) if d in partition_hashes]
+        entering = [d for d in wanted if d not in self.day_hashes]
+        leaving = sorted(set(self.day_hashes) - set(wanted))
+
+        if len(entering) + len(leaving) >= len(wanted):
+            return None
+        return WindowAdvance(entering, leaving)
+
+    def advance(
+        self,
+        period_end: date,
+        entering: Dict[str, GlucoseRollup],
+        leaving: Dict[str, GlucoseRollup],
+        partition_hashes: Dict[str, str]
+    ) -> 'RollingWindowState':
+        """The state after merging the entering days' rollups and subtracting the leaving days'."""
+        rollup = self.rollup.merge(GlucoseRollup.merge_all(entering.values()))
+        rollup = rollup.subtract(GlucoseRollup.merge_all(leaving.values()))
+
+        day_hashes = {d: h for d, h in self.day_hashes.items() if d not in leaving}
+        day_hashes.update((d, partition_hashes[d]) for d in entering)
+
+        return RollingWindowState(self.days, period_end.isoformat(), rollup, day_hashes)
+
+    @classmethod
+    def build(
+        cls,
+        days: int,
+        period_end: date,
+        rollups: Dict[str, GlucoseRollup],
+        partition_hashes: Dict[str, str]
+    ) -> 'RollingWindowState':
+        """A window's state built from scratch from every one of its days' rollups."""
+        return cls(
+            days=days,
+            period_end=period_end.isoformat(),
+            rollup=GlucoseRollup.merge_all(rollups.values()),
+            day_hashes={d: partition_hashes[d] for d in rollups}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': WINDOW_STATE_VERSION,
+            'days': self.days,
+            'period_end': self.period_end,
+            'rollup': self.rollup.to_dict(),
+            'day_hashes': dict(sorted(self.day_hashes.items()))
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingWindowState':
+        if data.get('version') != WINDOW_STATE_VERSION:
+            raise ValueError(f"Unsupported window state version: {data.get('version')}")
+
+        return cls(
+            days=data['days'],
+            period_end=data['period_end'],
+            rollup=GlucoseRollup.from_dict(data['rollup']),
+            day_hashes=dict(data['day_hashes'])
+        )
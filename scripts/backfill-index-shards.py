@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+One-off backfill of the shard attributes behind the sparse GSIs.
+
+The ingestion, processing and compaction coordinators list users through the
+active-users index, and the token refresher lists credentials through the
+expires-at index. Items only appear there once they carry `active_shard` /
+`refresh_shard`, which the API sets on (re)connect and the refresher on refresh.
+Existing items have neither, and existing users don't carry `data_source_connected`
+either, so connected users are found through the credentials table. Run this after
+the indexes exist and before the coordinators that query them are deployed (see
+DEPLOYMENT.md).
+
+Usage:
+    python scripts/backfill-index-shards.py --users-table <name> --credentials-table <name> \\
+        [--active-user-shards 16] [--credential-refresh-shards 8] [--region us-east-1]
+
+Safe to re-run: every write is conditioned so a user deactivated or disconnected
+meanwhile is left alone.
+"""
+import argparse
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+
+from active_users import active_shard  # noqa: E402
+from dexcom_credentials import refresh_shard  # noqa: E402
+
+
+def scan(table, filter_expression, projection):
+    scan_kwargs = {'ProjectionExpression': projection}
+    if filter_expression is not None:
+        scan_kwargs['FilterExpression'] = filter_expression
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill_active_shards(users_table, credentials_table, shards: int) -> int:
+    """
+    Mark every user holding Dexcom credentials as connected and list the active ones in
+    the active-users index. Users created before `data_source_connected` existed don't
+    carry it, so the credentials table is the source of truth for who is connected.
+    """
+    updated = 0
+    for item in scan(credentials_table, None, 'user_id'):
+        user_id = item['user_id']
+        try:
+            users_table.update_item(
+                Key={'user_id': user_id},
+                UpdateExpression='SET data_source_connected = :t, active_shard = :shard',
+                ConditionExpression='is_active = :t AND (attribute_not_exists(data_source_connected) OR data_source_connected = :t)',
+                ExpressionAttributeValues={':shard': active_shard(user_id, shards), ':t': True}
+            )
+            updated += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            mark_connected(users_table, user_id)
+    return updated
+
+
+def mark_connected(users_table, user_id: str) -> None:
+    """Record the connection of an inactive user so reactivating them lists them in the index."""
+    try:
+        users_table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='SET data_source_connected = :t',
+            ConditionExpression='attribute_exists(user_id) AND attribute_not_exists(data_source_connected)',
+            ExpressionAttributeValues={':t': True}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def backfill_refresh_shards(credentials_table, shards: int) -> int:
+    """List every stored Dexcom credential in the expires-at index."""
+    updated = 0
+    for item in scan(credentials_table, Attr('refresh_shard').not_exists(), 'user_id'):
+        try:
+            credentials_table.update_item(
+                Key={'user_id': item['user_id']},
+                UpdateExpression='SET refresh_shard = :shard',
+                ConditionExpression='attribute_exists(user_id) AND attribute_not_exists(refresh_shard)',
+                ExpressionAttributeValues={':shard': refresh_shard(item['user_id'], shards)}
+            )
+            updated += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users-table', required=True)
+    parser.add_argument('--credentials-table', required=True)
+    parser.add_argument('--active-user-shards', type=int, default=16)
+    parser.add_argument('--credential-refresh-shards', type=int, default=8)
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+
+    users = backfill_active_shards(
+        dynamodb.Table(args.users_table), dynamodb.Table(args.credentials_table), args.active_user_shards
+    )
+    print(f'Listed {users} user(s) in the active-users index.')
+
+    credentials = backfill_refresh_shards(dynamodb.Table(args.credentials_table), args.credential_refresh_shards)
+    print(f'Listed {credentials} credential(s) in the expires-at index.')
+
+
+if __name__ == '__main__':
+    main()
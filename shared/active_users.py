@@ -0,0 +1,46 @@
+"""Enumeration of the sparse active-users index on the users table."""
+import zlib
+from concurrent.futures import Executor
+from typing import List
+
+ACTIVE_USERS_INDEX = 'active-users-index'
+
+
+def active_shard(user_id: str, shards: int) -> int:
+    """Stable shard of the active-users index a user is listed under."""
+    return zlib.crc32(user_id.encode('utf-8')) % shards
+
+
+def query_active_shard(dynamodb_client, users_table: str, shard: int) -> List[str]:
+    """Return the IDs of the active, connected users listed under one shard."""
+    query_kwargs = {
+        'TableName': users_table,
+        'IndexName': ACTIVE_USERS_INDEX,
+        'KeyConditionExpression': 'active_shard = :shard',
+        'ExpressionAttributeValues': {':shard': {'N': str(shard)}},
+        'ProjectionExpression': 'user_id'
+    }
+
+    user_ids = []
+    while True:
+        response = dynamodb_client.query(**query_kwargs)
+        user_ids.extend(item['user_id']['S'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return user_ids
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def list_active_user_ids(dynamodb_client, users_table: str, shards: int, executor: Executor) -> List[str]:
+    """
+    Query every shard of the active-users index concurrently.
+
+    Users only carry an `active_shard` while they are active and have a connected
+    data source, so the cost scales with active users rather than the table size.
+    The low-level client is used because, unlike resources, it is thread-safe.
+    """
+    user_ids = []
+    for shard_user_ids in executor.map(
+        lambda shard: query_active_shard(dynamodb_client, users_table, shard), range(shards)
+    ):
+        user_ids.extend(shard_user_ids)
+    return user_ids
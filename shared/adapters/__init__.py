@@ -1,6 +1,18 @@
 """Adapters for converting CGM-specific formats to normalized format."""
 
-from .base import CGMAdapter
+from .base import CGMAdapter, NoValidReadingsError
 from .dexcom import DexcomAdapter
 
-__all__ = ['CGMAdapter', 'DexcomAdapter']
\ No newline at end of file
+# Adapter for each source name used in raw archive keys
+ADAPTERS = {
+    'dexcom': DexcomAdapter
+}
+
+
+def get_adapter(source: str) -> CGMAdapter:
+    if source not in ADAPTERS:
+        raise ValueError(f'No adapter for source: {source}')
+    return ADAPTERS[source]()
+
+
+__all__ = ['ADAPTERS', 'CGMAdapter', 'DexcomAdapter', 'NoValidReadingsError', 'get_adapter']
\ No newline at end of file
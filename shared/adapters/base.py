@@ -2,7 +2,11 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
 
-from models import GlucoseReading, GlucoseDataset
+from models import GlucoseReading, GlucoseDataset, GlucoseSeries
+
+
+class NoValidReadingsError(ValueError):
+    """Raised when a batch of raw readings holds no reading that could be normalized."""
 
 
 class CGMAdapter(ABC):
@@ -16,4 +20,8 @@ class CGMAdapter(ABC):
     @abstractmethod
     def normalize_dataset(self, user_id: str, readings_date_utc: str, ingested_at_utc: str, raw_readings: List[Dict[str, Any]]) -> GlucoseDataset:
         """Convert a complete dataset to normalized format."""
-        pass
\ No newline at end of file
+        pass
+
+    def normalize_series(self, user_id: str, readings_date_utc: str, ingested_at_utc: str, raw_readings: List[Dict[str, Any]]) -> GlucoseSeries:
+        """Convert a complete dataset to a columnar GlucoseSeries."""
+        return self.normalize_dataset(user_id, readings_date_utc, ingested_at_utc, raw_readings).to_series()
\ No newline at end of file
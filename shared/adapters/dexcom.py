@@ -1,8 +1,8 @@
 import logging
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterable, Iterator
 
-from models import GlucoseReading, GlucoseDataset
-from .base import CGMAdapter
+from models import GlucoseReading, GlucoseDataset, GlucoseSeries
+from .base import CGMAdapter, NoValidReadingsError
 
 logger = logging.getLogger(__name__)
 
@@ -32,24 +32,25 @@ class DexcomAdapter(CGMAdapter):
             unit='mg/dL'
         )
 
-    def normalize_dataset(self, user_id: str, readings_date_utc: str, ingested_at_utc: str, raw_readings: List[Dict[str, Any]]) -> GlucoseDataset:
+    def normalize_stream(self, user_id: str, raw_readings: Iterable[Dict[str, Any]]) -> Iterator[GlucoseReading]:
         """
-        Convert Dexcom dataset to normalized format.
+        Lazily convert raw Dexcom readings, yielding each valid reading as it is normalized.
 
         Fails gracefully: skips malformed individual readings but continues processing.
-        Fails fast: raises exception if ALL readings are malformed or invalid.
+        Fails fast: raises exception once the input is exhausted if ALL readings were
+        malformed or invalid. Consumers must therefore treat what they built from the
+        yielded readings as provisional until the generator finishes.
 
         Raises:
-            ValueError: If no readings could be successfully normalized
+            NoValidReadingsError: If no readings could be successfully normalized
         """
-        if not raw_readings:
-            raise ValueError(f"No raw readings provided for user {user_id}")
-
-        normalized_readings = []
+        total_processed = 0
+        success_count = 0
         skipped_count = 0
         error_count = 0
 
         for idx, raw_reading in enumerate(raw_readings):
+            total_processed += 1
             try:
                 # Validate required fields
                 if 'displayTime' not in raw_reading:
@@ -69,7 +70,6 @@ class DexcomAdapter(CGMAdapter):
 
                 # Attempt normalization
                 normalized_reading = self.normalize_reading(raw_reading)
-                normalized_readings.append(normalized_reading)
 
             except (KeyError, ValueError, TypeError) as e:
                 logger.warning(f"User {user_id}: Failed to normalize reading {idx}: {type(e).__name__}: {e}")
@@ -80,9 +80,13 @@ class DexcomAdapter(CGMAdapter):
                 error_count += 1
                 continue
 
+            success_count += 1
+            yield normalized_reading
+
+        if not total_processed:
+            raise NoValidReadingsError(f"No raw readings provided for user {user_id}")
+
         # Log summary
-        total_processed = len(raw_readings)
-        success_count = len(normalized_readings)
         logger.info(
             f"User {user_id}: Normalization complete. "
             f"Total: {total_processed}, Success: {success_count}, "
@@ -90,8 +94,8 @@ class DexcomAdapter(CGMAdapter):
         )
 
         # Fail fast if no readings were successfully normalized
-        if not normalized_readings:
-            raise ValueError(
+        if not success_count:
+            raise NoValidReadingsError(
                 f"Failed to normalize any readings for user {user_id}. "
                 f"Total raw readings: {total_processed}, "
                 f"Skipped: {skipped_count}, Errors: {error_count}"
@@ -106,6 +110,21 @@ class DexcomAdapter(CGMAdapter):
                 f"This may indicate a data format change."
             )
 
+    def normalize_dataset(self, user_id: str, readings_date_utc: str, ingested_at_utc: str, raw_readings: Iterable[Dict[str, Any]]) -> GlucoseDataset:
+        """
+        Convert Dexcom dataset to normalized format.
+
+        Readings from normalize_stream are appended straight into a columnar GlucoseSeries,
+        so no intermediate list of reading objects is built. The input may itself be a
+        stream. Skipping and fail-fast behaviour are those of normalize_stream.
+
+        Raises:
+            NoValidReadingsError: If no readings could be successfully normalized
+        """
+        normalized_readings = GlucoseSeries(unit='mg/dL')
+        for normalized_reading in self.normalize_stream(user_id, raw_readings):
+            normalized_readings.append_reading(normalized_reading)
+
         return GlucoseDataset(
             user_id=user_id,
             readings_date_utc=readings_date_utc,
@@ -0,0 +1,190 @@
+"""
+Weekly and monthly containers of closed daily partitions.
+
+Layout (all integers little-endian):
+
+    magic        4 bytes   b'ENDW'
+    version      uint8
+    index_len    uint32
+    index        JSON      CompactedObject, without the payload offset and ETag
+    payload                per day, in date order: the stored readings body, then its rollup JSON
+
+Days are stored contiguously in date order, so any run of days is one HTTP range.
+The day index is also copied into the user's manifest, letting readers issue that
+range without first reading the container's own index.
+
+Once a closed month's container is written, it is sealed: the month's daily partitions
+are deleted, its days leave the weekly containers, and the container's day index is all
+the manifest keeps for them.
+"""
+import calendar
+import json
+import struct
+from dataclasses import dataclass, field, asdict
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+
+MAGIC = b'ENDW'
+FORMAT_VERSION = 1
+CONTENT_TYPE = 'application/vnd.endo.glucose-container'
+
+GRANULARITY_WEEKLY = 'weekly'
+GRANULARITY_MONTHLY = 'monthly'
+GRANULARITIES = (GRANULARITY_MONTHLY, GRANULARITY_WEEKLY)  # Reader preference: fewest objects first
+
+_PREAMBLE = struct.Struct('<4sBI')
+
+
+@dataclass
+class CompactedDay:
+    """Where one day's readings and rollup sit in a container's payload."""
+    offset: int               # From the start of the payload
+    readings_length: int
+    rollup_length: int
+    readings_content_type: str
+    content_hash: str         # storage.content_hash() of the day's readings
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.readings_length + self.rollup_length
+
+
+@dataclass
+class CompactedObject:
+    key: str
+    granularity: str
+    period_start: str         # YYYY-MM-DD, inclusive
+    period_end: str           # YYYY-MM-DD, inclusive
+    payload_offset: int = 0   # Size of the preamble and index
+    etag: Optional[str] = None  # ETag of the written object; ranged reads are conditioned on it
+    days: Dict[str, CompactedDay] = field(default_factory=dict)
+    sealed: bool = False      # Holds the only stored copy of its days; their daily partitions are deleted
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompactedObject':
+        days = {d: CompactedDay(**day) for d, day in data.get('days', {}).items()}
+        return cls(**{**data, 'days': days})
+
+    def byte_range(self, readings_dates: Iterable[str]) -> Tuple[int, int]:
+        """Inclusive byte range covering the given days, for an HTTP Range header."""
+        days = [self.days[d] for d in readings_dates]
+        return (
+            self.payload_offset + min(day.offset for day in days),
+            self.payload_offset + max(day.end for day in days) - 1
+        )
+
+
+class DayBodies(NamedTuple):
+    readings: bytes
+    readings_content_type: str
+    rollup: bytes
+
+
+def period_bounds(granularity: str, day: date) -> Tuple[date, date]:
+    """First and last day of the ISO week or calendar month containing `day`."""
+    if granularity == GRANULARITY_WEEKLY:
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if granularity == GRANULARITY_MONTHLY:
+        last = calendar.monthrange(day.year, day.month)[1]
+        return day.replace(day=1), day.replace(day=last)
+    raise ValueError(f'Unknown compaction granularity: {granularity}')
+
+
+def period_label(granularity: str, period_start: date) -> str:
+    if granularity == GRANULARITY_WEEKLY:
+        year, week, _ = period_start.isocalendar()
+        return f'{year}-W{week:02d}'
+    return period_start.strftime('%Y-%m')
+
+
+def build_container(
+    key: str,
+    granularity: str,
+    period_start: date,
+    period_end: date,
+    days: Dict[str, Tuple[DayBodies, str]]
+) -> Tuple[bytes, CompactedObject]:
+    """Pack each day's (bodies, content hash) into a container. Returns the body and its index."""
+    compacted = CompactedObject(
+        key=key,
+        granularity=granularity,
+        period_start=period_start.isoformat(),
+        period_end=period_end.isoformat()
+    )
+
+    payload = bytearray()
+    for readings_date in sorted(days):
+        bodies, series_hash = days[readings_date]
+        compacted.days[readings_date] = CompactedDay(
+            offset=len(payload),
+            readings_length=len(bodies.readings),
+            rollup_length=len(bodies.rollup),
+            readings_content_type=bodies.readings_content_type,
+            content_hash=series_hash
+        )
+        payload += bodies.readings
+        payload += bodies.rollup
+
+    index = compacted.to_dict()
+    del index['payload_offset'], index['etag'], index['sealed']
+    index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    compacted.payload_offset = _PREAMBLE.size + len(index_bytes)
+
+    preamble = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(index_bytes))
+    return preamble + index_bytes + bytes(payload), compacted
+
+
+def read_index(body: bytes) -> CompactedObject:
+    """Read a container's index from its first bytes (the whole body or a prefix covering the index)."""
+    magic, version, index_len = _PREAMBLE.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError('Not a compacted glucose container (bad magic)')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported compacted container version: {version}')
+
+    index = json.loads(body[_PREAMBLE.size:_PREAMBLE.size + index_len].decode('utf-8'))
+    return CompactedObject.from_dict({**index, 'payload_offset': _PREAMBLE.size + index_len})
+
+
+def split_range(compacted: CompactedObject, readings_dates: Iterable[str], data: bytes, range_start: int) -> Dict[str, DayBodies]:
+    """Cut the requested days out of bytes fetched from `range_start`."""
+    bodies = {}
+    for readings_date in readings_dates:
+        day = compacted.days[readings_date]
+        start = compacted.payload_offset + day.offset - range_start
+        middle = start + day.readings_length
+        bodies[readings_date] = DayBodies(
+            readings=data[start:middle],
+            readings_content_type=day.readings_content_type,
+            rollup=data[middle:middle + day.rollup_length]
+        )
+    return bodies
+
+
+def compacted_days(compacted_objects: Iterable[CompactedObject], partition_hashes: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Choose a container for each day that has one holding its current content.
+
+    Monthly containers are preferred over weekly ones; days whose stored partition has
+    changed since compaction are left out and must be read from the daily partition.
+    Returns the days to read from each container, keyed by container key.
+    """
+    by_granularity = {granularity: [] for granularity in GRANULARITIES}
+    for compacted in compacted_objects:
+        by_granularity[compacted.granularity].append(compacted)
+
+    plan: Dict[str, List[str]] = {}
+    for readings_date, series_hash in sorted(partition_hashes.items()):
+        for granularity in GRANULARITIES:
+            match = next((
+                c for c in by_granularity[granularity]
+                if readings_date in c.days and c.days[readings_date].content_hash == series_hash
+            ), None)
+            if match is not None:
+                plan.setdefault(match.key, []).append(readings_date)
+                break
+    return plan
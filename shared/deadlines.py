@@ -0,0 +1,40 @@
+"""Deadline-bounded submission of work to a thread pool."""
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from time import monotonic
+from typing import Callable, List, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def submit_until_deadline(
+    executor: Executor,
+    fn: Callable[[T], R],
+    items: Sequence[T],
+    max_in_flight: int,
+    deadline: float
+) -> Tuple[List[Tuple[T, 'Future[R]']], List[T]]:
+    """
+    Run fn(item) for each item with at most `max_in_flight` running at once, starting none after `deadline`.
+
+    executor.submit() never blocks, so checking a deadline around it alone would queue every
+    item at once. Instead, each submission first waits for a running item to finish, and the
+    deadline (a time.monotonic() value) is checked just before it starts.
+
+    Returns the submitted items with their futures, all finished, and the items never started.
+    """
+    submitted = []
+    in_flight = set()
+    for index, item in enumerate(items):
+        while len(in_flight) >= max_in_flight:
+            _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        if monotonic() >= deadline:
+            wait(in_flight)
+            return submitted, list(items[index:])
+
+        future = executor.submit(fn, item)
+        submitted.append((item, future))
+        in_flight.add(future)
+
+    wait(in_flight)
+    return submitted, []
@@ -0,0 +1,227 @@
+"""Pooled, retrying HTTP client for the Dexcom API."""
+import codecs
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from dexcom_retry import ClientMetrics, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+DEXCOM_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+EGV_RECORD_KEYS = ('records', 'egvs')  # v3 responses use 'records'; older ones 'egvs'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class DexcomClient:
+    """
+    Dexcom API client with keep-alive connection pooling, timeouts and retries.
+
+    Create one instance per process and reuse it across warm Lambda invocations so
+    TLS connections are reused. Instances are safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        pool_size: int = 10,
+        rate_limiter=None
+    ):
+        self.base_url = base_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_policy = RetryPolicy(max_retries, backoff_base, backoff_max)
+        self.metrics = ClientMetrics()
+        self.rate_limiter = rate_limiter  # Optional RateLimiter; every attempt, including retries, takes a token
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
+        """Exchange a refresh token for a new token set (access_token, refresh_token, expires_in)."""
+        response = self._request(
+            'POST',
+            '/v2/oauth2/token',
+            endpoint='token',
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': refresh_token,
+                'grant_type': 'refresh_token'
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+        return response.json()
+
+    def get_egvs(self, access_token: str, start_date: datetime, end_date: datetime) -> list[dict]:
+        """Fetch estimated glucose values (EGVs) between two UTC system times."""
+        return list(self.iter_egvs(access_token, start_date, end_date))
+
+    def iter_egvs(self, access_token: str, start_date: datetime, end_date: datetime) -> Iterator[dict]:
+        """
+        Stream EGV records between two UTC system times, parsing the body as it arrives.
+
+        Only one network chunk and one record are held at a time, however long the window.
+        The connection is held until the iterator is exhausted or closed.
+        """
+        response = self._request(
+            'GET',
+            '/v3/users/self/egvs',
+            endpoint='egvs',
+            params={
+                'startDate': start_date.strftime(DEXCOM_DATETIME_FORMAT),
+                'endDate': end_date.strftime(DEXCOM_DATETIME_FORMAT)
+            },
+            headers={'Authorization': f'Bearer {access_token}'},
+            stream=True
+        )
+        with response:
+            yield from iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), EGV_RECORD_KEYS)
+
+    def _request(self, method: str, path: str, endpoint: str, **kwargs) -> requests.Response:
+        """Send a request, retrying connection errors, 429 and 5xx with jittered backoff."""
+        url = f'{self.base_url}{path}'
+        attempt = 0
+
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(endpoint)
+
+            started = time.monotonic()
+            response: Optional[requests.Response] = None
+            error: Optional[requests.RequestException] = None
+
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            latency_ms = (time.monotonic() - started) * 1000
+            self.metrics.record_attempt(endpoint, latency_ms, retried=attempt > 0)
+
+            if not self.retry_policy.should_retry(attempt, None if error is not None else response.status_code):
+                break
+
+            delay = self.retry_policy.delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+            if response is not None:
+                response.close()  # Release the pooled connection of a streamed response
+            logger.warning(
+                f'Dexcom {endpoint} attempt {attempt + 1} failed '
+                f'({error or response.status_code}), retrying in {delay:.2f}s.'
+            )
+            time.sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            self.metrics.record_failure(endpoint)
+            raise error
+
+        if response.status_code != 200:
+            self.metrics.record_failure(endpoint)
+            logger.error(f'Dexcom API error: {response.status_code} - {response.text}')
+
+        response.raise_for_status()
+        return response
+
+
+class _JSONStream:
+    """A growing window over a chunked UTF-8 JSON body, decoded one value at a time."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping what has been consumed. Returns False at end of body."""
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + self.utf8.decode(chunk)
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos:] + self.utf8.decode(b'', final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of body."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'Malformed JSON stream: expected one of {chars!r}, got {char!r}')
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """
+        Decode the next complete value.
+
+        A decode that fails, or that ends at the end of the buffer (a number may continue
+        in the next chunk), is retried with more data until the body ends.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_array(chunks: Iterable[bytes], keys: Tuple[str, ...]) -> Iterator[Any]:
+    """
+    Yield the items of the array stored under the first of `keys` in a JSON object body.
+
+    Other members are decoded whole and discarded, so they should be small. Yields
+    nothing if none of the keys is present.
+    """
+    stream = _JSONStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+
+    while True:
+        key = stream.value()
+        stream.expect(':')
+
+        if key in keys and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                return
+            while True:
+                yield stream.value()
+                if stream.expect(',]') == ']':
+                    return
+
+        stream.value()
+        if stream.expect(',}') == '}':
+            return
@@ -0,0 +1,73 @@
+"""Dexcom credential refresh shared by the ingestion worker and the token refresher."""
+import logging
+import zlib
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+EXPIRES_AT_INDEX = 'expires-at-index'
+
+
+def refresh_shard(user_id: str, shards: int) -> int:
+    """Stable hash-key shard of the expires-at index a credential is listed under."""
+    return zlib.crc32(user_id.encode('utf-8')) % shards
+
+
+def refresh_credentials(dexcom_client, credentials_table, credentials: Dict[str, Any], shards: int) -> Dict[str, Any]:
+    """
+    Exchange the refresh token and persist the new token set, including the rotated refresh token.
+
+    The write is conditioned on the refresh token that was exchanged, so a slower concurrent
+    refresh can never overwrite newer tokens with ones Dexcom has already rotated away.
+    Returns the credentials with the new tokens applied; if a concurrent refresh won, returns
+    the tokens it stored instead, since the ones obtained here were never persisted.
+    """
+    user_id = credentials['user_id']
+    token_data = dexcom_client.refresh_token(credentials['refresh_token'])
+
+    now = datetime.now(timezone.utc)
+    refreshed = {
+        **credentials,
+        'access_token': token_data['access_token'],
+        'refresh_token': token_data.get('refresh_token', credentials['refresh_token']),
+        'expires_at': (now + timedelta(seconds=token_data['expires_in'])).isoformat()
+    }
+
+    try:
+        credentials_table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='SET access_token = :at, refresh_token = :rt, expires_at = :ea, updated_at = :ua, refresh_shard = :rs',
+            ConditionExpression='refresh_token = :previous',
+            ExpressionAttributeValues={
+                ':at': refreshed['access_token'],
+                ':rt': refreshed['refresh_token'],
+                ':ea': refreshed['expires_at'],
+                ':ua': now.isoformat(),
+                ':rs': refresh_shard(user_id, shards),
+                ':previous': credentials['refresh_token']
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        logger.warning(f'Credentials for user: {user_id} were refreshed concurrently, keeping the stored tokens.')
+        return load_stored_tokens(credentials_table, credentials)
+
+    logger.info(f'Token refreshed for user: {user_id}.')
+    return refreshed
+
+
+def load_stored_tokens(credentials_table, credentials: Dict[str, Any]) -> Dict[str, Any]:
+    """Re-read the persisted token set after losing a refresh race."""
+    user_id = credentials['user_id']
+    response = credentials_table.get_item(
+        Key={'user_id': user_id},
+        ProjectionExpression='access_token, refresh_token, expires_at',
+        ConsistentRead=True
+    )
+    if 'Item' not in response:
+        raise ValueError(f'Dexcom credentials for user: {user_id} were removed during refresh.')
+    return {**credentials, **response['Item']}
@@ -0,0 +1,92 @@
+"""Retry policy and metrics shared by the Dexcom API clients, independent of the HTTP library."""
+import email.utils
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retries connection errors, 429 and 5xx with full-jitter exponential backoff, honoring Retry-After."""
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+
+    def should_retry(self, attempt: int, status_code: Optional[int]) -> bool:
+        """Whether a failed attempt is retried; `status_code` is None for a connection error or timeout."""
+        retryable = status_code is None or status_code in RETRY_STATUS_CODES
+        return retryable and attempt < self.max_retries
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt, given the failed response's Retry-After header."""
+        retry_after_seconds = parse_retry_after(retry_after)
+        if retry_after_seconds is not None:
+            return min(retry_after_seconds, self.backoff_max)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+@dataclass
+class EndpointMetrics:
+    """Counters for one Dexcom endpoint."""
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    total_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'avg_latency_ms': round(self.total_latency_ms / self.calls, 1) if self.calls else 0.0,
+            'max_latency_ms': round(self.max_latency_ms, 1)
+        }
+
+
+@dataclass
+class ClientMetrics:
+    """Thread-safe per-endpoint latency and retry counters."""
+    endpoints: Dict[str, EndpointMetrics] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_attempt(self, endpoint: str, latency_ms: float, retried: bool) -> None:
+        with self._lock:
+            metrics = self.endpoints.setdefault(endpoint, EndpointMetrics())
+            metrics.calls += 1
+            metrics.total_latency_ms += latency_ms
+            metrics.max_latency_ms = max(metrics.max_latency_ms, latency_ms)
+            if retried:
+                metrics.retries += 1
+
+    def record_failure(self, endpoint: str) -> None:
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointMetrics()).failures += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in self.endpoints.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,153 @@
+"""
+Compact binary codec for normalized glucose datasets.
+
+Layout (all integers little-endian):
+
+    magic        4 bytes   b'ENDO'
+    version      uint8
+    flags        uint8     bit 0: payload is zlib-compressed
+    header_len   uint32
+    header       JSON      dataset metadata, unit, reading count and value scale
+    payload                (optionally compressed)
+        first_timestamp   int64     epoch seconds of the first reading
+        deltas            int32[n-1] gap to the previous reading minus the 5-minute cadence
+        values            uint16[n]  value * VALUE_SCALE
+
+On a regular 5-minute stream every delta is zero, which compresses to almost nothing.
+"""
+import json
+import operator
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, chain, repeat
+from typing import Dict, Any, Tuple
+
+from models import GlucoseDataset, GlucoseSeries
+
+MAGIC = b'ENDO'
+FORMAT_VERSION = 1
+CONTENT_TYPE = 'application/vnd.endo.glucose-series'
+
+FLAG_COMPRESSED = 0x01
+
+CADENCE_SECONDS = 300
+VALUE_SCALE = 10  # Values stored in tenths of a unit
+MAX_VALUE = 0xFFFF / VALUE_SCALE
+
+_PREAMBLE = struct.Struct('<4sBBI')
+_FIRST_TIMESTAMP = struct.Struct('<q')
+
+
+def encode_dataset(dataset: GlucoseDataset, compress: bool = True) -> bytes:
+    """Encode a dataset (list- or series-backed) into the binary format."""
+    series = dataset.to_series()
+    header = {
+        'user_id': dataset.user_id,
+        'readings_date_utc': dataset.readings_date_utc,
+        'ingested_at_utc': dataset.ingested_at_utc,
+        'source': dataset.source,
+        'source_version': dataset.source_version,
+        'unit': series.unit,
+        'count': len(series),
+        'value_scale': VALUE_SCALE
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+    payload = _encode_columns(series)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= FLAG_COMPRESSED
+
+    return _PREAMBLE.pack(MAGIC, FORMAT_VERSION, flags, len(header_bytes)) + header_bytes + payload
+
+
+def decode_series(body: bytes) -> Tuple[Dict[str, Any], GlucoseSeries]:
+    """Decode a binary body into its header metadata and a GlucoseSeries."""
+    if not is_encoded(body):
+        raise ValueError('Not an encoded glucose dataset (bad magic)')
+
+    _, version, flags, header_len = _PREAMBLE.unpack_from(body)
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported glucose dataset format version: {version}')
+
+    header_end = _PREAMBLE.size + header_len
+    header = json.loads(body[_PREAMBLE.size:header_end].decode('utf-8'))
+
+    payload = body[header_end:]
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+
+    series = _decode_columns(payload, header['count'], header['value_scale'], header['unit'])
+    return header, series
+
+
+def decode_dataset(body: bytes) -> GlucoseDataset:
+    header, series = decode_series(body)
+    return series.to_dataset(
+        user_id=header['user_id'],
+        readings_date_utc=header['readings_date_utc'],
+        ingested_at_utc=header['ingested_at_utc'],
+        source=header['source'],
+        source_version=header['source_version']
+    )
+
+
+def is_encoded(body: bytes) -> bool:
+    return body[:len(MAGIC)] == MAGIC
+
+
+def _encode_columns(series: GlucoseSeries) -> bytes:
+    count = len(series)
+    if count == 0:
+        return b''
+
+    timestamps = series.timestamps
+    deltas = array('i', (
+        current - previous - CADENCE_SECONDS
+        for previous, current in zip(timestamps, timestamps[1:])
+    ))
+
+    if min(series.values) < 0 or max(series.values) > MAX_VALUE:
+        raise ValueError(f'Glucose values must be within 0-{MAX_VALUE} to be encoded')
+    values = array('H', (round(value * VALUE_SCALE) for value in series.values))
+
+    return _FIRST_TIMESTAMP.pack(timestamps[0]) + _to_little_endian(deltas) + _to_little_endian(values)
+
+
+def _decode_columns(payload: bytes, count: int, value_scale: int, unit: str) -> GlucoseSeries:
+    if count == 0:
+        return GlucoseSeries(unit=unit)
+
+    (first_timestamp,) = _FIRST_TIMESTAMP.unpack_from(payload)
+    offset = _FIRST_TIMESTAMP.size
+
+    deltas = _from_little_endian('i', payload[offset:offset + 4 * (count - 1)])
+    offset += 4 * (count - 1)
+    scaled_values = _from_little_endian('H', payload[offset:offset + 2 * count])
+
+    if len(deltas) != count - 1 or len(scaled_values) != count:
+        raise ValueError('Truncated glucose dataset payload')
+
+    gaps = map(operator.add, deltas, repeat(CADENCE_SECONDS))
+    timestamps = array('q', accumulate(chain((first_timestamp,), gaps)))
+    values = array('f', map(operator.truediv, scaled_values, repeat(value_scale)))
+
+    return GlucoseSeries(timestamps=timestamps, values=values, unit=unit)
+
+
+def _to_little_endian(column: array) -> bytes:
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data[:len(data) - len(data) % column.itemsize])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
@@ -0,0 +1,83 @@
+"""Glucose range thresholds and categorization shared by ingestion and processing."""
+import math
+from bisect import bisect_left, bisect_right
+from enum import Enum
+from typing import Dict, Sequence
+
+
+# Glucose range thresholds (mg/dL)
+VERY_LOW_THRESHOLD = 54
+LOW_THRESHOLD = 70
+HIGH_THRESHOLD = 180
+VERY_HIGH_THRESHOLD = 250
+
+# CGM reads every 5 minutes
+READINGS_PER_DAY = 288
+
+
+class GlucoseCategory(str, Enum):
+    """Glucose range categories."""
+    VERY_LOW = 'very_low'
+    LOW = 'low'
+    TARGET = 'target'
+    HIGH = 'high'
+    VERY_HIGH = 'very_high'
+
+
+def categorize_glucose_value(value: float) -> GlucoseCategory:
+    """
+    Categorize a glucose value into range buckets.
+
+    Args:
+        value: Glucose value in mg/dL
+
+    Returns:
+        GlucoseCategory enum value
+    """
+    if value < VERY_LOW_THRESHOLD:
+        return GlucoseCategory.VERY_LOW
+    elif value < LOW_THRESHOLD:
+        return GlucoseCategory.LOW
+    elif value <= HIGH_THRESHOLD:
+        return GlucoseCategory.TARGET
+    elif value <= VERY_HIGH_THRESHOLD:
+        return GlucoseCategory.HIGH
+    else:
+        return GlucoseCategory.VERY_HIGH
+
+
+def count_categories(sorted_values: Sequence[float]) -> Dict[GlucoseCategory, int]:
+    """
+    Count values per range category using binary search on the thresholds.
+
+    Matches categorize_glucose_value() boundaries: the low thresholds are exclusive
+    (value < 54, value < 70) and the high thresholds inclusive (value <= 180, value <= 250).
+
+    Args:
+        sorted_values: Glucose values in ascending order
+
+    Returns:
+        Mapping of every GlucoseCategory to its count
+    """
+    very_low_end = bisect_left(sorted_values, VERY_LOW_THRESHOLD)
+    low_end = bisect_left(sorted_values, LOW_THRESHOLD)
+    target_end = bisect_right(sorted_values, HIGH_THRESHOLD)
+    high_end = bisect_right(sorted_values, VERY_HIGH_THRESHOLD)
+
+    return {
+        GlucoseCategory.VERY_LOW: very_low_end,
+        GlucoseCategory.LOW: low_end - very_low_end,
+        GlucoseCategory.TARGET: target_end - low_end,
+        GlucoseCategory.HIGH: high_end - target_end,
+        GlucoseCategory.VERY_HIGH: len(sorted_values) - high_end
+    }
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Linearly interpolated percentile of ascending values (same method as numpy's default)."""
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return float(sorted_values[lower])
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
@@ -0,0 +1,220 @@
+"""Per-user index of the normalized partitions stored in S3."""
+import json
+import logging
+from dataclasses import dataclass, field, asdict, replace
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from compaction import CompactedObject, compacted_days
+from storage import CONDITIONAL_WRITE_CONFLICTS, JSON_CONTENT_TYPE, manifest_key
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_WRITE_ATTEMPTS = 3
+
+
+@dataclass
+class PartitionEntry:
+    """What one stored readings partition holds, without opening it."""
+    readings_date: str             # YYYY-MM-DD (UTC), the partition's date
+    key: str                       # S3 key of the readings object
+    format: str                    # Storage format (storage.FORMAT_BINARY / FORMAT_JSON)
+    format_version: int            # Version of that format
+    bytes: int                     # Object size
+    count: int                     # Number of readings
+    content_hash: str              # storage.content_hash() of the readings
+    first_timestamp: Optional[int] = None  # Epoch seconds of earliest reading (local time)
+    last_timestamp: Optional[int] = None   # Epoch seconds of latest reading (local time)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PartitionEntry':
+        return cls(**data)
+
+
+@dataclass
+class PartitionManifest:
+    """
+    The partitions that exist for a user, keyed by readings date.
+
+    Readers list the days they need from here instead of probing S3 for each one, and
+    can size a window (readings, covered period) from the counts and timestamps alone.
+
+    Partitions written before the manifest was created are not listed, so dates up to
+    and including `indexed_since` may still exist without an entry. A backfill moves
+    `indexed_since` back once it has listed every day of its range.
+
+    `compacted` lists the weekly and monthly containers holding copies of closed days,
+    keyed by S3 key, with each container's day index. Days of a sealed (monthly)
+    container have no daily partition and no entry in `partitions`, unless readings
+    arrived for them after sealing; the entry then supersedes the container's copy.
+    """
+    user_id: str
+    indexed_since: str  # YYYY-MM-DD (UTC) the manifest was created
+    partitions: Dict[str, PartitionEntry] = field(default_factory=dict)
+    compacted: Dict[str, CompactedObject] = field(default_factory=dict)
+
+    def upsert(self, entries: Iterable[PartitionEntry]) -> bool:
+        """Add or replace entries. Returns whether anything changed."""
+        changed = False
+        for entry in entries:
+            if self.partitions.get(entry.readings_date) != entry:
+                self.partitions[entry.readings_date] = entry
+                changed = True
+        return changed
+
+    def upsert_compacted(self, compacted_objects: Iterable[CompactedObject]) -> bool:
+        """Add or replace containers. Returns whether anything changed."""
+        changed = False
+        for compacted in compacted_objects:
+            if self.compacted.get(compacted.key) != compacted:
+                self.compacted[compacted.key] = compacted
+                changed = True
+        return changed
+
+    def remove_compacted(self, keys: Iterable[str]) -> bool:
+        """Drop containers. Returns whether anything changed."""
+        removed = [self.compacted.pop(key) for key in keys if key in self.compacted]
+        return bool(removed)
+
+    def seal(self, compacted: CompactedObject) -> List[PartitionEntry]:
+        """
+        Record a container as the only stored copy of its days.
+
+        The partition entries it holds the current content of are dropped; entries that
+        changed since it was written stay and keep superseding it. Returns the dropped
+        entries, whose daily objects can then be deleted.
+        """
+        self.compacted[compacted.key] = replace(compacted, sealed=True)
+        return [
+            self.partitions.pop(d) for d, day in compacted.days.items()
+            if d in self.partitions and self.partitions[d].content_hash == day.content_hash
+        ]
+
+    def sealed_container(self, readings_date: str) -> Optional[CompactedObject]:
+        """The sealed container holding this date's stored copy, if any."""
+        return next((c for c in self.compacted.values() if c.sealed and readings_date in c.days), None)
+
+    def content_hashes(self, readings_dates: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Content hash of every stored day (or of the given ones), keyed by readings date.
+
+        A day's partition entry wins over its sealed container copy.
+        """
+        hashes = {d: day.content_hash for c in self.compacted.values() if c.sealed for d, day in c.days.items()}
+        hashes.update((d, entry.content_hash) for d, entry in self.partitions.items())
+        if readings_dates is None:
+            return hashes
+        return {d: hashes[d] for d in readings_dates if d in hashes}
+
+    def compacted_dates(self, readings_dates: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        The given dates that can be read from a container, grouped by container key.
+
+        A date qualifies only while its container copy matches the current content.
+        """
+        return compacted_days(self.compacted.values(), self.content_hashes(readings_dates))
+
+    def entries_for(self, readings_dates: Iterable[str]) -> List[PartitionEntry]:
+        """Entries for the given dates that have a partition, in the order given."""
+        return [self.partitions[d] for d in readings_dates if d in self.partitions]
+
+    def is_complete_for(self, readings_date: str) -> bool:
+        """
+        Whether the manifest is authoritative for this date.
+
+        A listed date always is, as is any date of a sealed container's period (only
+        complete months are sealed); otherwise a missing entry only means the partition
+        does not exist for dates after `indexed_since`.
+        """
+        return (
+            readings_date in self.partitions
+            or readings_date > self.indexed_since
+            or any(c.sealed and c.period_start <= readings_date <= c.period_end for c in self.compacted.values())
+        )
+
+    def extend_coverage(self, start_date: date, end_date: date) -> bool:
+        """
+        Record that every partition from start_date to end_date (inclusive) is listed.
+
+        Called once a backfill of that range has written, and listed, each of its days.
+        `indexed_since` only moves back when the range reaches it, so no unindexed gap is
+        left in between. Returns whether anything changed.
+        """
+        covered_after = (start_date - timedelta(days=1)).isoformat()
+        if covered_after < self.indexed_since <= end_date.isoformat():
+            self.indexed_since = covered_after
+            return True
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': MANIFEST_VERSION,
+            'user_id': self.user_id,
+            'indexed_since': self.indexed_since,
+            'partitions': [asdict(self.partitions[d]) for d in sorted(self.partitions)],
+            'compacted': [self.compacted[k].to_dict() for k in sorted(self.compacted)]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PartitionManifest':
+        version = data.get('version')
+        if version != MANIFEST_VERSION:
+            raise ValueError(f'Unsupported manifest version: {version}')
+
+        entries = (PartitionEntry.from_dict(entry) for entry in data.get('partitions', []))
+        compacted = (CompactedObject.from_dict(c) for c in data.get('compacted', []))
+        return cls(
+            user_id=data['user_id'],
+            indexed_since=data['indexed_since'],
+            partitions={entry.readings_date: entry for entry in entries},
+            compacted={c.key: c for c in compacted}
+        )
+
+
+def load_manifest(s3, bucket: str, user_id: str) -> Tuple[Optional[PartitionManifest], Optional[str]]:
+    """The user's manifest and its ETag, or (None, None) if none has been written."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=manifest_key(user_id))
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return PartitionManifest.from_dict(json.loads(response['Body'].read().decode('utf-8'))), response['ETag']
+
+
+def apply_manifest_update(s3, bucket: str, user_id: str, update: Callable[[PartitionManifest], bool]) -> None:
+    """
+    Read-modify-write the user's manifest, creating it if needed.
+
+    `update` mutates the manifest and returns whether it changed; nothing is written
+    otherwise. The write is conditional on the version read, and the update is re-applied
+    to the newer manifest if another writer got there first.
+    """
+    for attempt in range(MANIFEST_WRITE_ATTEMPTS):
+        manifest, etag = load_manifest(s3, bucket, user_id)
+        if manifest is None:
+            manifest = PartitionManifest(user_id=user_id, indexed_since=datetime.now(timezone.utc).date().isoformat())
+            condition = {'IfNoneMatch': '*'}
+        else:
+            condition = {'IfMatch': etag}
+
+        if not update(manifest):
+            return
+
+        try:
+            s3.put_object(
+                Bucket=bucket,
+                Key=manifest_key(user_id),
+                Body=json.dumps(manifest.to_dict()),
+                ContentType=JSON_CONTENT_TYPE,
+                **condition
+            )
+            logger.info(f'Updated manifest for user: {user_id} ({len(manifest.partitions)} partition(s), {len(manifest.compacted)} compacted).')
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] not in CONDITIONAL_WRITE_CONFLICTS:
+                raise
+            logger.info(f'Manifest for user: {user_id} changed concurrently; retrying (attempt {attempt + 1}).')
+
+    raise RuntimeError(f'Could not update manifest for user: {user_id} after {MANIFEST_WRITE_ATTEMPTS} attempts.')
@@ -1,6 +1,47 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import List, Dict, Any, Union
+import heapq
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import List, Dict, Any, Iterable, Iterator, Union
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_seconds(timestamp: Union[str, datetime]) -> int:
+    """
+    Convert a local wall-clock timestamp to epoch seconds.
+
+    Any UTC offset is dropped: the wall-clock fields are encoded as if they were UTC,
+    so the value round-trips through from_epoch_seconds() to the same local time.
+    """
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp())
+
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    """Convert epoch seconds produced by to_epoch_seconds() back to a naive local datetime."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+def epoch_day_seconds(day: str) -> int:
+    """to_epoch_seconds() of midnight on a 'YYYY-MM-DD' date."""
+    return (date.fromisoformat(day).toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+def epoch_seconds_to_iso(timestamps: Iterable[int]) -> List[str]:
+    """from_epoch_seconds(ts).isoformat() for each timestamp, formatting each date only once."""
+    day_cache: Dict[int, str] = {}
+    formatted = []
+    for ts in timestamps:
+        days, seconds = divmod(ts, 86400)
+        day = day_cache.get(days)
+        if day is None:
+            day = day_cache[days] = date.fromordinal(days + _EPOCH_ORDINAL).isoformat()
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        formatted.append(f'{day}T{hours:02d}:{minutes:02d}:{seconds:02d}')
+    return formatted
 
 
 @dataclass
@@ -29,22 +70,146 @@ class GlucoseReading:
             unit=data.get('unit', 'mg/dL')
         )
 
+
+@dataclass
+class GlucoseSeries:
+    """
+    Columnar glucose readings backed by contiguous arrays.
+
+    Stores the same data as a List[GlucoseReading] at a fraction of the memory:
+    one int64 and one float32 per reading, with the unit stored once. float32 holds
+    every integer mg/dL value CGMs report exactly.
+    """
+    timestamps: array = field(default_factory=lambda: array('q'))  # Epoch seconds of the local wall-clock time
+    values: array = field(default_factory=lambda: array('f'))      # Glucose values in `unit`
+    unit: str = "mg/dL"
+
+    def __post_init__(self):
+        if not isinstance(self.timestamps, array) or self.timestamps.typecode != 'q':
+            self.timestamps = array('q', self.timestamps)
+        if not isinstance(self.values, array) or self.values.typecode != 'f':
+            self.values = array('f', self.values)
+        if len(self.timestamps) != len(self.values):
+            raise ValueError(
+                f"Timestamp and value arrays differ in length: "
+                f"{len(self.timestamps)} != {len(self.values)}"
+            )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, timestamp_local: Union[str, datetime, int], value: float) -> None:
+        """Append one reading. Integer timestamps are taken as epoch seconds."""
+        if not isinstance(timestamp_local, int):
+            timestamp_local = to_epoch_seconds(timestamp_local)
+        self.timestamps.append(timestamp_local)
+        self.values.append(value)
+
+    def extend(self, other: 'GlucoseSeries') -> None:
+        """Append every reading of another series with the same unit."""
+        if other.unit != self.unit:
+            raise ValueError(f"Cannot extend {self.unit} series with {other.unit} readings")
+        self.timestamps.extend(other.timestamps)
+        self.values.extend(other.values)
+
+    def merge(self, other: 'GlucoseSeries') -> 'GlucoseSeries':
+        """
+        Sorted union of two series with duplicate timestamps collapsed.
+
+        Where both series hold a reading for the same timestamp, the value from
+        `other` wins.
+        """
+        if other.unit != self.unit:
+            raise ValueError(f"Cannot merge {other.unit} readings into {self.unit} series")
+
+        merged = GlucoseSeries(unit=self.unit)
+        existing = ((ts, 0, value) for ts, value in sorted(zip(self.timestamps, self.values)))
+        incoming = ((ts, 1, value) for ts, value in sorted(zip(other.timestamps, other.values)))
+
+        for ts, _, value in heapq.merge(existing, incoming):
+            if merged.timestamps and merged.timestamps[-1] == ts:
+                merged.values[-1] = value
+            else:
+                merged.timestamps.append(ts)
+                merged.values.append(value)
+
+        return merged
+
+    def append_reading(self, reading: GlucoseReading) -> None:
+        if reading.unit != self.unit:
+            raise ValueError(f"Cannot append {reading.unit} reading to {self.unit} series")
+        self.append(reading.timestamp_local, reading.value)
+
+    def datetimes(self) -> Iterator[datetime]:
+        """Iterate reading timestamps as naive local datetimes."""
+        return (from_epoch_seconds(ts) for ts in self.timestamps)
+
+    def to_readings(self) -> List[GlucoseReading]:
+        return [
+            GlucoseReading(timestamp_local=ts, value=value, unit=self.unit)
+            for ts, value in zip(self.datetimes(), self.values)
+        ]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Serialize readings in the same shape as GlucoseReading.to_dict()."""
+        return [
+            {'timestamp': ts.isoformat(), 'value': value, 'unit': self.unit}
+            for ts, value in zip(self.datetimes(), self.values)
+        ]
+
+    @classmethod
+    def from_readings(cls, readings: Iterable[GlucoseReading], unit: str = "mg/dL") -> 'GlucoseSeries':
+        series = cls(unit=unit)
+        for reading in readings:
+            series.append_reading(reading)
+        return series
+
+    @classmethod
+    def from_dataset(cls, dataset: 'GlucoseDataset') -> 'GlucoseSeries':
+        if isinstance(dataset.readings, GlucoseSeries):
+            return dataset.readings
+        unit = dataset.readings[0].unit if dataset.readings else "mg/dL"
+        return cls.from_readings(dataset.readings, unit=unit)
+
+    def to_dataset(
+        self,
+        user_id: str,
+        readings_date_utc: str,
+        ingested_at_utc: str,
+        source: str,
+        source_version: str
+    ) -> 'GlucoseDataset':
+        return GlucoseDataset(
+            user_id=user_id,
+            readings_date_utc=readings_date_utc,
+            ingested_at_utc=ingested_at_utc,
+            readings=self,
+            source=source,
+            source_version=source_version
+        )
+
+
 @dataclass
 class GlucoseDataset:
     """User glucose reading dataset with metadata."""
     user_id: str
     readings_date_utc: str   # YYYY-MM-DD format - date of the readings (UTC)
     ingested_at_utc: str     # ISO8601 timestamp - when data was fetched from source
-    readings: List[GlucoseReading]
+    readings: Union[List[GlucoseReading], GlucoseSeries]
     source: str              # e.g., "dexcom", "libre", "guardian"
     source_version: str      # API version or data format version
 
     def to_dict(self) -> Dict[str, Any]:
+        if isinstance(self.readings, GlucoseSeries):
+            readings = self.readings.to_dicts()
+        else:
+            readings = [r.to_dict() for r in self.readings]
+
         return {
             'user_id': self.user_id,
             'readings_date_utc': self.readings_date_utc,
             'ingested_at_utc': self.ingested_at_utc,
-            'readings': [r.to_dict() for r in self.readings],
+            'readings': readings,
             'metadata': {
                 'total_readings': len(self.readings),
                 'source': self.source,
@@ -52,6 +217,9 @@ class GlucoseDataset:
             }
         }
 
+    def to_series(self) -> GlucoseSeries:
+        return GlucoseSeries.from_dataset(self)
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'GlucoseDataset':
         metadata = data.get('metadata', {})
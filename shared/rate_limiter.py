@@ -0,0 +1,193 @@
+"""
+Token-bucket rate limiting shared by every process that calls an external API.
+
+A RateLimiter draws from a global bucket and, optionally, a per-endpoint bucket.
+Buckets live in a BucketStore: DynamoDBBucketStore coordinates all concurrent
+Lambda executions, InMemoryBucketStore is a single-process stand-in for tests
+and local runs.
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_BACKOFF_MAX = 0.05  # Seconds to back off after losing a conditional-write race
+MAX_SLEEP = 1.0              # Re-check buckets at least this often while waiting
+
+
+@dataclass(frozen=True)
+class BucketConfig:
+    rate: float      # Tokens added per second
+    capacity: float  # Maximum burst
+
+    @classmethod
+    def per_second(cls, rate: float, burst: Optional[float] = None) -> 'BucketConfig':
+        return cls(rate=rate, capacity=max(burst if burst is not None else rate, 1.0))
+
+
+def refill(tokens: float, elapsed: float, config: BucketConfig) -> float:
+    return min(config.capacity, tokens + max(elapsed, 0.0) * config.rate)
+
+
+class InMemoryBucketStore:
+    """Thread-safe buckets held in process memory."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, bucket_id: str, config: BucketConfig) -> float:
+        """Take one token. Returns 0 on success, otherwise the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(bucket_id, (config.capacity, now))
+            tokens = refill(tokens, now - updated_at, config)
+
+            if tokens < 1:
+                self._buckets[bucket_id] = (tokens, now)
+                return (1 - tokens) / config.rate
+
+            self._buckets[bucket_id] = (tokens - 1, now)
+            return 0.0
+
+
+class DynamoDBBucketStore:
+    """
+    Buckets stored as DynamoDB items, shared by every concurrent execution.
+
+    Each bucket is one item holding its token count and last update time. A token is
+    taken with a write conditioned on the update time read, so concurrent takers never
+    double-spend; the loser re-reads and tries again. Uses the low-level client, which
+    is thread-safe. Wall-clock time is used because buckets are shared across hosts.
+    """
+
+    def __init__(self, dynamodb_client, table_name: str):
+        self.client = dynamodb_client
+        self.table_name = table_name
+
+    def try_acquire(self, bucket_id: str, config: BucketConfig) -> float:
+        """Take one token. Returns 0 on success, otherwise the seconds to wait before retrying."""
+        now = time.time()
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={'bucket_id': {'S': bucket_id}},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+
+        if item:
+            previous_update = item['updated_at']['N']
+            tokens = refill(float(item['tokens']['N']), now - float(previous_update), config)
+        else:
+            previous_update = None
+            tokens = config.capacity
+
+        if tokens < 1:
+            return (1 - tokens) / config.rate
+
+        condition: Dict[str, Any] = {'ConditionExpression': 'attribute_not_exists(bucket_id)'}
+        if previous_update is not None:
+            condition = {
+                'ConditionExpression': 'updated_at = :previous',
+                'ExpressionAttributeValues': {':previous': {'N': previous_update}}
+            }
+
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'bucket_id': {'S': bucket_id},
+                    'tokens': {'N': repr(tokens - 1)},
+                    'updated_at': {'N': repr(now)}
+                },
+                **condition
+            )
+            return 0.0
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return random.uniform(0, CONFLICT_BACKOFF_MAX)
+
+
+@dataclass
+class WaitMetrics:
+    """Time spent waiting for tokens, per endpoint."""
+    acquisitions: int = 0
+    throttled: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'acquisitions': self.acquisitions,
+            'throttled': self.throttled,
+            'avg_wait_ms': round(self.total_wait_ms / self.acquisitions, 1) if self.acquisitions else 0.0,
+            'max_wait_ms': round(self.max_wait_ms, 1)
+        }
+
+
+@dataclass
+class LimiterMetrics:
+    endpoints: Dict[str, WaitMetrics] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, endpoint: str, wait_ms: float, throttled: bool) -> None:
+        with self._lock:
+            metrics = self.endpoints.setdefault(endpoint, WaitMetrics())
+            metrics.acquisitions += 1
+            metrics.total_wait_ms += wait_ms
+            metrics.max_wait_ms = max(metrics.max_wait_ms, wait_ms)
+            if throttled:
+                metrics.throttled += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in self.endpoints.items()}
+
+
+class RateLimiter:
+    """
+    Blocks callers until both the global and the endpoint's bucket yield a token.
+
+    Endpoints without their own config are limited by the global bucket only.
+    """
+
+    def __init__(
+        self,
+        store,
+        name: str,
+        global_config: BucketConfig,
+        endpoint_configs: Optional[Dict[str, BucketConfig]] = None
+    ):
+        self.store = store
+        self.name = name
+        self.global_config = global_config
+        self.endpoint_configs = endpoint_configs or {}
+        self.metrics = LimiterMetrics()
+
+    def acquire(self, endpoint: str) -> float:
+        """Wait for a token for one request to `endpoint`. Returns the seconds waited."""
+        started = time.monotonic()
+        throttled = False
+
+        for bucket_id, config in self._buckets(endpoint):
+            while True:
+                wait = self.store.try_acquire(bucket_id, config)
+                if wait <= 0:
+                    break
+                throttled = True
+                time.sleep(min(wait, MAX_SLEEP))
+
+        waited = time.monotonic() - started
+        self.metrics.record(endpoint, waited * 1000, throttled)
+        if waited > MAX_SLEEP:
+            logger.info(f'Waited {waited:.2f}s for a {self.name} {endpoint} rate-limit token.')
+        return waited
+
+    def _buckets(self, endpoint: str) -> List[Tuple[str, BucketConfig]]:
+        buckets = [(f'{self.name}#global', self.global_config)]
+        if endpoint in self.endpoint_configs:
+            buckets.append((f'{self.name}#{endpoint}', self.endpoint_configs[endpoint]))
+        return buckets
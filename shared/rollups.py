@@ -0,0 +1,182 @@
+"""Mergeable per-day summaries of glucose readings."""
+import math
+import operator
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, Optional
+
+from glucose_ranges import GlucoseCategory, count_categories
+from models import GlucoseSeries
+
+ROLLUP_VERSION = 1
+
+# Histogram bins are 1 mg/dL wide and keyed by their lower bound. CGM values are
+# whole mg/dL, so percentiles computed from the histogram are exact.
+HISTOGRAM_BIN_WIDTH = 1
+
+
+@dataclass
+class GlucoseRollup:
+    """
+    Sufficient statistics for a set of glucose readings.
+
+    Rollups for disjoint sets of readings merge into the rollup of their union, so a
+    window of any length is summarized by merging one small rollup per day.
+    """
+    count: int = 0
+    value_sum: float = 0.0
+    value_sum_sq: float = 0.0
+    category_counts: Dict[GlucoseCategory, int] = field(default_factory=lambda: {c: 0 for c in GlucoseCategory})
+    histogram: Dict[int, int] = field(default_factory=dict)  # Bin lower bound (mg/dL) -> count
+    first_timestamp: Optional[int] = None                    # Epoch seconds of earliest reading (local time)
+    last_timestamp: Optional[int] = None                     # Epoch seconds of latest reading (local time)
+
+    @classmethod
+    def from_series(cls, series: GlucoseSeries) -> 'GlucoseRollup':
+        if not series:
+            return cls()
+
+        values = series.values
+        sorted_values = sorted(values)
+
+        return cls(
+            count=len(values),
+            value_sum=sum(values),
+            value_sum_sq=sum(map(operator.mul, values, values)),
+            category_counts=count_categories(sorted_values),
+            histogram=dict(Counter(map(_histogram_bin, sorted_values))),
+            first_timestamp=min(series.timestamps),
+            last_timestamp=max(series.timestamps)
+        )
+
+    def merge(self, other: 'GlucoseRollup') -> 'GlucoseRollup':
+        """Return the rollup of the union of both reading sets."""
+        histogram = Counter(self.histogram)
+        histogram.update(other.histogram)
+
+        return GlucoseRollup(
+            count=self.count + other.count,
+            value_sum=self.value_sum + other.value_sum,
+            value_sum_sq=self.value_sum_sq + other.value_sum_sq,
+            category_counts={c: self.category_counts[c] + other.category_counts[c] for c in GlucoseCategory},
+            histogram=dict(histogram),
+            first_timestamp=_min_optional(self.first_timestamp, other.first_timestamp),
+            last_timestamp=_max_optional(self.last_timestamp, other.last_timestamp)
+        )
+
+    def subtract(self, other: 'GlucoseRollup') -> 'GlucoseRollup':
+        """
+        Return the rollup of this reading set with `other`, a subset of it, removed.
+
+        The inverse of merge(), so a rolling window advances by merging the days entering
+        it and subtracting the days leaving it. CGM values are whole mg/dL, so the sums
+        stay exact however many times a window is advanced.
+
+        The remaining readings' first and last timestamps can't be recovered: a bound is
+        kept only when `other` doesn't reach it, and is None otherwise.
+        """
+        if not other.count:
+            return self
+
+        histogram = Counter(self.histogram)
+        histogram.subtract(other.histogram)
+        category_counts = {c: self.category_counts[c] - other.category_counts[c] for c in GlucoseCategory}
+
+        if other.count > self.count or any(n < 0 for n in histogram.values()) or any(n < 0 for n in category_counts.values()):
+            raise ValueError("Cannot subtract a rollup that is not a subset of this one")
+
+        count = self.count - other.count
+        if not count:
+            return GlucoseRollup()
+
+        return GlucoseRollup(
+            count=count,
+            value_sum=self.value_sum - other.value_sum,
+            value_sum_sq=self.value_sum_sq - other.value_sum_sq,
+            category_counts=category_counts,
+            histogram={bin_start: n for bin_start, n in histogram.items() if n},
+            first_timestamp=_remaining_bound(self.first_timestamp, other.first_timestamp, other.last_timestamp),
+            last_timestamp=_remaining_bound(self.last_timestamp, other.first_timestamp, other.last_timestamp)
+        )
+
+    @classmethod
+    def merge_all(cls, rollups: Iterable['GlucoseRollup']) -> 'GlucoseRollup':
+        merged = cls()
+        for rollup in rollups:
+            merged = merged.merge(rollup)
+        return merged
+
+    def percentile(self, pct: float) -> float:
+        """Linearly interpolated percentile, matching glucose_ranges.percentile() on the raw values."""
+        rank = (self.count - 1) * pct / 100
+        lower = math.floor(rank)
+        upper = math.ceil(rank)
+
+        lower_value = self._value_at_rank(lower)
+        if lower == upper:
+            return lower_value
+        upper_value = self._value_at_rank(upper)
+        return lower_value + (upper_value - lower_value) * (rank - lower)
+
+    def _value_at_rank(self, rank: int) -> float:
+        seen = 0
+        for bin_start in sorted(self.histogram):
+            seen += self.histogram[bin_start]
+            if rank < seen:
+                return float(bin_start)
+        raise IndexError(f"Rank {rank} out of range for rollup of {self.count} readings")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': ROLLUP_VERSION,
+            'count': self.count,
+            'value_sum': self.value_sum,
+            'value_sum_sq': self.value_sum_sq,
+            'category_counts': {c.value: n for c, n in self.category_counts.items()},
+            'histogram_bin_width': HISTOGRAM_BIN_WIDTH,
+            'histogram': {str(bin_start): n for bin_start, n in sorted(self.histogram.items())},
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GlucoseRollup':
+        if data.get('version') != ROLLUP_VERSION:
+            raise ValueError(f"Unsupported rollup version: {data.get('version')}")
+
+        return cls(
+            count=data['count'],
+            value_sum=data['value_sum'],
+            value_sum_sq=data['value_sum_sq'],
+            category_counts={c: data['category_counts'].get(c.value, 0) for c in GlucoseCategory},
+            histogram={int(bin_start): n for bin_start, n in data['histogram'].items()},
+            first_timestamp=data.get('first_timestamp'),
+            last_timestamp=data.get('last_timestamp')
+        )
+
+
+def _histogram_bin(value: float) -> int:
+    return math.floor(value / HISTOGRAM_BIN_WIDTH) * HISTOGRAM_BIN_WIDTH
+
+
+def _min_optional(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def _max_optional(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def _remaining_bound(bound: Optional[int], removed_first: Optional[int], removed_last: Optional[int]) -> Optional[int]:
+    """`bound` if no removed reading can sit on it, else None."""
+    if bound is None or removed_first is None or removed_last is None:
+        return None
+    return None if removed_first <= bound <= removed_last else bound
@@ -0,0 +1,95 @@
+"""Batched, concurrent SQS enqueueing for the pipeline coordinators."""
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 10        # SendMessageBatch limit
+MAX_DELAY_SECONDS = 900    # SQS DelaySeconds limit
+
+
+@dataclass
+class EnqueueResult:
+    enqueued: int = 0
+    failed: int = 0
+
+    def add(self, other: 'EnqueueResult') -> None:
+        self.enqueued += other.enqueued
+        self.failed += other.failed
+
+
+class BatchEnqueuer:
+    """
+    Enqueue messages with SendMessageBatch, several batches at a time.
+
+    Only the entries SQS reports as failed are retried, and sender faults (malformed
+    entries) are not retried at all. Create one instance per process so the thread
+    pool is reused across warm Lambda invocations.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        concurrency: int = 8,
+        max_attempts: int = 3,
+        max_jitter_seconds: int = 0
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.max_attempts = max_attempts
+        self.max_jitter_seconds = min(max_jitter_seconds, MAX_DELAY_SECONDS)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def enqueue(self, messages: Iterable[Dict[str, Any]]) -> EnqueueResult:
+        """JSON-encode and enqueue every message, returning exact enqueued/failed counts."""
+        bodies = [json.dumps(message) for message in messages]
+        batches = [bodies[i:i + MAX_BATCH_SIZE] for i in range(0, len(bodies), MAX_BATCH_SIZE)]
+
+        result = EnqueueResult()
+        for batch_result in self.executor.map(self._send_batch, batches):
+            result.add(batch_result)
+        return result
+
+    def _send_batch(self, bodies: List[str]) -> EnqueueResult:
+        pending = {str(i): self._entry(str(i), body) for i, body in enumerate(bodies)}
+        result = EnqueueResult()
+
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+            try:
+                response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=list(pending.values()))
+            except Exception as e:
+                logger.warning(f'SendMessageBatch attempt {attempt + 1} failed for {len(pending)} messages: {str(e)}')
+                continue
+
+            for entry in response.get('Successful', []):
+                pending.pop(entry['Id'], None)
+                result.enqueued += 1
+
+            for entry in response.get('Failed', []):
+                if entry.get('SenderFault'):
+                    logger.error(f'Message rejected by SQS: {entry.get("Code")} - {entry.get("Message")}')
+                    pending.pop(entry['Id'], None)
+                    result.failed += 1
+
+            if not pending:
+                return result
+
+        logger.error(f'Failed to enqueue {len(pending)} messages after {self.max_attempts} attempts.')
+        result.failed += len(pending)
+        return result
+
+    def _entry(self, entry_id: str, body: str) -> Dict[str, Any]:
+        entry = {'Id': entry_id, 'MessageBody': body}
+        if self.max_jitter_seconds:
+            # Spread consumers out instead of waking them all at once
+            entry['DelaySeconds'] = random.randint(0, self.max_jitter_seconds)
+        return entry
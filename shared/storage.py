@@ -0,0 +1,223 @@
+"""S3 layout and serialization of normalized glucose partitions and raw source archives."""
+import gzip
+import hashlib
+import json
+import re
+import sys
+from array import array
+from typing import Dict, Any, List, Tuple
+
+import glucose_codec
+from models import GlucoseDataset, GlucoseSeries, epoch_day_seconds
+
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+JSON_CONTENT_TYPE = 'application/json'
+
+READINGS_FILENAMES = {
+    FORMAT_BINARY: 'readings.bin',
+    FORMAT_JSON: 'readings.json'
+}
+ROLLUP_FILENAME = 'rollup.json'
+MANIFEST_FILENAME = 'manifest.json'
+
+# Version of each readings format, recorded in the partition manifest
+FORMAT_VERSIONS = {
+    FORMAT_BINARY: glucose_codec.FORMAT_VERSION,
+    FORMAT_JSON: 1
+}
+
+CONTENT_HASH_METADATA_KEY = 'content-sha256'
+
+# One reading of a readings.json body as GlucoseSeries.to_dicts() writes it: fixed key
+# order and a 'YYYY-MM-DDTHH:MM:SS' timestamp, captured as date, hours, minutes, seconds
+_JSON_READING = re.compile(
+    rb'"timestamp":\s*"(\d{4}-\d\d-\d\d)T(\d\d):(\d\d):(\d\d)",\s*'
+    rb'"value":\s*([-+0-9.eE]+),\s*"unit":\s*"([^"]*)"'
+)
+
+RAW_ARCHIVE_VERSION = 1
+RAW_ARCHIVE_SUFFIX = '.json.gz'
+
+# S3 error codes for a conditional write that lost to a concurrent writer
+CONDITIONAL_WRITE_CONFLICTS = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def user_prefix(user_id: str) -> str:
+    return f'normalized/user_id={user_id}'
+
+
+def partition_prefix(user_id: str, readings_date: str) -> str:
+    return f'{user_prefix(user_id)}/readings_date={readings_date}'
+
+
+def readings_key(user_id: str, readings_date: str, fmt: str = FORMAT_BINARY) -> str:
+    return f'{partition_prefix(user_id, readings_date)}/{READINGS_FILENAMES[fmt]}'
+
+
+def readings_keys(user_id: str, readings_date: str) -> Tuple[str, ...]:
+    """Candidate readings keys for a day, preferred format first."""
+    return tuple(readings_key(user_id, readings_date, fmt) for fmt in (FORMAT_BINARY, FORMAT_JSON))
+
+
+def rollup_key(user_id: str, readings_date: str) -> str:
+    return f'{partition_prefix(user_id, readings_date)}/{ROLLUP_FILENAME}'
+
+
+def manifest_key(user_id: str) -> str:
+    return f'{user_prefix(user_id)}/{MANIFEST_FILENAME}'
+
+
+def compacted_key(user_id: str, granularity: str, period_label: str) -> str:
+    return f'{user_prefix(user_id)}/compacted/{granularity}/{period_label}.bin'
+
+
+def raw_user_prefix(source: str, user_id: str) -> str:
+    return f'raw/source={source}/user_id={user_id}'
+
+
+def raw_archive_key(source: str, user_id: str, readings_date: str, latest_source_time: str) -> str:
+    """
+    One archive per batch of a day's records, named after the latest source timestamp in it.
+
+    Fetching the same records again (a retried or rerun ingestion) overwrites the same
+    archive instead of adding one, and archive keys sort in the order the records arrived.
+    """
+    latest = latest_source_time.replace('-', '').replace(':', '').replace('+0000', 'Z')
+    return f'{raw_user_prefix(source, user_id)}/readings_date={readings_date}/{latest}{RAW_ARCHIVE_SUFFIX}'
+
+
+def raw_archive_date(s3_key: str) -> str:
+    """Readings date of a raw archive key."""
+    return s3_key.split('/readings_date=', 1)[1].split('/', 1)[0]
+
+
+def graph_series_key(user_id: str, period_end: str, report_type: str) -> str:
+    """Full-resolution series behind a report's downsampled graph."""
+    return f'insights/user_id={user_id}/period_end={period_end}/{report_type}.bin'
+
+
+def rolling_window_key(user_id: str, days: int) -> str:
+    """Stored state of a user's rolling report window."""
+    return f'insights/user_id={user_id}/rolling/{days}d.json'
+
+
+def key_format(s3_key: str) -> str:
+    """Storage format of a readings key."""
+    for fmt, filename in READINGS_FILENAMES.items():
+        if s3_key.endswith(f'/{filename}'):
+            return fmt
+    raise ValueError(f'Not a readings key: {s3_key}')
+
+
+def serialize_dataset(dataset: GlucoseDataset, fmt: str = FORMAT_BINARY) -> Tuple[bytes, str]:
+    """Serialize a dataset, returning the body and its content type."""
+    if fmt == FORMAT_BINARY:
+        return glucose_codec.encode_dataset(dataset), glucose_codec.CONTENT_TYPE
+    if fmt == FORMAT_JSON:
+        return json.dumps(dataset.to_dict(), indent=2).encode('utf-8'), JSON_CONTENT_TYPE
+    raise ValueError(f'Unknown storage format: {fmt}')
+
+
+def is_binary(body: bytes, content_type: str | None = None) -> bool:
+    """Content-type switch; falls back to sniffing the magic bytes when the type is missing."""
+    if content_type:
+        return content_type == glucose_codec.CONTENT_TYPE
+    return glucose_codec.is_encoded(body)
+
+
+def deserialize_dataset(body: bytes, content_type: str | None = None) -> GlucoseDataset:
+    if is_binary(body, content_type):
+        return glucose_codec.decode_dataset(body)
+    return GlucoseDataset.from_dict(json.loads(body.decode('utf-8')))
+
+
+def decode_readings_json(body: bytes) -> GlucoseSeries:
+    """
+    Decode a readings.json body straight into timestamp and value columns.
+
+    One regex pass over the bytes pulls out each reading's fields, without building a dict
+    per reading. Timestamps are assembled from their fixed-position fields, converting
+    each distinct date only once.
+
+    Raises:
+        ValueError: If the body is not in the layout serialize_dataset writes (other key
+            order or timestamp layout, mixed units, non-numeric values); callers fall back
+            to json.loads.
+    """
+    matches = _JSON_READING.findall(body)
+    if len(matches) != body.count(b'"timestamp"'):
+        raise ValueError('readings.json body is not in the canonical layout')
+
+    if not matches:
+        return GlucoseSeries()
+    days, hours, minutes, seconds, values, units = zip(*matches)
+
+    unit_set = set(units)
+    if len(unit_set) > 1:
+        raise ValueError(f'readings.json body mixes units: {sorted(u.decode() for u in unit_set)}')
+
+    day_seconds = {day: epoch_day_seconds(day.decode('ascii')) for day in set(days)}
+    return GlucoseSeries(
+        timestamps=array('q', [
+            day_seconds[day] + int(h) * 3600 + int(m) * 60 + int(s)
+            for day, h, m, s in zip(days, hours, minutes, seconds)
+        ]),
+        values=array('f', map(float, values)),
+        unit=unit_set.pop().decode('utf-8')
+    )
+
+
+def deserialize_series(body: bytes, content_type: str | None = None) -> GlucoseSeries:
+    if is_binary(body, content_type):
+        _, series = glucose_codec.decode_series(body)
+        return series
+    try:
+        return decode_readings_json(body)
+    except ValueError:
+        return GlucoseDataset.from_dict(json.loads(body.decode('utf-8'))).to_series()
+
+
+def serialize_raw_archive(
+    source: str,
+    source_version: str,
+    user_id: str,
+    readings_date: str,
+    fetched_at: str,
+    records: List[Dict[str, Any]]
+) -> bytes:
+    """Gzipped JSON of the records exactly as the source API returned them."""
+    archive = {
+        'version': RAW_ARCHIVE_VERSION,
+        'source': source,
+        'source_version': source_version,
+        'user_id': user_id,
+        'readings_date': readings_date,
+        'fetched_at': fetched_at,
+        'records': records
+    }
+    return gzip.compress(json.dumps(archive, separators=(',', ':')).encode('utf-8'))
+
+
+def deserialize_raw_archive(body: bytes) -> Dict[str, Any]:
+    archive = json.loads(gzip.decompress(body).decode('utf-8'))
+    if archive.get('version') != RAW_ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported raw archive version: {archive.get('version')}")
+    return archive
+
+
+def content_hash(series: GlucoseSeries) -> str:
+    """
+    SHA-256 of a series' readings, independent of storage format and ingestion metadata.
+
+    Two partitions with the same hash hold the same readings, so rewriting one with the
+    other is a no-op.
+    """
+    digest = hashlib.sha256(series.unit.encode('utf-8'))
+    for column in (series.timestamps, series.values):
+        if sys.byteorder == 'big':
+            column = array(column.typecode, column)
+            column.byteswap()
+        digest.update(column.tobytes())
+    return digest.hexdigest()
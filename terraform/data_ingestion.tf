@@ -37,6 +37,25 @@ resource "aws_s3_bucket_public_access_block" "glucose_data" {
   restrict_public_buckets = true
 }
 
+# Raw source archives are only read when re-normalizing, so they move to infrequent access
+resource "aws_s3_bucket_lifecycle_configuration" "glucose_data" {
+  bucket = aws_s3_bucket.glucose_data.id
+
+  rule {
+    id     = "raw-archive-infrequent-access"
+    status = "Enabled"
+
+    filter {
+      prefix = "raw/"
+    }
+
+    transition {
+      days          = 30
+      storage_class = "STANDARD_IA"
+    }
+  }
+}
+
 # SQS Queue for Data Ingestion
 resource "aws_sqs_queue" "data_ingestion_dlq" {
   name                      = "${var.project_name}-data-ingestion-dlq-${var.environment}"
@@ -74,14 +93,14 @@ resource "aws_lambda_layer_version" "shared_layer" {
   description = "Shared glucose data models, adapters, and utilities"
 }
 
-# Lambda Layer for Data Ingestion Dependencies (requests library)
+# Lambda Layer for Data Ingestion Dependencies (requests, boto3 with conditional S3 writes)
 resource "aws_lambda_layer_version" "data_ingestion_layer" {
   filename            = "../data-ingestion/layer/requests-layer.zip"
   layer_name          = "${var.project_name}-requests-layer-${var.environment}"
   compatible_runtimes = ["python3.11"]
   source_code_hash    = filebase64sha256("../data-ingestion/layer/requests-layer.zip")
 
-  description = "Shared dependencies for data ingestion: requests"
+  description = "Shared dependencies for data ingestion: requests, boto3"
 }
 
 # IAM Role for Data Ingestion Lambdas
@@ -125,14 +144,26 @@ resource "aws_iam_role_policy" "data_ingestion_dynamodb_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:Scan",
+          "dynamodb:Query",
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:PutItem",
           "dynamodb:UpdateItem"
         ]
         Resource = [
           aws_dynamodb_table.dexcom_credentials.arn,
-          aws_dynamodb_table.users.arn
+          aws_dynamodb_table.users.arn,
+          "${aws_dynamodb_table.users.arn}/index/active-users-index",
+          "${aws_dynamodb_table.dexcom_credentials.arn}/index/expires-at-index"
         ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem"
+        ]
+        Resource = aws_dynamodb_table.rate_limits.arn
       }
     ]
   })
@@ -151,6 +182,7 @@ resource "aws_iam_role_policy" "data_ingestion_s3_policy" {
         Action = [
           "s3:PutObject",
           "s3:GetObject",
+          "s3:DeleteObject",
           "s3:ListBucket"
         ]
         Resource = [
@@ -215,10 +247,13 @@ resource "aws_lambda_function" "data_ingestion_coordinator" {
 
   environment {
     variables = {
-      DEXCOM_CREDENTIALS_TABLE = aws_dynamodb_table.dexcom_credentials.name
-      USERS_TABLE              = aws_dynamodb_table.users.name
-      SQS_QUEUE_URL            = aws_sqs_queue.data_ingestion.url
-      LOG_LEVEL                = "INFO"
+      USERS_TABLE                = aws_dynamodb_table.users.name
+      SQS_QUEUE_URL              = aws_sqs_queue.data_ingestion.url
+      ACTIVE_USER_SHARDS         = var.active_user_shards
+      LOOKUP_CONCURRENCY         = "8"
+      ENQUEUE_CONCURRENCY        = "8"
+      ENQUEUE_MAX_JITTER_SECONDS = "0"
+      LOG_LEVEL                  = "INFO"
     }
   }
 
@@ -253,12 +288,24 @@ resource "aws_lambda_function" "data_ingestion_worker" {
 
   environment {
     variables = {
-      DEXCOM_API_BASE_URL         = var.dexcom_api_base_url
-      DEXCOM_CLIENT_ID            = var.dexcom_client_id
-      DEXCOM_CLIENT_SECRET        = var.dexcom_client_secret
-      DEXCOM_CREDENTIALS_TABLE    = aws_dynamodb_table.dexcom_credentials.name
-      S3_BUCKET_NAME              = aws_s3_bucket.glucose_data.bucket
-      LOG_LEVEL                   = "INFO"
+      DEXCOM_API_BASE_URL          = var.dexcom_api_base_url
+      DEXCOM_CLIENT_ID             = var.dexcom_client_id
+      DEXCOM_CLIENT_SECRET         = var.dexcom_client_secret
+      DEXCOM_CREDENTIALS_TABLE     = aws_dynamodb_table.dexcom_credentials.name
+      S3_BUCKET_NAME               = aws_s3_bucket.glucose_data.bucket
+      NORMALIZED_FORMAT            = "binary"
+      INGESTION_CONCURRENCY        = "10"
+      SQS_QUEUE_URL                = aws_sqs_queue.data_ingestion.url
+      CREDENTIAL_REFRESH_SHARDS    = var.credential_refresh_shards
+      CREDENTIAL_CACHE_TTL_SECONDS = "300"
+      BACKFILL_WINDOW_DAYS         = "30"
+      BACKFILL_CONCURRENCY         = "3"
+      RATE_LIMIT_TABLE             = aws_dynamodb_table.rate_limits.name
+      DEXCOM_GLOBAL_RATE           = "10"
+      DEXCOM_GLOBAL_BURST          = "20"
+      DEXCOM_EGVS_RATE             = "8"
+      DEXCOM_TOKEN_RATE            = "2"
+      LOG_LEVEL                    = "INFO"
     }
   }
 
@@ -270,10 +317,149 @@ resource "aws_lambda_function" "data_ingestion_worker" {
 
 # SQS trigger for Worker Lambda
 resource "aws_lambda_event_source_mapping" "sqs_trigger" {
-  event_source_arn = aws_sqs_queue.data_ingestion.arn
-  function_name    = aws_lambda_function.data_ingestion_worker.arn
-  batch_size       = 1
-  enabled          = true
+  event_source_arn                   = aws_sqs_queue.data_ingestion.arn
+  function_name                      = aws_lambda_function.data_ingestion_worker.arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"] # Only failed users are retried
+  enabled                            = true
+}
+
+# Token Refresher Lambda Function
+data "archive_file" "refresher_lambda" {
+  type        = "zip"
+  source_file = "../data-ingestion/refresher/lambda_function.py"
+  output_path = "../data-ingestion/refresher/refresher.zip"
+}
+
+resource "aws_lambda_function" "dexcom_token_refresher" {
+  filename         = data.archive_file.refresher_lambda.output_path
+  function_name    = "${var.project_name}-dexcom-token-refresher-${var.environment}"
+  role            = aws_iam_role.data_ingestion_lambda_role.arn
+  handler         = "lambda_function.lambda_handler"
+  runtime         = "python3.11"
+  timeout         = 300
+  memory_size     = 256
+  source_code_hash = data.archive_file.refresher_lambda.output_base64sha256
+
+  layers = [
+    aws_lambda_layer_version.shared_layer.arn,
+    aws_lambda_layer_version.data_ingestion_layer.arn
+  ]
+
+  environment {
+    variables = {
+      DEXCOM_API_BASE_URL       = var.dexcom_api_base_url
+      DEXCOM_CLIENT_ID          = var.dexcom_client_id
+      DEXCOM_CLIENT_SECRET      = var.dexcom_client_secret
+      DEXCOM_CREDENTIALS_TABLE  = aws_dynamodb_table.dexcom_credentials.name
+      CREDENTIAL_REFRESH_SHARDS = var.credential_refresh_shards
+      REFRESH_LOOKAHEAD_MINUTES = "90"
+      REFRESH_CONCURRENCY       = "10"
+      RATE_LIMIT_TABLE          = aws_dynamodb_table.rate_limits.name
+      DEXCOM_GLOBAL_RATE        = "10"
+      DEXCOM_GLOBAL_BURST       = "20"
+      DEXCOM_TOKEN_RATE         = "2"
+      LOG_LEVEL                 = "INFO"
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-dexcom-token-refresher-${var.environment}"
+    Environment = var.environment
+  }
+}
+
+# EventBridge Schedule for the token refresher, ahead of the daily ingestion
+resource "aws_cloudwatch_event_rule" "token_refresh" {
+  name                = "${var.project_name}-dexcom-token-refresh-${var.environment}"
+  description         = "Refresh expiring Dexcom tokens daily at 5:30 AM UTC, before ingestion"
+  schedule_expression = "cron(30 5 * * ? *)"
+
+  tags = {
+    Name        = "${var.project_name}-dexcom-token-refresh-${var.environment}"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "refresher_target" {
+  rule      = aws_cloudwatch_event_rule.token_refresh.name
+  target_id = "DexcomTokenRefresher"
+  arn       = aws_lambda_function.dexcom_token_refresher.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_refresher" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.dexcom_token_refresher.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.token_refresh.arn
+}
+
+# Partition Compactor Lambda Function
+data "archive_file" "compactor_lambda" {
+  type        = "zip"
+  source_file = "../data-ingestion/compactor/lambda_function.py"
+  output_path = "../data-ingestion/compactor/compactor.zip"
+}
+
+resource "aws_lambda_function" "partition_compactor" {
+  filename         = data.archive_file.compactor_lambda.output_path
+  function_name    = "${var.project_name}-partition-compactor-${var.environment}"
+  role            = aws_iam_role.data_ingestion_lambda_role.arn
+  handler         = "lambda_function.lambda_handler"
+  runtime         = "python3.11"
+  timeout         = 900
+  memory_size     = 512
+  source_code_hash = data.archive_file.compactor_lambda.output_base64sha256
+
+  layers = [
+    aws_lambda_layer_version.shared_layer.arn,
+    aws_lambda_layer_version.data_ingestion_layer.arn
+  ]
+
+  environment {
+    variables = {
+      S3_BUCKET_NAME               = aws_s3_bucket.glucose_data.id
+      USERS_TABLE                  = aws_dynamodb_table.users.name
+      ACTIVE_USER_SHARDS           = var.active_user_shards
+      COMPACTION_CONCURRENCY       = "8"
+      COMPACTION_FETCH_CONCURRENCY = "16"
+      COMPACTION_GRACE_DAYS        = "2"
+      LOG_LEVEL                    = "INFO"
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-partition-compactor-${var.environment}"
+    Environment = var.environment
+  }
+}
+
+# EventBridge Schedule for the compactor, outside the ingestion and processing runs
+resource "aws_cloudwatch_event_rule" "partition_compaction" {
+  name                = "${var.project_name}-partition-compaction-${var.environment}"
+  description         = "Compact closed daily partitions into weekly and monthly objects daily at 3 AM UTC"
+  schedule_expression = "cron(0 3 * * ? *)"
+
+  tags = {
+    Name        = "${var.project_name}-partition-compaction-${var.environment}"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "compactor_target" {
+  rule      = aws_cloudwatch_event_rule.partition_compaction.name
+  target_id = "PartitionCompactor"
+  arn       = aws_lambda_function.partition_compactor.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_compactor" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.partition_compactor.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.partition_compaction.arn
 }
 
 # EventBridge Schedule for Daily Ingestion
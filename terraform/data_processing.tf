@@ -66,14 +66,19 @@ resource "aws_iam_role_policy" "data_processing_dynamodb_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:Scan",
-          "dynamodb:GetItem"
+          "dynamodb:GetItem",
+          "dynamodb:Query"
+        ]
+        Resource = [
+          aws_dynamodb_table.users.arn,
+          "${aws_dynamodb_table.users.arn}/index/active-users-index"
         ]
-        Resource = aws_dynamodb_table.users.arn
       },
       {
         Effect = "Allow"
         Action = [
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:GetItem",
           "dynamodb:Query"
         ]
@@ -83,7 +88,7 @@ resource "aws_iam_role_policy" "data_processing_dynamodb_policy" {
   })
 }
 
-# S3 access policy for data processing (read-only from glucose data bucket)
+# S3 access policy for data processing (read-only from glucose data bucket, except report series)
 resource "aws_iam_role_policy" "data_processing_s3_policy" {
   name = "${var.project_name}-data-processing-s3-policy-${var.environment}"
   role = aws_iam_role.data_processing_lambda_role.id
@@ -101,6 +106,11 @@ resource "aws_iam_role_policy" "data_processing_s3_policy" {
           aws_s3_bucket.glucose_data.arn,
           "${aws_s3_bucket.glucose_data.arn}/*"
         ]
+      },
+      {
+        Effect   = "Allow"
+        Action   = "s3:PutObject"
+        Resource = "${aws_s3_bucket.glucose_data.arn}/insights/*"
       }
     ]
   })
@@ -152,11 +162,18 @@ resource "aws_lambda_function" "data_processing_coordinator" {
   memory_size     = 256
   source_code_hash = data.archive_file.data_coordinator_lambda.output_base64sha256
 
+  layers = [
+    aws_lambda_layer_version.shared_layer.arn
+  ]
+
   environment {
     variables = {
-      USERS_TABLE   = aws_dynamodb_table.users.name
-      SQS_QUEUE_URL = aws_sqs_queue.data_processing.url
-      LOG_LEVEL     = "INFO"
+      USERS_TABLE                = aws_dynamodb_table.users.name
+      SQS_QUEUE_URL              = aws_sqs_queue.data_processing.url
+      ACTIVE_USER_SHARDS         = var.active_user_shards
+      ENQUEUE_CONCURRENCY        = "8"
+      ENQUEUE_MAX_JITTER_SECONDS = "0"
+      LOG_LEVEL                  = "INFO"
     }
   }
 
@@ -185,7 +202,8 @@ resource "aws_lambda_function" "data_processor" {
   source_code_hash              = data.archive_file.data_processor_lambda.output_base64sha256
 
   layers = [
-    aws_lambda_layer_version.shared_layer.arn
+    aws_lambda_layer_version.shared_layer.arn,
+    aws_lambda_layer_version.data_ingestion_layer.arn
   ]
 
   environment {
@@ -193,6 +211,11 @@ resource "aws_lambda_function" "data_processor" {
       S3_BUCKET_NAME         = aws_s3_bucket.glucose_data.bucket
       GLUCOSE_INSIGHTS_TABLE = aws_dynamodb_table.glucose_insights.name
       EMAIL_QUEUE_URL        = aws_sqs_queue.email_service.url
+      S3_FETCH_CONCURRENCY   = "16"
+      GRAPH_POINT_BUDGET     = "300"
+      USER_CONCURRENCY       = "10"
+      REPORT_WINDOWS         = "14,30,90"
+      REPORT_HISTORY_WEEKS   = "8"
       LOG_LEVEL              = "INFO"
     }
   }
@@ -205,10 +228,12 @@ resource "aws_lambda_function" "data_processor" {
 
 # SQS trigger for Processor Lambda
 resource "aws_lambda_event_source_mapping" "data_processing_sqs_trigger" {
-  event_source_arn = aws_sqs_queue.data_processing.arn
-  function_name    = aws_lambda_function.data_processor.arn
-  batch_size       = 1
-  enabled          = true
+  event_source_arn                   = aws_sqs_queue.data_processing.arn
+  function_name                      = aws_lambda_function.data_processor.arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"] # Only failed users are retried
+  enabled                            = true
 }
 
 # EventBridge Schedule for Weekly Processing
@@ -14,6 +14,11 @@ resource "aws_dynamodb_table" "users" {
     type = "S"
   }
 
+  attribute {
+    name = "active_shard"
+    type = "N"
+  }
+
   # Global secondary index for email lookup
   global_secondary_index {
     name            = "email-index"
@@ -21,6 +26,15 @@ resource "aws_dynamodb_table" "users" {
     projection_type = "ALL"
   }
 
+  # Sparse index of active users with a connected data source, queried by the pipeline coordinators.
+  # Only those users carry active_shard, so enumeration cost scales with active users.
+  global_secondary_index {
+    name            = "active-users-index"
+    hash_key        = "active_shard"
+    range_key       = "user_id"
+    projection_type = "KEYS_ONLY"
+  }
+
   tags = {
     Name        = "${var.project_name}-users-${var.environment}"
     Environment = var.environment
@@ -63,6 +77,25 @@ resource "aws_dynamodb_table" "dexcom_credentials" {
     type = "S"
   }
 
+  attribute {
+    name = "refresh_shard"
+    type = "N"
+  }
+
+  attribute {
+    name = "expires_at"
+    type = "S"
+  }
+
+  # Credentials ordered by expiry within each shard, queried by the token refresher
+  global_secondary_index {
+    name               = "expires-at-index"
+    hash_key           = "refresh_shard"
+    range_key          = "expires_at"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["refresh_token"]
+  }
+
   tags = {
     Name        = "${var.project_name}-dexcom-credentials-${var.environment}"
     Environment = var.environment
@@ -92,4 +125,21 @@ resource "aws_dynamodb_table" "glucose_insights" {
     Environment = var.environment
     Project     = var.project_name
   }
-}
\ No newline at end of file
+}
+# DynamoDB table for distributed rate-limit token buckets (one item per bucket)
+resource "aws_dynamodb_table" "rate_limits" {
+  name         = "${var.project_name}-rate-limits-${var.environment}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "bucket_id"
+
+  attribute {
+    name = "bucket_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-rate-limits-${var.environment}"
+    Environment = var.environment
+    Project     = var.project_name
+  }
+}
@@ -57,6 +57,25 @@ resource "aws_iam_role_policy" "lambda_dynamodb_policy" {
   })
 }
 
+# Policy for Lambda to queue historical backfills when a Dexcom account is connected
+resource "aws_iam_role_policy" "lambda_sqs_policy" {
+  name = "${var.project_name}-lambda-sqs-policy-${var.environment}"
+  role = aws_iam_role.lambda_execution_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = aws_sqs_queue.data_ingestion.arn
+      }
+    ]
+  })
+}
+
 # Policy for Lambda to access Cognito
 resource "aws_iam_role_policy" "lambda_cognito_policy" {
   name = "${var.project_name}-lambda-cognito-policy-${var.environment}"
@@ -87,25 +106,34 @@ resource "aws_lambda_function" "api" {
   timeout          = 30
   memory_size      = 512
 
+  # Dexcom retry policy and metrics shared with the ingestion Lambdas
+  layers = [
+    aws_lambda_layer_version.shared_layer.arn
+  ]
+
   environment {
     variables = {
-      ENVIRONMENT              = var.environment
-      AWS_REGION_NAME          = var.aws_region
-      COGNITO_REGION           = var.aws_region
-      COGNITO_USER_POOL_ID     = aws_cognito_user_pool.main.id
-      COGNITO_CLIENT_ID        = aws_cognito_user_pool_client.main.id
-      COGNITO_CLIENT_SECRET    = aws_cognito_user_pool_client.main.client_secret
-      COGNITO_DOMAIN_URL       = "https://${aws_cognito_user_pool_domain.main.domain}.auth.${var.aws_region}.amazoncognito.com"
-      USERS_TABLE              = aws_dynamodb_table.users.name
-      SESSIONS_TABLE           = aws_dynamodb_table.sessions.name
-      DEXCOM_CREDENTIALS_TABLE = aws_dynamodb_table.dexcom_credentials.name
-      DEXCOM_CLIENT_ID         = var.dexcom_client_id
-      DEXCOM_CLIENT_SECRET     = var.dexcom_client_secret
-      DEXCOM_REDIRECT_URI      = var.dexcom_redirect_uri
-      DEXCOM_API_BASE_URL      = var.environment == "prod" ? "https://api.dexcom.com" : "https://sandbox-api.dexcom.com"
-      FRONTEND_BASE_URL        = var.frontend_base_url
-      CLOUDFRONT_URL           = "https://${aws_cloudfront_distribution.frontend.domain_name}"
-      LOG_LEVEL                = var.environment == "prod" ? "INFO" : "DEBUG"
+      ENVIRONMENT               = var.environment
+      AWS_REGION_NAME           = var.aws_region
+      COGNITO_REGION            = var.aws_region
+      COGNITO_USER_POOL_ID      = aws_cognito_user_pool.main.id
+      COGNITO_CLIENT_ID         = aws_cognito_user_pool_client.main.id
+      COGNITO_CLIENT_SECRET     = aws_cognito_user_pool_client.main.client_secret
+      COGNITO_DOMAIN_URL        = "https://${aws_cognito_user_pool_domain.main.domain}.auth.${var.aws_region}.amazoncognito.com"
+      USERS_TABLE               = aws_dynamodb_table.users.name
+      SESSIONS_TABLE            = aws_dynamodb_table.sessions.name
+      DEXCOM_CREDENTIALS_TABLE  = aws_dynamodb_table.dexcom_credentials.name
+      ACTIVE_USER_SHARDS        = var.active_user_shards
+      CREDENTIAL_REFRESH_SHARDS = var.credential_refresh_shards
+      DEXCOM_CLIENT_ID          = var.dexcom_client_id
+      DEXCOM_CLIENT_SECRET      = var.dexcom_client_secret
+      DEXCOM_REDIRECT_URI       = var.dexcom_redirect_uri
+      DEXCOM_API_BASE_URL       = var.environment == "prod" ? "https://api.dexcom.com" : "https://sandbox-api.dexcom.com"
+      DATA_INGESTION_QUEUE_URL  = aws_sqs_queue.data_ingestion.url
+      BACKFILL_DAYS             = "30"
+      FRONTEND_BASE_URL         = var.frontend_base_url
+      CLOUDFRONT_URL            = "https://${aws_cloudfront_distribution.frontend.domain_name}"
+      LOG_LEVEL                 = var.environment == "prod" ? "INFO" : "DEBUG"
     }
   }
 
@@ -34,6 +34,11 @@ output "dynamodb_users_table_name" {
   value       = aws_dynamodb_table.users.name
 }
 
+output "dynamodb_dexcom_credentials_table_name" {
+  description = "Name of the Dexcom credentials DynamoDB table"
+  value       = aws_dynamodb_table.dexcom_credentials.name
+}
+
 output "dynamodb_users_table_arn" {
   description = "ARN of the Users DynamoDB table"
   value       = aws_dynamodb_table.users.arn
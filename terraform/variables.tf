@@ -55,4 +55,16 @@ variable "dexcom_api_base_url" {
 variable "sender_email" {
   description = "Email address for sending reports"
   type        = string
-}
\ No newline at end of file
+}
+
+variable "active_user_shards" {
+  description = "Number of hash-key shards in the sparse active-users index (must match across the API and coordinators)"
+  type        = number
+  default     = 16
+}
+
+variable "credential_refresh_shards" {
+  description = "Number of hash-key shards in the Dexcom credentials expires-at index (must match across the API and ingestion functions)"
+  type        = number
+  default     = 8
+}
@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query
 from fastapi.responses import RedirectResponse
 
 from app.core.config import settings
+from app.core.dexcom_client import dexcom_client
 from app.core.security import get_current_user
 from app.db.dexcom_repository import DexcomCredentialsRepository
 
@@ -59,6 +60,33 @@ def _get_and_delete_oauth_state(state: str) -> str | None:
         return None
 
 
+def _enqueue_backfill(user_id: str) -> None:
+    """Queue a historical backfill of the user's Dexcom readings for the ingestion worker."""
+    import boto3
+    import json
+    from datetime import datetime, timezone, timedelta
+
+    if not settings.DATA_INGESTION_QUEUE_URL:
+        logger.warning(f"DATA_INGESTION_QUEUE_URL not set, skipping backfill for user {user_id}")
+        return
+
+    today = datetime.now(timezone.utc).date()
+    message = {
+        'user_id': user_id,
+        'mode': 'backfill',
+        'start_date': (today - timedelta(days=settings.BACKFILL_DAYS)).isoformat(),
+        'end_date': today.isoformat()
+    }
+
+    try:
+        sqs = boto3.client('sqs', region_name=settings.AWS_REGION)
+        sqs.send_message(QueueUrl=settings.DATA_INGESTION_QUEUE_URL, MessageBody=json.dumps(message))
+        logger.info(f"Queued {settings.BACKFILL_DAYS}-day backfill for user {user_id}")
+    except Exception as e:
+        # The daily ingestion still picks the user up; a missed backfill should not fail the connection
+        logger.error(f"Failed to queue backfill for user {user_id}: {e}")
+
+
 @router.get("/connect")
 async def connect_dexcom(current_user: dict = Depends(get_current_user)):
     """
@@ -103,54 +131,39 @@ async def dexcom_callback(
             detail="Invalid or expired state parameter"
         )
 
-
     # Exchange authorization code for access token
-    token_url = f"{settings.DEXCOM_API_BASE_URL}/v2/oauth2/token"
-
-    token_data = {
-        'client_id': settings.DEXCOM_CLIENT_ID,
-        'client_secret': settings.DEXCOM_CLIENT_SECRET,
-        'code': code,
-        'grant_type': 'authorization_code',
-        'redirect_uri': settings.DEXCOM_REDIRECT_URI
-    }
-
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                token_url,
-                data=token_data,
-                headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        response = await dexcom_client.exchange_code(code)
+        if response.status_code != 200:
+            logger.error(f"Dexcom token exchange failed: {response.text}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to exchange authorization code: {response.text}"
             )
 
-            if response.status_code != 200:
-                logger.error(f"Dexcom token exchange failed: {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to exchange authorization code: {response.text}"
-                )
-
-            token_response = response.json()
-
-            # Store tokens in DynamoDB
-            dexcom_repo = DexcomCredentialsRepository()
-            success = dexcom_repo.create_or_update(
-                user_id=user_id,
-                access_token=token_response['access_token'],
-                refresh_token=token_response['refresh_token'],
-                expires_in=token_response['expires_in']
+        token_response = response.json()
+
+        # Store tokens in DynamoDB
+        dexcom_repo = DexcomCredentialsRepository()
+        success = dexcom_repo.create_or_update(
+            user_id=user_id,
+            access_token=token_response['access_token'],
+            refresh_token=token_response['refresh_token'],
+            expires_in=token_response['expires_in']
+        )
+
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to store Dexcom credentials"
             )
 
-            if not success:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to store Dexcom credentials"
-                )
+        logger.info(f"Successfully connected Dexcom account for user {user_id}")
 
-            logger.info(f"Successfully connected Dexcom account for user {user_id}")
+        _enqueue_backfill(user_id)
 
-            # Redirect to frontend account page with success message
-            return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/account?dexcom=connected")
+        # Redirect to frontend account page with success message
+        return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/account?dexcom=connected")
 
     except httpx.HTTPError as e:
         logger.error(f"HTTP error during Dexcom OAuth: {e}")
@@ -14,12 +14,21 @@ class Settings:
     USERS_TABLE: str = os.getenv("USERS_TABLE", "endo-users-dev")
     SESSIONS_TABLE: str = os.getenv("SESSIONS_TABLE", "endo-sessions-dev")
     DEXCOM_CREDENTIALS_TABLE: str = os.getenv("DEXCOM_CREDENTIALS_TABLE", "endo-dexcom-credentials-dev")
+    CREDENTIAL_REFRESH_SHARDS: int = int(os.getenv("CREDENTIAL_REFRESH_SHARDS", "8"))
+    ACTIVE_USER_SHARDS: int = int(os.getenv("ACTIVE_USER_SHARDS", "16"))
 
     # Dexcom OAuth configuration
     DEXCOM_CLIENT_ID: str = os.getenv("DEXCOM_CLIENT_ID", "")
     DEXCOM_CLIENT_SECRET: str = os.getenv("DEXCOM_CLIENT_SECRET", "")
     DEXCOM_REDIRECT_URI: str = os.getenv("DEXCOM_REDIRECT_URI", "")
     DEXCOM_API_BASE_URL: str = os.getenv("DEXCOM_API_BASE_URL", "https://sandbox-api.dexcom.com")
+    DEXCOM_CONNECT_TIMEOUT: float = float(os.getenv("DEXCOM_CONNECT_TIMEOUT", "3.05"))
+    DEXCOM_READ_TIMEOUT: float = float(os.getenv("DEXCOM_READ_TIMEOUT", "10"))
+    DEXCOM_MAX_RETRIES: int = int(os.getenv("DEXCOM_MAX_RETRIES", "2"))
+
+    # Data ingestion configuration
+    DATA_INGESTION_QUEUE_URL: str = os.getenv("DATA_INGESTION_QUEUE_URL", "")
+    BACKFILL_DAYS: int = int(os.getenv("BACKFILL_DAYS", "30"))
 
     # Frontend configuration
     FRONTEND_BASE_URL: str = os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+import httpx
+from dexcom_retry import ClientMetrics, RetryPolicy  # Shared Lambda layer
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DexcomClient:
+    """
+    Pooled, retrying async client for the Dexcom API.
+
+    A single instance is shared by all requests so keep-alive connections survive
+    across warm Lambda invocations. Shares its retry policy and metrics with the
+    ingestion worker's client: retries connection errors, 429 and 5xx with
+    full-jitter exponential backoff, honoring Retry-After.
+    """
+
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.retry_policy = RetryPolicy(max_retries=settings.DEXCOM_MAX_RETRIES)
+        self.metrics = ClientMetrics()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Connections are bound to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=settings.DEXCOM_API_BASE_URL,
+                timeout=httpx.Timeout(settings.DEXCOM_READ_TIMEOUT, connect=settings.DEXCOM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+            )
+            self._loop = loop
+        return self._client
+
+    async def exchange_code(self, code: str) -> httpx.Response:
+        """Exchange an OAuth authorization code for tokens."""
+        return await self._request(
+            'POST',
+            '/v2/oauth2/token',
+            endpoint='token',
+            data={
+                'client_id': settings.DEXCOM_CLIENT_ID,
+                'client_secret': settings.DEXCOM_CLIENT_SECRET,
+                'code': code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': settings.DEXCOM_REDIRECT_URI
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+
+    async def _request(self, method: str, path: str, endpoint: str, **kwargs) -> httpx.Response:
+        client = self._get_client()
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+            try:
+                response = await client.request(method, path, **kwargs)
+                error = None
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                response = None
+                error = e
+
+            self.metrics.record_attempt(endpoint, (time.monotonic() - started) * 1000, retried=attempt > 0)
+
+            if not self.retry_policy.should_retry(attempt, None if error is not None else response.status_code):
+                break
+
+            delay = self.retry_policy.delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+            logger.warning(f"Dexcom {endpoint} attempt {attempt + 1} failed ({error or response.status_code}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            self.metrics.record_failure(endpoint)
+            raise error
+
+        if response.status_code != 200:
+            self.metrics.record_failure(endpoint)
+        return response
+
+
+dexcom_client = DexcomClient()
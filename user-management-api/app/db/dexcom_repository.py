@@ -4,8 +4,10 @@ from typing import Optional
 
 import boto3
 from botocore.exceptions import ClientError
+from dexcom_credentials import refresh_shard  # Shared Lambda layer
 
 from app.core.config import settings
+from app.db.user_repository import UserRepository
 
 logger = logging.getLogger(__name__)
 
@@ -14,25 +16,30 @@ class DexcomCredentialsRepository:
     def __init__(self):
         self.dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
         self.table = self.dynamodb.Table(settings.DEXCOM_CREDENTIALS_TABLE)
+        self.users = UserRepository(self.dynamodb)
 
     def create_or_update(self, user_id: str, access_token: str, refresh_token: str, expires_in: int) -> bool:
-        """Create or update Dexcom credentials for a user"""
+        """Create or update Dexcom credentials for a user, keeping the ingestion watermark and backfill checkpoint"""
         try:
             now = datetime.now(timezone.utc)
             expires_at = now + timedelta(seconds=expires_in)
 
-            self.table.put_item(
-                Item={
-                    'user_id': user_id,
-                    'access_token': access_token,
-                    'refresh_token': refresh_token,
-                    'expires_at': expires_at.isoformat(),
-                    'created_at': now.isoformat(),
-                    'updated_at': now.isoformat()
+            self.table.update_item(
+                Key={'user_id': user_id},
+                UpdateExpression=(
+                    'SET access_token = :at, refresh_token = :rt, expires_at = :ea, refresh_shard = :rs, '
+                    'created_at = if_not_exists(created_at, :ua), updated_at = :ua'
+                ),
+                ExpressionAttributeValues={
+                    ':at': access_token,
+                    ':rt': refresh_token,
+                    ':ea': expires_at.isoformat(),
+                    ':ua': now.isoformat(),
+                    ':rs': refresh_shard(user_id, settings.CREDENTIAL_REFRESH_SHARDS)
                 }
             )
             logger.info(f"Created/updated Dexcom credentials for user {user_id}")
-            return True
+            return self.users.set_data_source_connected(user_id, True)
         except ClientError as e:
             logger.error(f"Error creating/updating Dexcom credentials: {e}")
             return False
@@ -53,7 +60,7 @@ class DexcomCredentialsRepository:
         try:
             self.table.delete_item(Key={'user_id': user_id})
             logger.info(f"Deleted Dexcom credentials for user {user_id}")
-            return True
+            return self.users.set_data_source_connected(user_id, False)
         except ClientError as e:
             logger.error(f"Error deleting Dexcom credentials: {e}")
             return False
@@ -71,12 +78,13 @@ class DexcomCredentialsRepository:
 
             self.table.update_item(
                 Key={'user_id': user_id},
-                UpdateExpression='SET access_token = :at, refresh_token = :rt, expires_at = :ea, updated_at = :ua',
+                UpdateExpression='SET access_token = :at, refresh_token = :rt, expires_at = :ea, updated_at = :ua, refresh_shard = :rs',
                 ExpressionAttributeValues={
                     ':at': access_token,
                     ':rt': refresh_token,
                     ':ea': expires_at.isoformat(),
-                    ':ua': now.isoformat()
+                    ':ua': now.isoformat(),
+                    ':rs': refresh_shard(user_id, settings.CREDENTIAL_REFRESH_SHARDS)
                 }
             )
             logger.info(f"Updated tokens for user {user_id}")
@@ -3,6 +3,7 @@ import logging
 from botocore.exceptions import ClientError
 from boto3.dynamodb.conditions import Key
 from pydantic import ValidationError
+from active_users import active_shard  # Shared Lambda layer
 
 from app.core.config import settings
 from app.db.models.database_models import DBUser
@@ -11,10 +12,18 @@ from app.db.models.database_models import DBUser
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-
 class UserRepository:
+    """
+    Users table access.
+
+    Users that are active and have a connected data source carry an `active_shard`
+    attribute, which makes them members of the sparse active-users index the pipeline
+    coordinators query. Every write that changes either condition keeps it in sync.
+    """
+
     def __init__(self, db_resource):
         self._users_table = db_resource.Table(settings.USERS_TABLE)
+        self._credentials_table = db_resource.Table(settings.DEXCOM_CREDENTIALS_TABLE)
 
     def create(self, user_data: dict) -> str | None:
         """Creates a new user in the database."""
@@ -136,7 +145,7 @@ class UserRepository:
             logger.info(f"Deactivating user_id: {user_id}")
             self._users_table.update_item(
                 Key={'user_id': user_id},
-                UpdateExpression="SET is_active = :ia",
+                UpdateExpression="SET is_active = :ia REMOVE active_shard",
                 ExpressionAttributeValues={':ia': False}
             )
             return True
@@ -148,12 +157,68 @@ class UserRepository:
         """Reactivates a user by setting is_active to True."""
         try:
             logger.info(f"Reactivating user_id: {user_id}")
-            self._users_table.update_item(
+            response = self._users_table.update_item(
                 Key={'user_id': user_id},
                 UpdateExpression="SET is_active = :ia",
-                ExpressionAttributeValues={':ia': True}
+                ExpressionAttributeValues={':ia': True},
+                ReturnValues="ALL_NEW"
             )
+            connected = response['Attributes'].get('data_source_connected')
+            if connected is None:
+                # Users connected before the attribute existed only show up in the credentials table
+                connected = self._has_credentials(user_id)
+                if connected:
+                    return self.set_data_source_connected(user_id, True)
+            if connected:
+                self._add_to_active_index(user_id)
             return True
         except ClientError as e:
             logger.error(f"Error reactivating user_id: {user_id}. Error: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def set_data_source_connected(self, user_id: str, connected: bool) -> bool:
+        """Records whether a user has a connected data source, updating the active-users index."""
+        try:
+            logger.info(f"Setting data_source_connected={connected} for user_id: {user_id}")
+            if not connected:
+                self._users_table.update_item(
+                    Key={'user_id': user_id},
+                    UpdateExpression="SET data_source_connected = :dc REMOVE active_shard",
+                    ExpressionAttributeValues={':dc': False}
+                )
+                return True
+
+            response = self._users_table.update_item(
+                Key={'user_id': user_id},
+                UpdateExpression="SET data_source_connected = :dc",
+                ExpressionAttributeValues={':dc': True},
+                ReturnValues="ALL_NEW"
+            )
+            if response['Attributes'].get('is_active'):
+                self._add_to_active_index(user_id)
+            return True
+        except ClientError as e:
+            logger.error(f"Error setting data_source_connected for user_id: {user_id}. Error: {e}")
+            return False
+
+    def _has_credentials(self, user_id: str) -> bool:
+        response = self._credentials_table.get_item(
+            Key={'user_id': user_id},
+            ProjectionExpression='user_id',
+            ConsistentRead=True
+        )
+        return 'Item' in response
+
+    def _add_to_active_index(self, user_id: str) -> None:
+        """Lists the user in the active-users index unless a concurrent write made them ineligible."""
+        try:
+            self._users_table.update_item(
+                Key={'user_id': user_id},
+                UpdateExpression="SET active_shard = :shard",
+                ConditionExpression="is_active = :t AND data_source_connected = :t",
+                ExpressionAttributeValues={':shard': active_shard(user_id, settings.ACTIVE_USER_SHARDS), ':t': True}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            logger.info(f"user_id: {user_id} became ineligible for the active-users index, not adding")